@@ -5,7 +5,7 @@ from time import sleep
 
 import pandas as pd
 
-from app.utils.api.positions import get_positions
+from app.utils.api.positions import get_positions_versioned
 from app.utils.api.ticket import get_order_from_ticket, get_deal_from_ticket
 from app.utils.constants import TIMEZONE
 from app.utils.db.close import close_trade
@@ -15,10 +15,73 @@ logger = logging.getLogger(__name__)
 # Dictionary to cache open positions between runs
 cached_positions = {}
 
-def close_algorithm():
+def reconcile_closed_position(ticket, position, current_time, deal_retries=0, deal_retry_delay=0.5):
+    """
+    Look up the deals of a closed position and record the closing details on its Trade.
+    position is the last known row of the position (a Series or anything with the same attributes).
+    """
+    try:
+        # Retrieve the closed order and deal details
+        closed_order = get_order_from_ticket(ticket)
+        closed_deal = get_deal_from_ticket(ticket)
+        for _ in range(deal_retries):
+            if closed_deal is not None:
+                break
+            sleep(deal_retry_delay)
+            closed_deal = get_deal_from_ticket(ticket)
+
+        if closed_deal is None:
+            error_msg = f"Failed to retrieve deal for closed ticket {ticket}."
+            logger.error({
+                "error": error_msg,
+                "ticket": ticket,
+                "position": position.to_dict() if hasattr(position, 'to_dict') else position
+            })
+            return None
+
+        # Extract closing details
+        close_time = closed_deal.get('close_time', current_time)
+        close_price = closed_deal.get('close_price', position.price_current)
+        pnl = closed_deal.get('profit', position.profit)
+        pnl_excluding_commission = pnl - closed_deal.get('commission', 0)
+        closing_reason = closed_deal.get('reason', 'CLOSED')
+
+        # Update the Trade record in the database
+        closed_trade = close_trade(ticket, close_time, close_price, pnl, pnl_excluding_commission, closing_reason, closed_deal)
+
+        if closed_trade is not None:
+            logger.info({
+                "event": "trade_closed",
+                "trade_id": closed_trade.id,
+                "symbol": closed_trade.symbol,
+            })
+        else:
+            error_msg = f"Failed to close trade {ticket}."
+            logger.error({"error": error_msg, "ticket": ticket})
+        return closed_trade
+
+    except Exception as e:
+        error_msg = f"Error processing closed ticket {ticket}: {e}\n{traceback.format_exc()}"
+        logger.error({"error": error_msg, "ticket": ticket})
+
+def handle_position_closed(event):
+    """
+    Event handler for position_closed events from the gateway. The event carries the
+    last row seen for the position, so no polling or fixed delay is needed. The
+    deal can land in history a moment after the position disappears, so the lookup
+    is retried briefly.
+    """
+    position = pd.Series(event['data'])
+    cached_positions.pop(event['ticket'], None)
+    current_time = datetime.now(TIMEZONE).replace(microsecond=0)
+    reconcile_closed_position(event['ticket'], position, current_time, deal_retries=4)
+
+def close_algorithm(snapshot=None):
     """
     Continuously monitors open trades, detects closed trades, and updates their
     corresponding Trade records in the database with closing details.
+
+    Reads positions from the given CycleSnapshot when there is one.
     """
     global cached_positions
 
@@ -26,7 +89,12 @@ def close_algorithm():
         current_time = datetime.now(TIMEZONE).replace(microsecond=0)
 
         # Fetch current open positions
-        positions = get_positions()
+        # Only tickets are compared, so the delta-polled book is enough without a snapshot
+        positions = snapshot.positions.copy() if snapshot is not None else get_positions_versioned()
+        if positions is None:
+            # A failed read would otherwise mark every cached trade as closed
+            logger.error("Skipping close detection, positions could not be read")
+            return
         if positions.empty:
             positions = pd.DataFrame(columns=[
                 'ticket', 'time', 'time_msc', 'time_update', 'time_update_msc', 'type',
@@ -48,44 +116,7 @@ def close_algorithm():
         for ticket in closed_tickets:
             position = cached_positions.pop(ticket)
             sleep(2)  # Optional: delay to ensure the trade is fully processed
-
-            try:
-                # Retrieve the closed order and deal details
-                closed_order = get_order_from_ticket(ticket)
-                closed_deal = get_deal_from_ticket(ticket)
-
-                if closed_deal is None:
-                    error_msg = f"Failed to retrieve deal for closed ticket {ticket}."
-                    logger.error({
-                        "error": error_msg,
-                        "ticket": ticket,
-                        "position": position.to_dict() if hasattr(position, 'to_dict') else position
-                    })
-                    continue
-
-                # Extract closing details
-                close_time = closed_deal.get('time', current_time)
-                close_price = closed_deal.get('price', position.price_current)
-                pnl = closed_deal.get('profit', position.profit)
-                pnl_excluding_commission = pnl - closed_deal.get('commission', 0)
-                closing_reason = closed_deal.get('reason', 'CLOSED')
-
-                # Update the Trade record in the database
-                closed_trade = close_trade(position.ticket, close_time, close_price, pnl, pnl_excluding_commission, closing_reason, closed_deal)
-
-                if closed_trade is not None:
-                    logger.info({
-                        "event": "trade_closed",
-                        "trade_id": closed_trade.id,
-                        "symbol": closed_trade.symbol,
-                    })
-                else:
-                    error_msg = f"Failed to close trade {ticket}."
-                    logger.error({"error": error_msg, "ticket": ticket})
-
-            except Exception as e:
-                error_msg = f"Error processing closed ticket {ticket}: {e}\n{traceback.format_exc()}"
-                logger.error({"error": error_msg, "ticket": ticket})
+            reconcile_closed_position(ticket, position, current_time)
 
         # Update cached_positions with current open positions
         for index, position in positions.iterrows():
@@ -2,6 +2,9 @@ from app.utils.constants import CRYPTOCURRENCIES, TIMEZONE, MT5Timeframe
 
 PAIRS = ['NG', 'BRN', 'WTI', 'XAGUSD', 'XAUUSD', 'XAUEUR', 'EURUSD', 'EURGBP', 'USDJPY', 'USDCAD', 'USDCHF', 'AUDUSD', 'NZDUSD']
 MAIN_TIMEFRAME = MT5Timeframe.M15
+NUM_BARS = 100
+BOLLINGER_WINDOW = 20
+BOLLINGER_NUM_STD_DEV = 2
 
 TP_PNL_MULTIPLIER = 0.5
 SL_PNL_MULTIPLIER = -0.5
@@ -1,5 +1,6 @@
 # backend/django/app/quant/algorithms/mean_reversion/entry.py
 
+import asyncio
 import pandas as pd
 import requests
 import logging
@@ -10,50 +11,170 @@ import traceback
 
 from app.utils.arithmetics import calculate_order_capital, calculate_order_size_usd, calculate_commission, get_price_at_pnl, get_pnl_at_price, convert_usd_to_lots
 from app.utils.constants import MT5Timeframe
-from app.utils.api.data import fetch_data_pos, symbol_info_tick
 from app.utils.api.positions import get_positions
-from app.utils.api.order import send_market_order
+from app.utils.api.order import send_market_orders
+from app.utils.api import aio
 from app.utils.constants import TIMEZONE
 from app.utils.account import have_open_positions_in_symbol
 from app.utils.market import is_market_open
+from app.utils.snapshot import CycleSnapshot, GatheredSnapshot
+from app.utils.instruments import instruments
 from app.quant.indicators.mean_reversion import mean_reversion
-from app.quant.algorithms.mean_reversion.config import PAIRS, MAIN_TIMEFRAME, TP_PNL_MULTIPLIER, SL_PNL_MULTIPLIER, LEVERAGE, DEVIATION, CAPITAL_PER_TRADE, TRAILING_STOP_STEPS
+from app.quant.algorithms.mean_reversion.config import PAIRS, MAIN_TIMEFRAME, NUM_BARS, BOLLINGER_WINDOW, BOLLINGER_NUM_STD_DEV, TP_PNL_MULTIPLIER, SL_PNL_MULTIPLIER, LEVERAGE, DEVIATION, CAPITAL_PER_TRADE, TRAILING_STOP_STEPS
 from app.utils.db.create import create_trade
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+async def fetch_cycle_state(pairs):
+    """
+    Bollinger signals and a snapshot of every pair for one cycle; the snapshot is None
+    when the open positions could not be read. The gateway calls run concurrently, at
+    most aio.MAX_CONCURRENCY at once, so this takes about as long as the slowest call
+    rather than the sum of all of them.
+    """
+    # The gateway evaluates the bands on its cached bars, so only a few numbers per
+    # pair come back. The snapshot has positions, ticks and specs of every pair, and
+    # the bars too, so a failed signals call needs no second round trip to evaluate
+    # the bands here.
+    signals, snapshot = await asyncio.gather(
+        aio.get_bollinger_signals(pairs, MAIN_TIMEFRAME, BOLLINGER_WINDOW, BOLLINGER_NUM_STD_DEV),
+        aio.run(CycleSnapshot.fetch, pairs, MAIN_TIMEFRAME, NUM_BARS)
+    )
+
+    bars = NUM_BARS if signals is None else 0
+    if snapshot is None:
+        snapshot = await GatheredSnapshot.gather(pairs, MAIN_TIMEFRAME, bars)
+    elif not bars:
+        snapshot.drop_bars()
+    return signals, snapshot
+
+def record_order(order, pair, signal, order_type, order_capital, order_size_usd, order_volume_lots,
+                 desired_sl_pnl, commission, last_tick_price, tick_info, sl_including_commission,
+                 sl_excluding_commission):
+    """Log the outcome of one entry order and record it in the DB when it was filled."""
+    if order is not None:
+        trade_info = {
+            'event': 'trade_opened',
+            'symbol': pair,
+            'entry_condition': f"{signal.upper()} MEAN REVERSION DETECTED",
+            'order_capital': f"${order_capital:.5f}",
+            'order_size_usd': f"${order_size_usd:.5f}",
+            'sl_pnl_multiplier': f"{SL_PNL_MULTIPLIER * 100}%",
+            'desired_sl_pnl': f"${desired_sl_pnl:.5f}",
+            'commission': f"${commission:.5f}",
+            'order_info': {
+                'order': order,  # Include the entire order response
+                'type': order_type,
+                "sl": sl_including_commission,
+            },
+            'tick_info': tick_info,
+            'sl_including_commission': {
+                'sl_including_commission': f"${sl_including_commission:.5f}",
+                'sl_price_difference_including_commission': f"${(sl_including_commission - last_tick_price):.5f}",
+                'sl_price_difference_percentage_including_commission': f"{(sl_including_commission / last_tick_price - 1) * 100:.5f}%",
+                'pnl_at_sl_including_commission': f"${get_pnl_at_price(sl_including_commission, last_tick_price, order_size_usd, LEVERAGE, order_type, commission)[1]:.5f}",
+            },
+            'sl_excluding_commission': {
+                'sl_excluding_commission': f"${sl_excluding_commission:.5f}",
+                'sl_price_difference_excluding_commission': f"${(sl_excluding_commission - last_tick_price):.5f}",
+                'sl_price_difference_percentage_excluding_commission': f"{(sl_excluding_commission / last_tick_price - 1) * 100:.5f}%",
+                'pnl_at_sl_excluding_commission': f"${get_pnl_at_price(sl_excluding_commission, last_tick_price, order_size_usd, LEVERAGE, order_type, commission)[1]:.5f}",
+            },
+        }
+
+        try:
+            create_trade(order, pair, order_capital, order_size_usd, 
+                         LEVERAGE, commission, order_type, 'Alpari',
+                         'FOREX', 'MEAN REVERSION', MAIN_TIMEFRAME, order_volume_lots,
+                         sl_including_commission, None)
+        except Exception as e:
+            error_msg = f"Error creating trade record in DB: {e}\n{traceback.format_exc()}"
+            logger.error(error_msg)
+
+        info_msg = f"Order placed successfully for {pair}"
+        logger.info(info_msg, order, trade_info)
+    else:
+        trade_info = {
+            'event': 'trade_failed_to_open',
+            'entry_condition': f"{signal.upper()} MEAN REVERSION DETECTED",
+            'symbol': pair,
+            'type': order_type,
+            'order_capital': f"${order_capital:.5f}",
+            'order_volume_lots': f"{order_volume_lots} lots",
+            'order_size_usd': f"${order_size_usd:.5f}",
+            'sl_pnl_multiplier': f"{SL_PNL_MULTIPLIER * 100}%",
+            'desired_sl_pnl': f"${desired_sl_pnl:.5f}",
+            'commission': f"${commission:.5f}",
+            'tick_info': tick_info,
+            'sl_including_commission': {
+                'sl_including_commission': f"${sl_including_commission:.5f}",
+                'sl_price_difference_including_commission': f"${(sl_including_commission - last_tick_price):.5f}",
+                'sl_price_difference_percentage_including_commission': f"{(sl_including_commission / last_tick_price - 1) * 100:.5f}%",
+                'pnl_at_sl_including_commission': f"${get_pnl_at_price(sl_including_commission, last_tick_price, order_size_usd, LEVERAGE, order_type, commission)[1]:.5f}",
+            },
+            'sl_excluding_commission': {
+                'sl_excluding_commission': f"${sl_excluding_commission:.5f}",
+                'sl_price_difference_excluding_commission': f"${(sl_excluding_commission - last_tick_price):.5f}",
+                'sl_price_difference_percentage_excluding_commission': f"{(sl_excluding_commission / last_tick_price - 1) * 100:.5f}%",
+                'pnl_at_sl_excluding_commission': f"${get_pnl_at_price(sl_excluding_commission, last_tick_price, order_size_usd, LEVERAGE, order_type, commission)[1]:.5f}",
+            },
+        }
+        error_msg = f"Order failed to open for {pair}"
+        logger.error(error_msg, order, trade_info)
+
 def entry_algorithm():
     try:
+        signals, snapshot = asyncio.run(fetch_cycle_state(PAIRS))
+        if snapshot is None:
+            # Without the open positions, any pair could get a duplicate trade
+            logger.error("Skipping entry cycle, open positions could not be read")
+            return
+
+        # Pairs are evaluated in PAIRS order from the state fetched above; the orders of
+        # the pairs that qualify are collected and sent together after the loop
+        orders = []
+        candidates = []
         for pair in PAIRS:            
             logger.info(f"Checking {pair} for open positions.")
-            if have_open_positions_in_symbol(pair):
+            if have_open_positions_in_symbol(pair, snapshot=snapshot):
                 logger.info(f"Skipping {pair} because it has open positions.")
                 continue
 
-            if not is_market_open(pair):
+            if not is_market_open(pair, snapshot=snapshot):
                 logger.info(f"Skipping {pair} because the market is not open.")
                 continue
                 
-            df = fetch_data_pos(pair, MAIN_TIMEFRAME, 10)
-            if df is None or df.empty:
-                logger.info(f"Skipping {pair} because there is no data.")
-                continue
-            
-            df['mean_reversion'] = mean_reversion(df)
-            last_row = df.iloc[-2]
+            if signals is not None:
+                if pair not in signals:
+                    logger.info(f"Skipping {pair} because there is no data.")
+                    continue
+                signal = signals[pair]['signal']
+            else:
+                df = snapshot.bars(pair)
+                if df is None or df.empty:
+                    logger.info(f"Skipping {pair} because there is no data.")
+                    continue
 
-            tick_info = symbol_info_tick(pair)
+                df['mean_reversion'] = mean_reversion(df, BOLLINGER_WINDOW, BOLLINGER_NUM_STD_DEV)
+                signal = df['mean_reversion'].iloc[-2]
+
+            tick_info = snapshot.symbol_info_tick(pair)
             if tick_info is None or tick_info.empty:
                 logger.info(f"Skipping {pair} because there is no tick info.")
                 continue
 
             order_capital = CAPITAL_PER_TRADE
-            order_type = 'BUY' if last_row['mean_reversion'] == 'bottom' else 'SELL'
+            order_type = 'BUY' if signal == 'bottom' else 'SELL'
             last_tick_price = tick_info['ask'].iloc[0] if order_type == 'BUY' else tick_info['bid'].iloc[0]
-            price_decimals = len(str(last_tick_price).split('.')[-1])
+            try:
+                instrument = instruments.get(pair, snapshot)
+            except ValueError as e:
+                logger.info(f"Skipping {pair}: {e}")
+                continue
+            price_decimals = instrument.digits
             order_size_usd = calculate_order_size_usd(order_capital, LEVERAGE)
-            order_volume_lots = convert_usd_to_lots(pair, order_size_usd, order_type)
+            order_volume_lots = convert_usd_to_lots(pair, order_size_usd, order_type, snapshot=snapshot, price=last_tick_price)
 
             # Validate that 'order_volume_lots' is a float
             if isinstance(order_volume_lots, (pd.Series, pd.DataFrame)):
@@ -67,7 +188,7 @@ def entry_algorithm():
             desired_sl_pnl = order_capital * SL_PNL_MULTIPLIER
             commission = calculate_commission(order_size_usd, pair)
 
-            if last_row['mean_reversion'] in ['top', 'bottom']:
+            if signal in ['top', 'bottom']:
                 sl_including_commission, sl_excluding_commission = get_price_at_pnl(
                     desired_pnl=desired_sl_pnl,
                     commission=commission,
@@ -88,91 +209,42 @@ def entry_algorithm():
                         logger.error({'error_msg': error_msg, 'sl_including_commission': sl_including_commission, 'tick_info': tick_info})
                         continue
                 
-                order = send_market_order(
-                    symbol=pair,
-                    volume=order_volume_lots,
-                    order_type=order_type,
-                    sl=round(sl_including_commission, price_decimals),
-                    deviation=DEVIATION,
-                    type_filling="ORDER_FILLING_FOK",
-                    position_size_usd=order_size_usd,
-                    commission=commission,
-                    capital=order_capital,
-                    leverage=LEVERAGE
-                )
-
-                if order is not None:
-                    trade_info = {
-                        'event': 'trade_opened',
-                        'symbol': pair,
-                        'entry_condition': f"{last_row['mean_reversion'].upper()} MEAN REVERSION DETECTED",
-                        'order_capital': f"${order_capital:.5f}",
-                        'order_size_usd': f"${order_size_usd:.5f}",
-                        'sl_pnl_multiplier': f"{SL_PNL_MULTIPLIER * 100}%",
-                        'desired_sl_pnl': f"${desired_sl_pnl:.5f}",
-                        'commission': f"${commission:.5f}",
-                        'order_info': {
-                            'order': order,  # Include the entire order response
-                            'type': order_type,
-                            "sl": sl_including_commission,
-                        },
-                        'tick_info': tick_info,
-                        'sl_including_commission': {
-                            'sl_including_commission': f"${sl_including_commission:.5f}",
-                            'sl_price_difference_including_commission': f"${(sl_including_commission - last_tick_price):.5f}",
-                            'sl_price_difference_percentage_including_commission': f"{(sl_including_commission / last_tick_price - 1) * 100:.5f}%",
-                            'pnl_at_sl_including_commission': f"${get_pnl_at_price(sl_including_commission, last_tick_price, order_size_usd, LEVERAGE, order_type, commission)[1]:.5f}",
-                        },
-                        'sl_excluding_commission': {
-                            'sl_excluding_commission': f"${sl_excluding_commission:.5f}",
-                            'sl_price_difference_excluding_commission': f"${(sl_excluding_commission - last_tick_price):.5f}",
-                            'sl_price_difference_percentage_excluding_commission': f"{(sl_excluding_commission / last_tick_price - 1) * 100:.5f}%",
-                            'pnl_at_sl_excluding_commission': f"${get_pnl_at_price(sl_excluding_commission, last_tick_price, order_size_usd, LEVERAGE, order_type, commission)[1]:.5f}",
-                        },
-                    }
-
-                    try:
-                        create_trade(order, pair, order_capital, order_size_usd, 
-                                     LEVERAGE, commission, order_type, 'Alpari',
-                                     'FOREX', 'MEAN REVERSION', MAIN_TIMEFRAME, order_volume_lots,
-                                     sl_including_commission, None)
-                    except Exception as e:
-                        error_msg = f"Error creating trade record in DB: {e}\n{traceback.format_exc()}"
-                        logger.error(error_msg)
-
-                    info_msg = f"Order placed successfully for {pair}"
-                    logger.info(info_msg, order, trade_info)
-                else:
-                    trade_info = {
-                        'event': 'trade_failed_to_open',
-                        'entry_condition': f"{last_row['mean_reversion'].upper()} MEAN REVERSION DETECTED",
-                        'symbol': pair,
-                        'type': order_type,
-                        'order_capital': f"${order_capital:.5f}",
-                        'order_volume_lots': f"{order_volume_lots} lots",
-                        'order_size_usd': f"${order_size_usd:.5f}",
-                        'sl_pnl_multiplier': f"{SL_PNL_MULTIPLIER * 100}%",
-                        'desired_sl_pnl': f"${desired_sl_pnl:.5f}",
-                        'commission': f"${commission:.5f}",
-                        'tick_info': tick_info,
-                        'sl_including_commission': {
-                            'sl_including_commission': f"${sl_including_commission:.5f}",
-                            'sl_price_difference_including_commission': f"${(sl_including_commission - last_tick_price):.5f}",
-                            'sl_price_difference_percentage_including_commission': f"{(sl_including_commission / last_tick_price - 1) * 100:.5f}%",
-                            'pnl_at_sl_including_commission': f"${get_pnl_at_price(sl_including_commission, last_tick_price, order_size_usd, LEVERAGE, order_type, commission)[1]:.5f}",
-                        },
-                        'sl_excluding_commission': {
-                            'sl_excluding_commission': f"${sl_excluding_commission:.5f}",
-                            'sl_price_difference_excluding_commission': f"${(sl_excluding_commission - last_tick_price):.5f}",
-                            'sl_price_difference_percentage_excluding_commission': f"{(sl_excluding_commission / last_tick_price - 1) * 100:.5f}%",
-                            'pnl_at_sl_excluding_commission': f"${get_pnl_at_price(sl_excluding_commission, last_tick_price, order_size_usd, LEVERAGE, order_type, commission)[1]:.5f}",
-                        },
-                    }
-                    error_msg = f"Order failed to open for {pair}"
-                    logger.error(error_msg, order, trade_info)
+                orders.append({
+                    'symbol': pair,
+                    'volume': order_volume_lots,
+                    'order_type': order_type,
+                    'sl': round(sl_including_commission, price_decimals),
+                    'deviation': DEVIATION,
+                    'type_filling': "ORDER_FILLING_FOK"
+                })
+                candidates.append({
+                    'pair': pair,
+                    'signal': signal,
+                    'order_type': order_type,
+                    'order_capital': order_capital,
+                    'order_size_usd': order_size_usd,
+                    'order_volume_lots': order_volume_lots,
+                    'desired_sl_pnl': desired_sl_pnl,
+                    'commission': commission,
+                    'last_tick_price': last_tick_price,
+                    'tick_info': tick_info,
+                    'sl_including_commission': sl_including_commission,
+                    'sl_excluding_commission': sl_excluding_commission
+                })
             else:
                 message = f"No mean reversion detected for {pair}."
                 logger.info(message)
+
+        if not orders:
+            return
+
+        # All of the cycle's orders go out in one request, which the gateway runs as a
+        # single trade-lane job, so no reads are queued between them
+        results = send_market_orders(orders)
+        if results is None:
+            results = [None] * len(orders)
+        for order, candidate in zip(results, candidates):
+            record_order(order, **candidate)
         
     except requests.RequestException as e:
         error_msg = f"Error fetching MT5 data: {str(e)}"
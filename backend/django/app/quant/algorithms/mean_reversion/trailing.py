@@ -23,10 +23,11 @@ from app.utils.arithmetics import (
 from app.utils.constants import MT5Timeframe, TIMEZONE
 from app.utils.api.data import fetch_data_pos, symbol_info_tick
 from app.utils.api.positions import get_positions
-from app.utils.api.order import modify_sl_tp
+from app.utils.api.order import modify_sl_tp_batch
 from app.utils.api.ticket import get_order_from_ticket, get_deal_from_ticket
 from app.utils.db.mutation import mutate_trade
 from app.utils.db.get import get_trade_with_mutations
+from app.utils.snapshot import CycleSnapshot
 from app.quant.algorithms.mean_reversion.config import (
     PAIRS,
     MAIN_TIMEFRAME,
@@ -44,21 +45,28 @@ logger = logging.getLogger(__name__)
 EPSILON = 1e-4  # Define an appropriate epsilon value
 
 
-def trailing_stop_algorithm():
+def trailing_stop_algorithm(snapshot=None):
     """
     Continuously monitors open trades, detects closed trades, manages trailing stops,
     and sends notifications. Utilizes a cached state to detect changes in open positions
     and interacts with the MT5 API and Django models.
+
+    Positions and symbol specs are read from a CycleSnapshot, fetched here unless one is passed in.
+    SL changes are collected over the cycle and sent to the gateway in one batch.
     """
 
     try:
         current_time = datetime.now(TIMEZONE).replace(microsecond=0)
-        positions = get_positions()
+        if snapshot is None:
+            snapshot = CycleSnapshot.fetch([])
+        positions = snapshot.positions if snapshot is not None else get_positions()
 
         if positions.empty:
             logger.info('No positions found')
             return
 
+        sl_updates = []
+
         for index, position in positions.iterrows():
             logger.info('Starting position timer')
             position_start_time = perf_counter()  # Start timing for the position
@@ -141,7 +149,7 @@ def trailing_stop_algorithm():
                                 'capital_used': f"${trade.capital:.5f}",
                                 'position_size': f"${trade.position_size_usd:.5f}",
                                 'deduced_volume': f"${calculate_trade_volume(position.price_open, position.price_current, position.profit, trade.leverage):.5f}",
-                                'deduced_volume_lots': f"${convert_usd_to_lots(position.symbol, trade.position_size_usd, trade.type):.5f}",
+                                'deduced_volume_lots': f"${convert_usd_to_lots(position.symbol, trade.position_size_usd, trade.type, snapshot=snapshot, price=position.price_current):.5f}",
                                 'commission': f"${trade.order_commission:.5f}",
                             },
                             'trigger_data': {
@@ -170,19 +178,8 @@ def trailing_stop_algorithm():
                             }
                         }
 
-                        # Modify the Stop Loss and Take Profit
-                        modify_request = modify_sl_tp(position, new_sl_price)
-                        if modify_request is not None:
-                            logger.info({'message': 'successfully modified sl from mt5 api', 'modify_request': modify_request, 'sl_info': sl_info})
-
-                            # Create a mutation record in the database
-                            mutation = mutate_trade(position, current_time, new_sl_price, pnl_at_new_sl)
-                            if mutation is not None:
-                                logger.info({'message': 'mutation created', 'mutation': mutation})
-                            else:
-                                logger.info({'message': 'mutation creation failed', 'sl_info': sl_info})
-                        else:
-                            logger.info({'message': 'failed to modify sl from mt5 api', 'sl_info': sl_info})
+                        # Queue the Stop Loss change; the cycle's changes are sent together below
+                        sl_updates.append((position, new_sl_price, pnl_at_new_sl, sl_info))
                         
                         # End timing for the trailing step
                         trailing_end_time = perf_counter()
@@ -200,6 +197,29 @@ def trailing_stop_algorithm():
             position_duration = position_end_time - position_start_time
             logger.info(f"Processed position {position.ticket} in {position_duration:.4f} seconds.")
 
+        if not sl_updates:
+            return
+
+        # Modify the Stop Loss of every triggered position in one request
+        modify_requests = modify_sl_tp_batch([
+            {'position': position, 'sl': new_sl_price} for position, new_sl_price, _, _ in sl_updates
+        ])
+        if modify_requests is None:
+            modify_requests = [None] * len(sl_updates)
+
+        for (position, new_sl_price, pnl_at_new_sl, sl_info), modify_request in zip(sl_updates, modify_requests):
+            if modify_request is not None:
+                logger.info({'message': 'successfully modified sl from mt5 api', 'modify_request': modify_request, 'sl_info': sl_info})
+
+                # Create a mutation record in the database
+                mutation = mutate_trade(position, current_time, new_sl_price, pnl_at_new_sl)
+                if mutation is not None:
+                    logger.info({'message': 'mutation created', 'mutation': mutation})
+                else:
+                    logger.info({'message': 'mutation creation failed', 'sl_info': sl_info})
+            else:
+                logger.info({'message': 'failed to modify sl from mt5 api', 'sl_info': sl_info})
+
     except Exception as e:
         error_msg = f"Exception in trailing_stop_algorithm: {e}\n{traceback.format_exc()}"
         logger.error(error_msg)
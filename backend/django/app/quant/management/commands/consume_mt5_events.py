@@ -0,0 +1,37 @@
+# backend/django/app/quant/management/commands/consume_mt5_events.py
+
+from django.core.management.base import BaseCommand
+from app.utils.events import iter_events, dispatch, get_client, register_handler, POSITION_CLOSED
+from app.quant.algorithms.close.close import handle_position_closed
+from django.conf import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Consumes position and deal events from the MT5 gateway and runs the matching handlers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--consumer', help='Consumer name within the group (defaults to the hostname).')
+        parser.add_argument('--block-ms', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        register_handler(POSITION_CLOSED, handle_position_closed)
+
+        client = get_client()
+        stream = settings.MT5_EVENTS_STREAM
+        group = settings.MT5_EVENTS_GROUP
+
+        logger.info(f"Consuming MT5 events from {stream} as group {group}...")
+        try:
+            for entry_id, event in iter_events(client, stream, group, options['consumer'], options['block_ms']):
+                logger.info({'event': event['type'], 'ticket': event['ticket'], 'symbol': event['symbol']})
+                # Failed entries stay pending and are retried when the consumer restarts
+                if dispatch(event):
+                    client.xack(stream, group, entry_id)
+        except KeyboardInterrupt:
+            logger.info("MT5 event consumer stopped manually.")
+        except Exception as e:
+            logger.error(f"Unhandled exception: {e}", exc_info=True)
+            raise
@@ -1,3 +1,247 @@
-from django.test import TestCase
+import importlib.util
+import io
+import json
+import os
+import threading
+import time
+import unittest
+from itertools import islice
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.test import SimpleTestCase
+
+try:
+    import fakeredis
+except ImportError:  # Event tests need a Redis stand-in
+    fakeredis = None
+
+from app.utils import events
+from app.utils.api import bars_cache, data
+
+
+def _load_gateway_codec():
+    """The gateway's codec.py from the same checkout, or None where it cannot be imported."""
+    path = Path(__file__).resolve().parents[3] / 'mt5' / 'app' / 'codec.py'
+    if not path.exists():
+        return None
+    spec = importlib.util.spec_from_file_location('gateway_codec', path)
+    module = importlib.util.module_from_spec(spec)
+    try:
+        spec.loader.exec_module(module)
+    except ImportError:
+        return None
+    return module
+
+
+gateway_codec = _load_gateway_codec()
+
+
+def _add_event(client, stream, event_type, ticket):
+    return client.xadd(stream, {
+        'type': event_type,
+        'ticket': ticket,
+        'symbol': 'EURUSD',
+        'version': 1,
+        'time': 1700000000.0,
+        'data': json.dumps({'ticket': ticket, 'symbol': 'EURUSD'})
+    })
+
+
+@unittest.skipUnless(fakeredis, "fakeredis is not installed")
+class EventConsumerTests(SimpleTestCase):
+    stream = 'test:events'
+    group = 'test'
+
+    def setUp(self):
+        self.client = fakeredis.FakeRedis()
+        # iter_events would create it on first read, at the end of the stream
+        self.client.xgroup_create(self.stream, self.group, id='$', mkstream=True)
+
+    def consume(self, count, consumer='worker-1'):
+        return list(islice(events.iter_events(self.client, self.stream, self.group, consumer, block_ms=10), count))
+
+    def test_decodes_events(self):
+        _add_event(self.client, self.stream, events.POSITION_CLOSED, 7)
+
+        [(entry_id, event)] = self.consume(1)
+        self.assertEqual(event['type'], events.POSITION_CLOSED)
+        self.assertEqual(event['ticket'], 7)
+        self.assertEqual(event['version'], 1)
+        self.assertEqual(event['data'], {'ticket': 7, 'symbol': 'EURUSD'})
+
+    def test_unacknowledged_events_are_redelivered_first(self):
+        first = _add_event(self.client, self.stream, events.POSITION_OPENED, 1)
+        second = _add_event(self.client, self.stream, events.POSITION_CLOSED, 1)
+
+        entries = self.consume(2)
+        self.assertEqual([entry_id for entry_id, _ in entries], [first, second])
+        self.client.xack(self.stream, self.group, first)
+
+        # A restarted consumer gets its pending entry back before anything new
+        third = _add_event(self.client, self.stream, events.DEAL, 2)
+        entries = self.consume(2)
+        self.assertEqual([entry_id for entry_id, _ in entries], [second, third])
+
+    def test_malformed_events_are_acknowledged_and_skipped(self):
+        self.client.xadd(self.stream, {'type': events.DEAL, 'ticket': 'not a ticket'})
+        valid = _add_event(self.client, self.stream, events.DEAL, 3)
+
+        [(entry_id, event)] = self.consume(1)
+        self.assertEqual(entry_id, valid)
+        self.assertEqual(self.client.xpending(self.stream, self.group)['pending'], 1)
+
+    def test_dispatch_reports_failed_handlers(self):
+        handled = []
+        events.register_handler('test_event', handled.append)
+        events.register_handler('test_event', lambda event: 1 / 0)
+        self.addCleanup(events._handlers.pop, 'test_event')
+
+        event = {'type': 'test_event', 'ticket': 1}
+        self.assertFalse(events.dispatch(event))
+        self.assertEqual(handled, [event])
+
+
+@unittest.skipUnless(gateway_codec, "the gateway's codec.py is not importable here")
+class TicksDeltaCodecTests(SimpleTestCase):
+    """The decoder in app.utils.api.data is a copy of the gateway's; these keep them in step."""
+
+    def ticks(self, count):
+        ticks = np.zeros(count, dtype=data.TICK_DTYPE)
+        ticks['time_msc'] = 1700000000000 + np.arange(count) * 250
+        ticks['time'] = ticks['time_msc'] // 1000
+        ticks['bid'] = np.round(1.085 + np.arange(count) % 7 * 0.00001, 5)
+        ticks['ask'] = ticks['bid'] + 0.00012
+        ticks['volume'] = np.arange(count) * 3
+        ticks['flags'] = 6
+        ticks['volume_real'] = np.arange(count) * 1.5
+        return ticks
+
+    def assert_round_trip(self, ticks, digits=5):
+        decoded = data.decode_ticks_delta(gateway_codec.encode_ticks_delta(ticks, digits))
+        self.assertEqual(decoded.dtype, data.TICK_DTYPE)
+        for field in data.TICK_DTYPE.names:
+            np.testing.assert_array_equal(decoded[field], ticks[field], err_msg=field)
+
+    def test_layout_matches_gateway(self):
+        self.assertEqual(data.TICK_DTYPE, gateway_codec.TICK_DTYPE)
+        self.assertEqual(data.TICK_COLUMNS, gateway_codec.TICK_COLUMNS)
+        self.assertEqual(data.TICKS_DELTA_VERSION, gateway_codec.TICKS_DELTA_VERSION)
+        for name in ('TICK_CHUNK_HEADER', 'TICK_COLUMN_HEADER', 'TICK_FIRST_VALUE'):
+            self.assertEqual(getattr(data, name).format, getattr(gateway_codec, name).format, name)
+
+    def test_round_trip(self):
+        self.assert_round_trip(self.ticks(1000))
+
+    def test_single_and_empty_chunks(self):
+        self.assert_round_trip(self.ticks(1))
+        self.assert_round_trip(self.ticks(0))
+
+    def test_wide_deltas(self):
+        ticks = self.ticks(4)
+        ticks['time_msc'] = [0, 1, 2 ** 40, 2 ** 40 + 1]
+        ticks['time'] = ticks['time_msc'] // 1000
+        ticks['volume'] = [0, 2 ** 33, 0, 2 ** 62]
+        self.assert_round_trip(ticks)
+
+    def test_prices_off_the_digits_grid_are_sent_raw(self):
+        ticks = self.ticks(10)
+        ticks['bid'][3] = 1.0850012345
+        self.assert_round_trip(ticks)
+
+
+def _bars(start, count):
+    rates = np.zeros(count, dtype=[('time', '<i8'), ('close', '<f8')])
+    rates['time'] = start + 60 * np.arange(count)
+    rates['close'] = 1.1 + np.arange(count) * 0.0001
+    return rates
+
+
+class FakeGateway:
+    """gateway.get for /fetch_data_pos, answering with the last num_bars of `rates` as .npy."""
+
+    def __init__(self, rates):
+        self.rates = rates
+        self.counts = []
+        self.release = None
+
+    def get(self, path, params=None, **kwargs):
+        self.counts.append(params['num_bars'])
+        if self.release is not None:
+            self.release.wait(5)
+        buffer = io.BytesIO()
+        np.save(buffer, self.rates[-params['num_bars']:], allow_pickle=False)
+        return SimpleNamespace(ok=True, status_code=200, text='', content=buffer.getvalue())
+
+
+@unittest.skipUnless(fakeredis, "fakeredis is not installed")
+class BarsCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        self.gateway = FakeGateway(_bars(1700000000, 100))
+        patch = mock.patch.object(bars_cache, 'gateway', self.gateway)
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.server = fakeredis.FakeServer()
+        self.cache = self.worker()
+
+    def worker(self):
+        """A BarsCache as another worker process would have, on the same Redis."""
+        cache = bars_cache.BarsCache('redis://test', min_bars=10)
+        cache._client = fakeredis.FakeRedis(server=self.server)
+        cache._pid = os.getpid()
+        return cache
+
+    def expire(self):
+        self.cache.client.hset(self.cache.key('EURUSD', 'M1'), 'expires', 0)
+
+    def test_hit_before_expiry(self):
+        first = self.cache.get_rates('EURUSD', 'M1', 5)
+        np.testing.assert_array_equal(first, self.gateway.rates[-5:])
+        np.testing.assert_array_equal(self.cache.get_rates('EURUSD', 'M1', 10), self.gateway.rates[-10:])
+        self.assertEqual(self.gateway.counts, [10])
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_delta_refresh_after_expiry(self):
+        self.cache.get_rates('EURUSD', 'M1', 10)
+        # One bar closed and a new one opened
+        self.gateway.rates['close'][-1] += 0.001
+        self.gateway.rates = np.concatenate([self.gateway.rates, _bars(self.gateway.rates['time'][-1] + 60, 1)])
+        self.expire()
+
+        np.testing.assert_array_equal(self.cache.get_rates('EURUSD', 'M1', 10), self.gateway.rates[-10:])
+        self.assertEqual(self.gateway.counts, [10, 2])
+        self.assertEqual((self.cache.deltas, self.cache.full_fetches), (1, 1))
+
+    def test_waiting_worker_reads_the_refresh(self):
+        other = self.worker()
+        self.gateway.release = threading.Event()
+        results = {}
+
+        def read(name, cache):
+            results[name] = cache.get_rates('EURUSD', 'M1', 10)
+
+        first = threading.Thread(target=read, args=('first', self.cache))
+        first.start()
+        deadline = time.monotonic() + 5
+        while not self.gateway.counts and time.monotonic() < deadline:
+            time.sleep(0.01)
+        # The first worker holds the lock while it fetches, so the second one waits on it
+        second = threading.Thread(target=read, args=('second', other))
+        second.start()
+        time.sleep(0.3)
+        self.gateway.release.set()
+        first.join(5)
+        second.join(5)
+
+        self.assertEqual(self.gateway.counts, [10])
+        self.assertEqual(other.hits, 1)
+        np.testing.assert_array_equal(results['second'], results['first'])
+
+    def test_redis_failure_returns_none(self):
+        with mock.patch.object(self.cache.client, 'hgetall', side_effect=bars_cache.redis.ConnectionError("down")):
+            self.assertIsNone(self.cache.get_rates('EURUSD', 'M1', 10))
+        self.assertEqual(self.cache.errors, 1)
+        self.assertEqual(self.gateway.counts, [])
@@ -204,6 +204,11 @@ CELERY_BROKER_CONNECTION_RETRY = True
 CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True  # To retain existing behavior
 CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://redis:6379/0')
 CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', 'redis://redis:6379/0')
+
+# Position and deal events published by the MT5 gateway
+MT5_EVENTS_REDIS_URL = os.getenv('MT5_EVENTS_REDIS_URL', 'redis://redis:6379/0')
+MT5_EVENTS_STREAM = os.getenv('MT5_EVENTS_STREAM', 'mt5:events')
+MT5_EVENTS_GROUP = os.getenv('MT5_EVENTS_GROUP', 'django')
 CELERY_BEAT_SCHEDULE = {
     'run-quant-entry-algorithm': {
         'task': 'quant.tasks.run_quant_entry_algorithm',  # This should match the @shared_task name
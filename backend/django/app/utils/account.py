@@ -2,13 +2,21 @@ import pandas as pd
 import logging
 import traceback
 
-from app.utils.api.positions import get_positions
+from app.utils.api.positions import get_positions_versioned
 
 logger = logging.getLogger(__name__)
 
-def have_open_positions_in_symbol(symbol):
+def have_open_positions_in_symbol(symbol, snapshot=None):
     try:
-        positions = get_positions()
+        if snapshot is not None:
+            return snapshot.have_open_positions_in_symbol(symbol)
+
+        # Only needs which symbols are open, so the delta-polled book is enough
+        positions = get_positions_versioned()
+        if positions is None:
+            # Unknown counts as taken, so a failed read never opens a duplicate position
+            logger.error(f"Positions could not be read, treating {symbol} as having open positions")
+            return True
         # Handle empty DataFrame case
         if not isinstance(positions, pd.DataFrame):
             positions = pd.DataFrame(positions)  # Convert to DataFrame if it's not already
@@ -0,0 +1,59 @@
+import asyncio
+import os
+import weakref
+from functools import wraps
+from typing import Callable, Dict, List
+import logging
+
+from app.utils.api.client import gateway
+from app.utils.api import data, indicators, positions, snapshot, ticket
+
+logger = logging.getLogger(__name__)
+
+# Gateway calls in flight at once per event loop. Defaults to the client's pool size,
+# so no call waits for a pooled connection.
+MAX_CONCURRENCY = int(os.getenv('MT5_API_MAX_CONCURRENCY', gateway.pool_size))
+
+_semaphores = weakref.WeakKeyDictionary()
+
+
+def _semaphore() -> asyncio.Semaphore:
+    # One per event loop: every asyncio.run() starts a new one
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _semaphores[loop] = asyncio.Semaphore(MAX_CONCURRENCY)
+    return semaphore
+
+
+async def run(fn: Callable, *args, **kwargs):
+    """Run a blocking gateway helper in a worker thread, at most MAX_CONCURRENCY at once."""
+    async with _semaphore():
+        return await asyncio.to_thread(fn, *args, **kwargs)
+
+
+def to_async(fn: Callable) -> Callable:
+    @wraps(fn)
+    async def wrapper(*args, **kwargs):
+        return await run(fn, *args, **kwargs)
+    return wrapper
+
+
+async def map_symbols(fn: Callable, symbols: List[str], *args, **kwargs) -> Dict:
+    """Await fn(symbol, *args, **kwargs) for every symbol concurrently. Returns {symbol: result} in symbols order."""
+    results = await asyncio.gather(*(fn(symbol, *args, **kwargs) for symbol in symbols))
+    return dict(zip(symbols, results))
+
+
+# Async versions of the read helpers. They share the pooled client, so they return
+# the same values and log the same errors as the blocking ones.
+symbol_info_tick = to_async(data.symbol_info_tick)
+symbol_info = to_async(data.symbol_info)
+fetch_data_pos = to_async(data.fetch_data_pos)
+fetch_data_panel = to_async(data.fetch_data_panel)
+get_positions = to_async(positions.get_positions)
+get_positions_versioned = to_async(positions.get_positions_versioned)
+get_cycle_snapshot = to_async(snapshot.get_cycle_snapshot)
+get_bollinger_signals = to_async(indicators.get_bollinger_signals)
+history_deals_get = to_async(ticket.history_deals_get)
+history_orders_get = to_async(ticket.history_orders_get)
@@ -0,0 +1,184 @@
+import io
+import os
+import time
+from typing import Optional
+import logging
+
+import numpy as np
+import redis
+
+from app.utils.api.client import gateway
+from app.utils.constants import timeframe_seconds
+
+logger = logging.getLogger(__name__)
+
+
+class BarsCache:
+    """
+    Recent bars per (symbol, timeframe) in Redis, shared by every worker process.
+
+    Each key holds the last bars as an .npy blob of the gateway's structured rates
+    array, plus the time it expires. An entry expires at the next bar close, or after
+    max_age seconds so the still-forming last bar stays current, whichever is first.
+    Refreshing fetches only the bars newer than the last cached one and overwrites
+    the forming bar. A Redis lock per key makes one worker refresh while the others
+    wait and then read its result, so gateway load does not grow with workers.
+
+    MT5 servers are offset from UTC by whole hours, so bars of an hour or less close
+    on the same wall-clock instants everywhere. Longer bars are refreshed every hour.
+    """
+
+    def __init__(self, url: Optional[str], prefix: str = 'mt5:bars', min_bars: int = 500, max_bars: int = 5000,
+                 max_age: float = 5.0, key_ttl: int = 24 * 60 * 60):
+        self.url = url
+        self.prefix = prefix
+        self.min_bars = min_bars
+        self.max_bars = max_bars
+        self.max_age = max_age
+        self.key_ttl = key_ttl
+        self._client = None
+        self._pid = None
+        self.hits = 0
+        self.deltas = 0
+        self.full_fetches = 0
+        self.errors = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            url=os.getenv('BARS_CACHE_REDIS_URL', os.getenv('MT5_EVENTS_REDIS_URL', 'redis://redis:6379/0')) or None,
+            prefix=os.getenv('BARS_CACHE_PREFIX', 'mt5:bars'),
+            min_bars=int(os.getenv('BARS_CACHE_MIN_BARS', 500)),
+            max_bars=int(os.getenv('BARS_CACHE_MAX_BARS', 5000)),
+            max_age=float(os.getenv('BARS_CACHE_MAX_AGE_SECONDS', 5.0)),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.url is not None
+
+    @property
+    def client(self) -> redis.Redis:
+        # Connections must not be shared across forked worker processes
+        if self._client is None or self._pid != os.getpid():
+            self._client = redis.Redis.from_url(self.url)
+            self._pid = os.getpid()
+        return self._client
+
+    def key(self, symbol: str, timeframe: str) -> str:
+        return f"{self.prefix}:{symbol}:{timeframe}"
+
+    def get_rates(self, symbol: str, timeframe: str, count: int) -> Optional[np.ndarray]:
+        """
+        The last count bars as a structured array, like the gateway's fetch_data_pos.
+        Returns None when the cache cannot serve the request (too many bars, Redis or
+        the gateway failing), so the caller fetches directly.
+        """
+        if count <= 0 or count > self.max_bars:
+            return None
+
+        key = self.key(symbol, timeframe)
+        try:
+            entry = self._read(key)
+            if self._serves(entry, count):
+                self.hits += 1
+                return entry['rates'][-count:]
+
+            with self.client.lock(f"{key}:lock", timeout=30, blocking_timeout=10):
+                # Another worker may have refreshed while this one waited
+                entry = self._read(key)
+                if self._serves(entry, count):
+                    self.hits += 1
+                    return entry['rates'][-count:]
+
+                capacity = max(count, self.min_bars, len(entry['rates']) if entry else 0)
+                rates, exhausted = self._refresh(symbol, timeframe, entry, capacity)
+                if rates is None:
+                    return None
+                self._write(key, rates, exhausted, self._expires_at(timeframe, time.time()))
+                return rates[-count:]
+
+        except redis.RedisError as e:
+            self.errors += 1
+            logger.warning(f"Bars cache unavailable for {key}: {e}")
+            return None
+
+    def _serves(self, entry, count) -> bool:
+        if entry is None or entry['expires'] <= time.time():
+            return False
+        return len(entry['rates']) >= count or entry['exhausted']
+
+    def _read(self, key):
+        fields = self.client.hgetall(key)
+        if not fields:
+            return None
+        return {
+            'rates': np.load(io.BytesIO(fields[b'rates']), allow_pickle=False),
+            'expires': float(fields[b'expires']),
+            'exhausted': fields[b'exhausted'] == b'1'
+        }
+
+    def _write(self, key, rates, exhausted, expires):
+        buffer = io.BytesIO()
+        np.save(buffer, rates, allow_pickle=False)
+        pipe = self.client.pipeline()
+        pipe.hset(key, mapping={'rates': buffer.getvalue(), 'expires': expires, 'exhausted': int(exhausted)})
+        pipe.expire(key, self.key_ttl)
+        pipe.execute()
+
+    def _expires_at(self, timeframe, now) -> float:
+        seconds = timeframe_seconds(timeframe)
+        step = seconds if seconds and 3600 % seconds == 0 else 3600
+        return min(now - now % step + step, now + self.max_age)
+
+    def _fetch(self, symbol, timeframe, count) -> Optional[np.ndarray]:
+        params = {'symbol': symbol, 'timeframe': timeframe, 'num_bars': count, 'format': 'npy'}
+        response = gateway.get('/fetch_data_pos', params=params)
+        if not response.ok:
+            logger.error(f"Bars cache fetch failed for {symbol} {timeframe}: {response.status_code} {response.text}")
+            return None
+        return np.load(io.BytesIO(response.content), allow_pickle=False)
+
+    def _refresh(self, symbol, timeframe, entry, capacity):
+        """Returns (rates, exhausted) with the cached window brought up to date."""
+        if entry is None or not len(entry['rates']) or (len(entry['rates']) < capacity and not entry['exhausted']):
+            rates = self._fetch(symbol, timeframe, capacity)
+            if rates is None:
+                return None, False
+            self.full_fetches += 1
+            return rates, len(rates) < capacity
+
+        cached = entry['rates']
+        last_time = cached['time'][-1]
+        count = 2
+        while True:
+            fresh = self._fetch(symbol, timeframe, count)
+            if fresh is None:
+                return None, False
+            # The fresh window overlaps the cache once its first bar is not newer than
+            # the last cached one; otherwise more bars closed than were asked for
+            if not len(fresh) or fresh['time'][0] <= last_time or len(fresh) < count:
+                break
+            if count >= capacity:
+                self.full_fetches += 1
+                return fresh, len(fresh) < capacity
+            count = min(count * 4, capacity)
+
+        self.deltas += 1
+        if not len(fresh):
+            return cached, entry['exhausted']
+        merged = np.concatenate([cached[cached['time'] < fresh['time'][0]], fresh])
+        if len(merged) > capacity:
+            return merged[-capacity:], False
+        return merged, entry['exhausted']
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "deltas": self.deltas,
+            "full_fetches": self.full_fetches,
+            "errors": self.errors
+        }
+
+
+bars_cache = BarsCache.from_env()
@@ -0,0 +1,179 @@
+import os
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Tuple, Union
+from dotenv import load_dotenv
+import logging
+
+import requests
+from requests.adapters import HTTPAdapter
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+CONNECT_TIMEOUT = 3.05
+
+# Read timeouts in seconds for endpoints that take longer than a plain lookup
+ENDPOINT_TIMEOUTS = {
+    '/fetch_data_panel': 30,
+    '/fetch_data_range': 60,
+    '/cycle_snapshot': 15,
+    '/history_deals_get': 30,
+    '/orders/batch': 30,
+    '/modify_sl_tp/batch': 30,
+    '/close_all_positions': 30,
+}
+
+# Gateway answers worth retrying: restarting, MT5 reconnecting or the executor lane full
+RETRY_STATUSES = {502, 503, 504}
+
+Timeout = Union[float, Tuple[float, float]]
+
+
+class GatewayClient:
+    """
+    HTTP client for the MT5 gateway, shared by every app.utils.api module.
+
+    All requests go through one requests.Session, so connections to the gateway are
+    kept alive and reused instead of opened per call. Each path gets its own read
+    timeout. GETs are idempotent and are retried on connection errors, timeouts and
+    RETRY_STATUSES, with exponential backoff and full jitter; POSTs are sent once, so
+    an order is never sent twice. Hooks registered with add_hook are called after
+    every attempt with (method, path, status, elapsed_seconds, attempt), status None
+    when no response came back.
+
+    A forked process (a Celery worker) builds its own session on first use, since
+    pooled sockets must not be shared across processes.
+    """
+
+    def __init__(self, base_url: str, pool_size: int = 10, timeout: float = 10, read_retries: int = 2,
+                 backoff: float = 0.1, timeouts: Dict[str, float] = None):
+        self.base_url = (base_url or '').rstrip('/')
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.read_retries = read_retries
+        self.backoff = backoff
+        self.timeouts = dict(ENDPOINT_TIMEOUTS, **(timeouts or {}))
+        self._hooks: List[Callable] = []
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self._latency = {}
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            base_url=os.getenv('MT5_API_URL'),
+            pool_size=int(os.getenv('MT5_API_POOL_SIZE', 10)),
+            timeout=float(os.getenv('MT5_API_TIMEOUT', 10)),
+            read_retries=int(os.getenv('MT5_API_READ_RETRIES', 2)),
+            backoff=float(os.getenv('MT5_API_RETRY_BACKOFF', 0.1)),
+        )
+
+    @property
+    def session(self) -> requests.Session:
+        with self._lock:
+            if self._session is None or self._pid != os.getpid():
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._session = session
+                self._pid = os.getpid()
+            return self._session
+
+    def add_hook(self, hook: Callable):
+        self._hooks.append(hook)
+
+    def url(self, path: str) -> str:
+        return f"{self.base_url}{path}"
+
+    def timeout_for(self, path: str) -> Tuple[float, float]:
+        return CONNECT_TIMEOUT, self.timeouts.get(path, self.timeout)
+
+    def request(self, method: str, path: str, timeout: Timeout = None, retries: int = None, **kwargs) -> requests.Response:
+        """
+        Send one request to the gateway path and return the response, whatever its
+        status; callers raise_for_status() as before. retries defaults to read_retries
+        for GET and 0 for anything else.
+        """
+        if timeout is None:
+            timeout = self.timeout_for(path)
+        if retries is None:
+            retries = self.read_retries if method == 'GET' else 0
+
+        for attempt in range(retries + 1):
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, self.url(path), timeout=timeout, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                self._record(method, path, None, time.perf_counter() - started, attempt)
+                if attempt == retries:
+                    raise
+            else:
+                self._record(method, path, response.status_code, time.perf_counter() - started, attempt)
+                if response.status_code not in RETRY_STATUSES or attempt == retries:
+                    return response
+                response.close()
+
+            delay = random.uniform(0, self.backoff * 2 ** attempt)
+            logger.warning(f"Retrying {method} {path} in {delay:.3f}s (attempt {attempt + 1} of {retries})")
+            time.sleep(delay)
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        return self.request('POST', path, **kwargs)
+
+    def _record(self, method, path, status, elapsed, attempt):
+        with self._lock:
+            self.requests += 1
+            if attempt:
+                self.retries += 1
+            if status is None or status >= 500:
+                self.failures += 1
+            count, total, peak = self._latency.get(path, (0, 0.0, 0.0))
+            self._latency[path] = (count + 1, total + elapsed, max(peak, elapsed))
+
+        for hook in self._hooks:
+            try:
+                hook(method, path, status, elapsed, attempt)
+            except Exception as e:
+                logger.error(f"Gateway client hook failed: {e}")
+
+    def connections(self) -> int:
+        """Connections opened to the gateway by this process's session so far."""
+        if self._session is None:
+            return 0
+        total = 0
+        for adapter in set(self._session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                total += pools[key].num_connections
+        return total
+
+    def stats(self) -> Dict:
+        with self._lock:
+            latency = {
+                path: {
+                    "requests": count,
+                    "avg_ms": round(total / count * 1000, 3),
+                    "max_ms": round(peak * 1000, 3)
+                }
+                for path, (count, total, peak) in self._latency.items()
+            }
+            return {
+                "requests": self.requests,
+                "connections": self.connections(),
+                "retries": self.retries,
+                "failures": self.failures,
+                "latency": latency
+            }
+
+
+gateway = GatewayClient.from_env()
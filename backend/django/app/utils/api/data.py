@@ -1,23 +1,78 @@
+import io
+import json
 import os
-import requests
+import shutil
+import struct
 import traceback
-from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Iterator, Tuple, Union
+import numpy as np
 import pandas as pd
-from datetime import datetime
-from dotenv import load_dotenv
+from datetime import datetime, timedelta
 import logging
 
-from app.utils.constants import MT5Timeframe
+from app.utils.constants import MT5Timeframe, timeframe_value, timeframe_seconds
+from app.utils.api.client import gateway
+from app.utils.api.bars_cache import bars_cache
 
-load_dotenv()
 logger = logging.getLogger(__name__)
 
-BASE_URL = os.getenv('MT5_API_URL')
+
+NPY_MIMETYPE = 'application/x-npy'
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.stream'
+NPZ_MIMETYPE = 'application/x-npz'
+
+FRAME_HEADER = struct.Struct('>I')
+
+# Delta-encoded tick chunks sent by /fetch_ticks_range and /fetch_ticks_from, see
+# encode_ticks_delta in the gateway's codec for the layout
+TICKS_DELTA_VERSION = 1
+TICK_CHUNK_HEADER = struct.Struct('<BIB')
+TICK_COLUMN_HEADER = struct.Struct('<cB')
+TICK_FIRST_VALUE = struct.Struct('<q')
+TICK_DTYPE = np.dtype([
+    ('time', '<i8'), ('bid', '<f8'), ('ask', '<f8'), ('last', '<f8'), ('volume', '<u8'),
+    ('time_msc', '<i8'), ('flags', '<u4'), ('volume_real', '<f8')
+])
+TICK_COLUMNS = (
+    ('time_msc', None),
+    ('bid', 'price'),
+    ('ask', 'price'),
+    ('last', 'price'),
+    ('volume', None),
+    ('flags', None),
+    ('volume_real', 8),
+)
+DELTA_DTYPES = {1: '<i1', 2: '<i2', 4: '<i4', 8: '<i8'}
+
+def decode_rates(content: bytes, content_type: str) -> pd.DataFrame:
+    """
+    Build a DataFrame from a /fetch_data_* response body.
+
+    Binary bodies are loaded column by column from the structured array the gateway
+    sent, so no per-row Python objects are created. Epoch-second times are converted
+    to UTC timestamps.
+    """
+    content_type = (content_type or '').split(';')[0].strip()
+
+    if content_type == NPY_MIMETYPE:
+        rates = np.load(io.BytesIO(content), allow_pickle=False)
+        df = pd.DataFrame(rates)
+    elif content_type == ARROW_MIMETYPE:
+        import pyarrow as pa
+        df = pa.ipc.open_stream(content).read_all().to_pandas()
+    else:
+        return pd.DataFrame(json.loads(content))
+
+    if 'time' in df.columns:
+        df['time'] = pd.to_datetime(df['time'], unit='s', utc=True)
+
+    return df
 
 def symbol_info_tick(symbol: str) -> pd.DataFrame:
     try:
-        url = f"{BASE_URL}/symbol_info_tick/{symbol}"
-        response = requests.get(url)
+        path = f"/symbol_info_tick/{symbol}"
+        response = gateway.get(path)
         response.raise_for_status()
         
         data = response.json()
@@ -30,8 +85,8 @@ def symbol_info_tick(symbol: str) -> pd.DataFrame:
 
 def symbol_info(symbol) -> pd.DataFrame:
     try:
-        url = f"{BASE_URL}/symbol_info/{symbol}"
-        response = requests.get(url)
+        path = f"/symbol_info/{symbol}"
+        response = gateway.get(path)
         response.raise_for_status()
         
         data = response.json()
@@ -41,34 +96,448 @@ def symbol_info(symbol) -> pd.DataFrame:
         error_msg = f"Exception fetching symbol info for {symbol}: {e}\n{traceback.format_exc()}"
         logger.error(error_msg)
 
-def fetch_data_pos(symbol: str, timeframe: MT5Timeframe, bars: int) -> pd.DataFrame:
+def fetch_data_pos(symbol: str, timeframe: Union[MT5Timeframe, str], bars: int, fields: List[str] = None,
+                   response_format: str = 'npy', cached: bool = True) -> pd.DataFrame:
+    """
+    The last `bars` bars of symbol. Binary requests read through the shared Redis
+    bars cache unless cached is False, and go to the gateway when the cache cannot
+    serve them.
+    """
     try:
-        url = f"{BASE_URL}/fetch_data_pos?symbol={symbol}&timeframe={timeframe.value}&bars={bars}"
-        response = requests.get(url)
+        if cached and response_format == 'npy' and bars_cache.enabled:
+            rates = bars_cache.get_rates(symbol, timeframe_value(timeframe), bars)
+            if rates is not None:
+                df = pd.DataFrame(rates[fields] if fields else rates)
+                if 'time' in df.columns:
+                    df['time'] = pd.to_datetime(df['time'], unit='s', utc=True)
+                return df
+
+        path = "/fetch_data_pos"
+        params = {
+            'symbol': symbol,
+            'timeframe': timeframe_value(timeframe),
+            'num_bars': bars,
+            'format': response_format
+        }
+        if fields:
+            params['fields'] = ','.join(fields)
+
+        response = gateway.get(path, params=params)
         response.raise_for_status()
         
-        data = response.json()
-        df = pd.DataFrame(data)
-        return df
+        return decode_rates(response.content, response.headers.get('Content-Type'))
     except Exception as e:
         error_msg = f"Exception fetching data for {symbol} on {timeframe}: {e}\n{traceback.format_exc()}"
         logger.error(error_msg)
 
-def fetch_data_range(symbol: str, timeframe: MT5Timeframe, from_date: datetime, to_date: datetime) -> pd.DataFrame:
+def fetch_data_panel(symbols: List[str], timeframe: Union[MT5Timeframe, str], bars: int, as_frame: bool = True):
+    """
+    Fetch the last `bars` bars of every symbol in one round trip, aligned on a shared time index.
+
+    :param as_frame: When True (default), return a DataFrame indexed by time with
+        (symbol, field) MultiIndex columns, including a boolean 'missing' field per symbol.
+        When False, return a dict with 'time', 'symbols', 'fields', 'values' (a NumPy array
+        shaped fields x symbols x bars, NaN where a bar is missing) and 'missing'.
+    """
     try:
-        url = f"{BASE_URL}/copy_rates_range"
+        path = "/fetch_data_panel"
         params = {
-            'symbol': symbol,
-            'timeframe': timeframe.value,
-            'from_date': from_date,
-            'to_date': to_date
+            'symbols': ','.join(symbols),
+            'timeframe': timeframe_value(timeframe),
+            'num_bars': bars,
+            'format': 'npz'
         }
-        response = requests.post(url, params=params)
+        response = gateway.get(path, params=params)
         response.raise_for_status()
-        
-        data = response.json()
-        df = pd.DataFrame(data)
+
+        with np.load(io.BytesIO(response.content), allow_pickle=False) as npz:
+            panel = {
+                'time': pd.to_datetime(npz['time'], unit='s', utc=True),
+                'symbols': npz['symbols'].tolist(),
+                'fields': npz['fields'].tolist(),
+                'values': npz['values'],
+                'missing': npz['missing']
+            }
+
+        return panel_frame(panel) if as_frame else panel
+    except Exception as e:
+        error_msg = f"Exception fetching data panel for {symbols} on {timeframe}: {e}\n{traceback.format_exc()}"
+        logger.error(error_msg)
+
+def panel_frame(panel: Dict) -> pd.DataFrame:
+    """
+    Turn a panel dict (time, symbols, fields, values, missing) into a time-indexed
+    DataFrame with (symbol, field) MultiIndex columns.
+    """
+    values = np.asarray(panel['values'], dtype=float)
+    missing = np.asarray(panel['missing'], dtype=bool)
+    n_fields, n_symbols = len(panel['fields']), len(panel['symbols'])
+    n_bars = len(panel['time'])
+    values = values.reshape(n_fields, n_symbols, n_bars)
+    missing = missing.reshape(n_symbols, n_bars)
+
+    time = panel['time']
+    if not isinstance(time, pd.DatetimeIndex):
+        time = pd.to_datetime(np.asarray(time, dtype='int64'), unit='s', utc=True)
+    index = pd.Index(time, name='time')
+
+    values = pd.DataFrame(
+        values.transpose(2, 1, 0).reshape(n_bars, n_symbols * n_fields),
+        index=index,
+        columns=pd.MultiIndex.from_product([panel['symbols'], panel['fields']])
+    )
+    missing = pd.DataFrame(
+        missing.T,
+        index=index,
+        columns=pd.MultiIndex.from_product([panel['symbols'], ['missing']])
+    )
+    return pd.concat([values, missing], axis=1).sort_index(axis=1, level=0, sort_remaining=False)
+
+def panel_symbol_frame(panel: pd.DataFrame, symbol: str) -> pd.DataFrame:
+    """
+    Slice one symbol out of a fetch_data_panel frame as a plain rates DataFrame,
+    dropping the bars that symbol does not have.
+    """
+    if symbol not in panel.columns.get_level_values(0):
+        return pd.DataFrame()
+    df = panel[symbol]
+    df = df[~df['missing'].astype(bool)].drop(columns='missing')
+    return df.reset_index()
+
+# Bars per /fetch_data_range call when downloading a range in chunks; about 35 days of M1
+RANGE_CHUNK_BARS = 50000
+
+def range_chunks(from_date: datetime, to_date: datetime, timeframe: Union[MT5Timeframe, str],
+                 chunk_bars: int = RANGE_CHUNK_BARS) -> List[Tuple[datetime, datetime]]:
+    """
+    Split [from_date, to_date] into consecutive (start, end) chunks of about chunk_bars
+    bars each. Neighbouring chunks share their edge, since the gateway includes bars
+    opening exactly at start and end; the downloader drops the duplicates.
+    """
+    seconds = timeframe_seconds(timeframe)
+    if seconds is None:
+        return [(from_date, to_date)]
+    step = timedelta(seconds=seconds * chunk_bars)
+    chunks = []
+    start = from_date
+    while start < to_date:
+        end = min(start + step, to_date)
+        chunks.append((start, end))
+        start = end
+    return chunks or [(from_date, to_date)]
+
+def _fetch_range_chunk(symbol: str, timeframe: str, start: datetime, end: datetime, fields: List[str] = None) -> np.ndarray:
+    params = {
+        'symbol': symbol,
+        'timeframe': timeframe,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'format': 'npy'
+    }
+    if fields:
+        params['fields'] = ','.join(fields)
+    response = gateway.get("/fetch_data_range", params=params)
+    response.raise_for_status()
+    return np.load(io.BytesIO(response.content), allow_pickle=False)
+
+def _part_path(parts_dir: str, start: datetime, end: datetime, fields: List[str] = None) -> str:
+    # Named by its bounds and fields, so a resumed download only reuses matching parts
+    name = f"{start:%Y%m%dT%H%M%S}-{end:%Y%m%dT%H%M%S}"
+    if fields:
+        name += '-' + '.'.join(fields)
+    return os.path.join(parts_dir, f"{name}.npy")
+
+def _without_edges(parts: Iterator[np.ndarray]) -> Iterator[np.ndarray]:
+    """Drop the bars each part repeats from the end of the previous one."""
+    last_time = None
+    for part in parts:
+        if last_time is not None and len(part):
+            part = part[part['time'] > last_time]
+        if len(part):
+            last_time = part['time'][-1]
+        yield part
+
+def download_data_range(symbol: str, timeframe: Union[MT5Timeframe, str], from_date: datetime, to_date: datetime,
+                        path: str = None, fields: List[str] = None, chunk_bars: int = RANGE_CHUNK_BARS,
+                        max_workers: int = 4):
+    """
+    Download the bars of [from_date, to_date] as chunks of about chunk_bars bars,
+    at most max_workers requests at a time, and assemble them in time order without
+    the bars repeated at chunk edges.
+
+    Without a path, returns a DataFrame with UTC times. With a path, each finished
+    chunk is saved under <path>.parts, then the chunks are copied one at a time into
+    an .npy file at path, which np.load(path, mmap_mode='r') opens without reading it
+    into memory; returns path. If a chunk fails, the finished ones stay on disk and
+    the same call resumes from them. Raises when a chunk cannot be fetched.
+    """
+    timeframe = timeframe_value(timeframe)
+    if fields and 'time' not in fields:
+        fields = ['time'] + list(fields)
+    chunks = range_chunks(from_date, to_date, timeframe, chunk_bars)
+
+    parts_dir = f"{path}.parts" if path else None
+    if parts_dir:
+        os.makedirs(parts_dir, exist_ok=True)
+
+    def fetch(chunk):
+        start, end = chunk
+        if parts_dir:
+            part_path = _part_path(parts_dir, start, end, fields)
+            if os.path.exists(part_path):
+                return part_path
+        rates = _fetch_range_chunk(symbol, timeframe, start, end, fields)
+        if not parts_dir:
+            return rates
+        # Written under a temporary name first, so a part on disk is always complete
+        with open(f"{part_path}.tmp", 'wb') as f:
+            np.save(f, rates, allow_pickle=False)
+        os.replace(f"{part_path}.tmp", part_path)
+        return part_path
+
+    results = {}
+    failed = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(fetch, chunk): chunk for chunk in chunks}
+        for future in as_completed(futures):
+            chunk = futures[future]
+            try:
+                results[chunk] = future.result()
+            except Exception as e:
+                logger.error(f"Failed to fetch {symbol} {timeframe} bars from {chunk[0]} to {chunk[1]}: {e}")
+                failed.append(chunk)
+    if failed:
+        message = f"{len(failed)} of {len(chunks)} chunks of {symbol} {timeframe} failed"
+        if parts_dir:
+            message += f", the other {len(chunks) - len(failed)} are kept in {parts_dir} for the next call"
+        raise ConnectionError(message)
+
+    if not parts_dir:
+        parts = list(_without_edges(results[chunk] for chunk in chunks))
+        df = pd.DataFrame(np.concatenate(parts))
+        if 'time' in df.columns:
+            df['time'] = pd.to_datetime(df['time'], unit='s', utc=True)
         return df
+
+    # Two passes over the memory-mapped parts: count the bars kept, then copy them
+    def load_parts():
+        return (np.load(results[chunk], mmap_mode='r') for chunk in chunks)
+    total = sum(len(part) for part in _without_edges(load_parts()))
+    dtype = np.load(results[chunks[0]], mmap_mode='r').dtype
+    out = np.lib.format.open_memmap(f"{path}.tmp", mode='w+', dtype=dtype, shape=(total,))
+    offset = 0
+    for part in _without_edges(load_parts()):
+        out[offset:offset + len(part)] = part
+        offset += len(part)
+    out.flush()
+    del out
+    os.replace(f"{path}.tmp", path)
+
+    shutil.rmtree(parts_dir)
+    return path
+
+def fetch_data_range(symbol: str, timeframe: Union[MT5Timeframe, str], from_date: datetime, to_date: datetime,
+                     fields: List[str] = None) -> pd.DataFrame:
+    try:
+        return download_data_range(symbol, timeframe, from_date, to_date, fields=fields)
     except Exception as e:
         error_msg = f"Exception fetching data for {symbol} on {timeframe}: {e}\n{traceback.format_exc()}"
         logger.error(error_msg)
+
+def _read_exact(stream, size: int) -> bytes:
+    buffer = bytearray()
+    while len(buffer) < size:
+        chunk = stream.read(size - len(buffer))
+        if not chunk:
+            raise ConnectionError(f"Stream ended after {len(buffer)} of {size} bytes")
+        buffer.extend(chunk)
+    return bytes(buffer)
+
+def iter_frames(stream) -> Iterator[bytes]:
+    """
+    Yield the payloads of a length-prefixed frame stream until the zero-length end frame.
+    A stream that stops before the end frame raises, so truncated downloads are never
+    mistaken for complete ones.
+    """
+    while True:
+        (size,) = FRAME_HEADER.unpack(_read_exact(stream, FRAME_HEADER.size))
+        if size == 0:
+            return
+        yield _read_exact(stream, size)
+
+def iter_data_range(symbol: str, timeframe: Union[MT5Timeframe, str], from_date: datetime, to_date: datetime,
+                    chunk_hours: int = 168, fields: List[str] = None, response_format: str = 'frames',
+                    batch_size: int = 10000) -> Iterator[pd.DataFrame]:
+    """
+    Stream rates for [from_date, to_date] from /fetch_data_range_stream, yielding one
+    DataFrame per chunk so memory stays flat however long the range is.
+
+    :param response_format: 'frames' (binary, default) or 'ndjson'.
+    :param batch_size: Rows per yielded DataFrame when reading NDJSON.
+    """
+    path = "/fetch_data_range_stream"
+    params = {
+        'symbol': symbol,
+        'timeframe': timeframe_value(timeframe),
+        'start': from_date.isoformat(),
+        'end': to_date.isoformat(),
+        'chunk_hours': chunk_hours,
+        'format': response_format
+    }
+    if fields:
+        params['fields'] = ','.join(fields)
+
+    with gateway.get(path, params=params, stream=True, timeout=(10, 300)) as response:
+        response.raise_for_status()
+
+        if response_format == 'frames':
+            response.raw.decode_content = True
+            for payload in iter_frames(response.raw):
+                yield decode_rates(payload, NPY_MIMETYPE)
+            return
+
+        rows = []
+        for line in response.iter_lines():
+            if not line:
+                continue
+            rows.append(json.loads(line))
+            if len(rows) >= batch_size:
+                yield _ndjson_frame(rows)
+                rows = []
+        if rows:
+            yield _ndjson_frame(rows)
+
+def _ndjson_frame(rows: List[Dict]) -> pd.DataFrame:
+    df = pd.DataFrame(rows)
+    if 'time' in df.columns:
+        df['time'] = pd.to_datetime(df['time'], unit='s', utc=True)
+    return df
+
+def stream_ticks(symbols: List[str], mode: str = 'latest', read_timeout: float = 60) -> Iterator[Dict]:
+    """
+    Yield ticks pushed by /stream/ticks as they arrive, each a dict with its symbol.
+    'lagged' events, sent when this client fell behind and ticks were coalesced away,
+    are yielded as {'lagged': dropped}. read_timeout should stay above the gateway's
+    heartbeat interval; the stream ends when the gateway closes it.
+    """
+    path = "/stream/ticks"
+    params = {'symbols': ','.join(symbols), 'mode': mode}
+
+    with gateway.get(path, params=params, stream=True, timeout=(10, read_timeout)) as response:
+        response.raise_for_status()
+
+        event = 'message'
+        data = []
+        for line in response.iter_lines(decode_unicode=True):
+            if line:
+                if line.startswith(':'):
+                    continue
+                field, _, value = line.partition(':')
+                value = value[1:] if value.startswith(' ') else value
+                if field == 'event':
+                    event = value
+                elif field == 'data':
+                    data.append(value)
+                continue
+
+            # A blank line ends the event
+            if data:
+                payload = json.loads('\n'.join(data))
+                if event == 'tick':
+                    yield payload
+                elif event == 'lagged':
+                    yield {'lagged': payload['dropped']}
+            event = 'message'
+            data = []
+
+
+def decode_ticks_delta(payload: bytes) -> np.ndarray:
+    """
+    Decode one delta-encoded tick chunk into a structured array with the same fields
+    as MT5's copy_ticks_* arrays. Each column is a frombuffer plus a cumsum.
+    """
+    version, count, digits = TICK_CHUNK_HEADER.unpack_from(payload)
+    if version != TICKS_DELTA_VERSION:
+        raise ValueError(f"Unsupported tick chunk version: {version}")
+    ticks = np.zeros(count, dtype=TICK_DTYPE)
+    if not count:
+        return ticks
+
+    offset = TICK_CHUNK_HEADER.size
+    for name, scale_digits in TICK_COLUMNS:
+        kind, width = TICK_COLUMN_HEADER.unpack_from(payload, offset)
+        offset += TICK_COLUMN_HEADER.size
+        if kind == b'F':
+            ticks[name] = np.frombuffer(payload, '<f8', count, offset)
+            offset += 8 * count
+            continue
+
+        (first,) = TICK_FIRST_VALUE.unpack_from(payload, offset)
+        offset += TICK_FIRST_VALUE.size
+        values = np.full(count, first, dtype=np.int64)
+        if width:
+            deltas = np.frombuffer(payload, DELTA_DTYPES[width], count - 1, offset)
+            offset += width * (count - 1)
+            values[1:] += np.cumsum(deltas, dtype=np.int64)
+
+        if scale_digits is None:
+            ticks[name] = values
+        else:
+            ticks[name] = values / 10.0 ** (digits if scale_digits == 'price' else scale_digits)
+
+    ticks['time'] = ticks['time_msc'] // 1000
+    return ticks
+
+def _iter_tick_chunks(path: str, params: Dict) -> Iterator[np.ndarray]:
+    with gateway.get(path, params=params, stream=True, timeout=(10, 300)) as response:
+        response.raise_for_status()
+        response.raw.decode_content = True
+        for payload in iter_frames(response.raw):
+            yield decode_ticks_delta(payload)
+
+def iter_ticks_range(symbol: str, from_date: datetime, to_date: datetime, flags: str = 'all',
+                     chunk_minutes: int = 60) -> Iterator[np.ndarray]:
+    """
+    Stream ticks for [from_date, to_date] from /fetch_ticks_range, yielding one
+    structured array per chunk.
+
+    :param flags: 'info', 'trade' or 'all', the MT5 COPY_TICKS_* flag.
+    """
+    params = {
+        'symbol': symbol,
+        'start': from_date.isoformat(),
+        'end': to_date.isoformat(),
+        'flags': flags,
+        'chunk_minutes': chunk_minutes,
+        'format': 'delta'
+    }
+    yield from _iter_tick_chunks("/fetch_ticks_range", params)
+
+def iter_ticks_from(symbol: str, from_date: datetime, count: int, flags: str = 'all',
+                    chunk_size: int = 100000) -> Iterator[np.ndarray]:
+    """Stream count ticks starting at from_date from /fetch_ticks_from, one array per chunk."""
+    params = {
+        'symbol': symbol,
+        'start': from_date.isoformat(),
+        'count': count,
+        'flags': flags,
+        'chunk_size': chunk_size,
+        'format': 'delta'
+    }
+    yield from _iter_tick_chunks("/fetch_ticks_from", params)
+
+def fetch_ticks_range(symbol: str, from_date: datetime, to_date: datetime, flags: str = 'all') -> np.ndarray:
+    try:
+        chunks = list(iter_ticks_range(symbol, from_date, to_date, flags))
+        return np.concatenate(chunks) if chunks else np.zeros(0, dtype=TICK_DTYPE)
+    except Exception as e:
+        error_msg = f"Exception fetching ticks for {symbol} from {from_date} to {to_date}: {e}\n{traceback.format_exc()}"
+        logger.error(error_msg)
+
+def fetch_ticks_from(symbol: str, from_date: datetime, count: int, flags: str = 'all') -> np.ndarray:
+    try:
+        chunks = list(iter_ticks_from(symbol, from_date, count, flags))
+        return np.concatenate(chunks) if chunks else np.zeros(0, dtype=TICK_DTYPE)
+    except Exception as e:
+        error_msg = f"Exception fetching {count} ticks for {symbol} from {from_date}: {e}\n{traceback.format_exc()}"
+        logger.error(error_msg)
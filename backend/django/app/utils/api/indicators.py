@@ -0,0 +1,39 @@
+import traceback
+from typing import List, Dict, Union
+import logging
+
+from app.utils.constants import MT5Timeframe, timeframe_value
+from app.utils.api.client import gateway
+
+logger = logging.getLogger(__name__)
+
+
+def get_bollinger_signals(symbols: List[str], timeframe: Union[MT5Timeframe, str], window: int = 20,
+                          num_std_dev: float = 2, shift: int = 1) -> Dict[str, Dict]:
+    """
+    Bollinger bands and band crossover of one bar per symbol, evaluated by the gateway
+    on its cached bars. shift=1 is the last closed bar.
+
+    Returns {symbol: {time, close, middle, upper, lower, signal}} where signal is
+    'top', 'bottom' or None. Symbols the gateway could not evaluate are left out.
+    """
+    try:
+        path = "/indicators/bollinger"
+        params = {
+            'symbols': ','.join(symbols),
+            'timeframe': timeframe_value(timeframe),
+            'window': window,
+            'num_std_dev': num_std_dev,
+            'shift': shift
+        }
+
+        response = gateway.get(path, params=params)
+        response.raise_for_status()
+
+        data = response.json()
+        if data.get('errors'):
+            logger.error({'message': 'Bollinger evaluation failed for some symbols', 'errors': data['errors']})
+        return data['results']
+    except Exception as e:
+        error_msg = f"Exception fetching Bollinger signals for {symbols}: {e}\n{traceback.format_exc()}"
+        logger.error(error_msg)
@@ -1,21 +1,18 @@
-import os
 import requests
 import traceback
 from typing import List, Dict
 import pandas as pd
 from datetime import datetime
-from dotenv import load_dotenv
 import logging
 
 from app.utils.constants import MT5Timeframe
 from app.utils.api.data import symbol_info_tick
 from app.nexus.models import Trade, TradeClosePricesMutation  # Import models
 from app.utils.arithmetics import get_pnl_at_price, calculate_commission, get_price_at_pnl, calculate_order_capital, calculate_order_size_usd
+from app.utils.api.client import gateway
 
-load_dotenv()
 logger = logging.getLogger(__name__)
 
-BASE_URL = os.getenv('MT5_API_URL')
 
 def send_market_order(symbol: str, volume: float, order_type: str, sl: float, tp: float = None,
                       deviation: int = 20, comment: str = 'From Django Server', magic: int = 234000, type_filling: str = 'ORDER_FILLING_FOK', position_size_usd: float = None, commission: float = None, capital: float = None, leverage: int = 500
@@ -44,8 +41,8 @@ def send_market_order(symbol: str, volume: float, order_type: str, sl: float, tp
 
         logger.info(f"Sending market order: {request}")
 
-        url = f"{BASE_URL}/send_market_order"
-        response = requests.post(url, json=request, timeout=10)
+        path = "/send_market_order"
+        response = gateway.post(path, json=request)
         response.raise_for_status()
 
         response_data = response.json()
@@ -72,6 +69,69 @@ def send_market_order(symbol: str, volume: float, order_type: str, sl: float, tp
         error_msg = f"Exception sending market order for {symbol}: {str(e)}\n{traceback.format_exc()}"
         logger.error(error_msg)
     
+def send_market_orders(orders: List[Dict], timeout: float = None) -> List[Dict]:
+    """
+    Send several market orders in one request to /orders/batch. Each item takes the
+    same keys as send_market_order's arguments (symbol, volume, order_type, sl, tp,
+    deviation, comment, magic, type_filling). Returns one entry per order, in the same
+    order: the order result, or None if that order failed. Returns None if the whole
+    request failed.
+    """
+    try:
+        batch = []
+        for order in orders:
+            order_type = order['order_type']
+            order_type_str = order_type if isinstance(order_type, str) else order_type.name
+
+            if order_type_str not in ['BUY', 'SELL']:
+                error_msg = f"Invalid order type: {order_type_str}. Must be 'BUY' or 'SELL'"
+                logger.error(error_msg)
+                return None
+
+            request = {
+                "symbol": order['symbol'],
+                "volume": float(order['volume']),
+                "type": order_type_str,
+                "sl": float(order['sl']),
+                "deviation": int(order.get('deviation', 20)),
+                "magic": int(order.get('magic', 234000)),
+                "comment": str(order.get('comment', 'From Django Server')),
+                "type_filling": order.get('type_filling', 'ORDER_FILLING_FOK'),
+            }
+
+            if order.get('tp') is not None:
+                request["tp"] = float(order['tp'])
+
+            batch.append(request)
+
+        logger.info(f"Sending {len(batch)} market orders: {batch}")
+
+        path = "/orders/batch"
+        response = gateway.post(path, json={"orders": batch}, timeout=timeout)
+        response.raise_for_status()
+
+        results = []
+        for request, result in zip(batch, response.json()['results']):
+            if not result.get('success'):
+                logger.error(f"Order failed for {request['symbol']}: {result.get('error', 'Unknown error')}")
+                results.append(None)
+            else:
+                results.append(result['result'])
+
+        return results
+
+    except requests.exceptions.HTTPError as e:
+        error_msg = f"HTTP error sending market orders: {e.response.text}"
+        logger.error(error_msg)
+
+    except requests.exceptions.Timeout:
+        error_msg = "Timeout sending market orders"
+        logger.error(error_msg)
+
+    except Exception as e:
+        error_msg = f"Exception sending market orders: {str(e)}\n{traceback.format_exc()}"
+        logger.error(error_msg)
+
 def modify_sl_tp(position, sl: float, tp: float = None) -> Dict:
     try:
         request = {
@@ -86,8 +146,8 @@ def modify_sl_tp(position, sl: float, tp: float = None) -> Dict:
 
         logger.info(f"Sending modify SL/TP request: {request}")
 
-        url = f"{BASE_URL}/modify_sl_tp"
-        response = requests.post(url, json=request, timeout=10)
+        path = "/modify_sl_tp"
+        response = gateway.post(path, json=request)
         response.raise_for_status()
 
         response_data = response.json()
@@ -117,4 +177,54 @@ def modify_sl_tp(position, sl: float, tp: float = None) -> Dict:
     
     except Exception as e:
         error_msg = f"Exception sending modify SL/TP for {position.ticket}: {str(e)}\n{traceback.format_exc()}"
-        logger.error(error_msg)
\ No newline at end of file
+        logger.error(error_msg)
+
+
+def modify_sl_tp_batch(changes: List[Dict], timeout: float = None) -> List[Dict]:
+    """
+    Send several SL/TP changes in one request to /modify_sl_tp/batch. Each item is
+    {'position': <position row or ticket>, 'sl': float, 'tp': float (optional)}.
+    Returns one entry per change, in the same order: the order result, or None if that
+    change failed. Returns None if the whole request failed.
+    """
+    try:
+        batch = []
+        for change in changes:
+            position = change['position']
+            request = {
+                "position": int(getattr(position, 'ticket', position)),
+                "sl": float(change['sl']),
+            }
+
+            if change.get('tp') is not None:
+                request['tp'] = float(change['tp'])
+
+            batch.append(request)
+
+        logger.info(f"Sending {len(batch)} modify SL/TP requests: {batch}")
+
+        path = "/modify_sl_tp/batch"
+        response = gateway.post(path, json={"changes": batch}, timeout=timeout)
+        response.raise_for_status()
+
+        results = []
+        for request, result in zip(batch, response.json()['results']):
+            if not result.get('success'):
+                logger.error(f"Modify SL/TP failed for {request['position']}: {result.get('error', 'Unknown error')}")
+                results.append(None)
+            else:
+                results.append(result['result'])
+
+        return results
+
+    except requests.exceptions.HTTPError as e:
+        error_msg = f"HTTP error sending modify SL/TP batch: {e.response.text}"
+        logger.error(error_msg)
+
+    except requests.exceptions.Timeout:
+        error_msg = "Timeout sending modify SL/TP batch"
+        logger.error(error_msg)
+
+    except Exception as e:
+        error_msg = f"Exception sending modify SL/TP batch: {str(e)}\n{traceback.format_exc()}"
+        logger.error(error_msg)
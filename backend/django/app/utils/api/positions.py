@@ -1,20 +1,18 @@
-import os
 import traceback
-from typing import List, Dict
+from typing import List, Dict, Optional
 from datetime import datetime
 import logging
+import threading
 import time
 
 import requests
 import pandas as pd
-from dotenv import load_dotenv
 
 from app.utils.constants import MT5Timeframe
+from app.utils.api.client import gateway
 
 logger = logging.getLogger(__name__)
-load_dotenv()
 
-BASE_URL = os.getenv('MT5_API_URL')
 
 empty_df = pd.DataFrame(columns=[
     'ticket', 'time', 'time_msc', 'time_update', 'time_update_msc', 'type',
@@ -22,11 +20,22 @@ empty_df = pd.DataFrame(columns=[
     'price_current', 'swap', 'profit', 'symbol', 'comment', 'external_id'
 ])
 
+def positions_frame(positions: List[Dict]) -> pd.DataFrame:
+    df = pd.DataFrame(positions)
+
+    if df.empty:
+        return empty_df
+
+    df['time'] = pd.to_datetime(df['time'], unit='s', utc=True)
+    df['time_update'] = pd.to_datetime(df['time_update'], unit='s', utc=True)
+
+    return df
+
 def get_positions() -> pd.DataFrame:
     try:
-        url = f"{BASE_URL}/get_positions"
+        path = "/get_positions"
         start_time = time.time()  # Start timing
-        response = requests.get(url, timeout=10)
+        response = gateway.get(path)
         end_time = time.time()    # End timing
         duration = end_time - start_time
         logger.info(f"Fetched positions in {duration:.2f} seconds")
@@ -35,18 +44,10 @@ def get_positions() -> pd.DataFrame:
         
         data = response.json()
 
-        df = pd.DataFrame(data if isinstance(data, list) else [])
-
-        if df.empty:
-            return empty_df
-
-        df['time'] = pd.to_datetime(df['time'], unit='s', utc=True)
-        df['time_update'] = pd.to_datetime(df['time_update'], unit='s', utc=True)
-
-        return df
+        return positions_frame(data if isinstance(data, list) else [])
     
     except requests.exceptions.Timeout:
-        error_msg = f"Timeout fetching positions from {url}"
+        error_msg = f"Timeout fetching positions from {path}"
         logger.error(error_msg)
         return empty_df
     
@@ -54,3 +55,50 @@ def get_positions() -> pd.DataFrame:
         error_msg = f"Exception fetching positions: {e}\n{traceback.format_exc()}"
         logger.error(error_msg)
         return empty_df
+
+# Local copy of the gateway's positions book, kept in step through since_version deltas
+_book = {'version': None, 'positions': {}}
+_book_lock = threading.Lock()
+
+def get_positions_versioned() -> Optional[pd.DataFrame]:
+    """
+    Open positions kept in step with the gateway's versioned book. After the first
+    call only the positions opened, modified or closed since the last seen version
+    are downloaded, so the cost follows the number of changes, not the size of the
+    book. Opens, closes, SL/TP and volume are always current; price_current, profit
+    and swap are only as fresh as the last change to each position, so use
+    get_positions() when those matter. Returns None when the positions could not be
+    read, so a failed read is never mistaken for a flat book.
+    """
+    try:
+        path = "/get_positions"
+        with _book_lock:
+            params = {}
+            if _book['version'] is not None:
+                params['since_version'] = _book['version']
+
+            response = gateway.get(path, params=params)
+            response.raise_for_status()
+            data = response.json()
+
+            if _book['version'] is None or data.get('full'):
+                rows = data if isinstance(data, list) else data.get('positions', [])
+                _book['positions'] = {row['ticket']: row for row in rows}
+            else:
+                for ticket in data['closed']:
+                    _book['positions'].pop(ticket, None)
+                for row in data['opened'] + data['modified']:
+                    _book['positions'][row['ticket']] = row
+            _book['version'] = int(response.headers['X-Positions-Version'])
+
+            return positions_frame(list(_book['positions'].values()))
+
+    except requests.exceptions.Timeout:
+        error_msg = f"Timeout fetching positions from {path}"
+        logger.error(error_msg)
+        return None
+
+    except Exception as e:
+        error_msg = f"Exception fetching positions: {e}\n{traceback.format_exc()}"
+        logger.error(error_msg)
+        return None
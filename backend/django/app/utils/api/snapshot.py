@@ -0,0 +1,32 @@
+import traceback
+from typing import List, Dict, Union
+import logging
+
+from app.utils.constants import MT5Timeframe, timeframe_value
+from app.utils.api.client import gateway
+
+logger = logging.getLogger(__name__)
+
+
+def get_cycle_snapshot(symbols: List[str], timeframe: Union[MT5Timeframe, str] = None, bars: int = 0, magic: int = None) -> Dict:
+    try:
+        path = "/cycle_snapshot"
+        params = {
+            'symbols': ','.join(symbols),
+            'num_bars': bars if timeframe is not None else 0
+        }
+        if timeframe is not None:
+            params['timeframe'] = timeframe_value(timeframe)
+        if magic is not None:
+            params['magic'] = magic
+
+        response = gateway.get(path, params=params)
+        response.raise_for_status()
+
+        data = response.json()
+        if data.get('errors'):
+            logger.error({'message': 'Cycle snapshot returned partial data', 'errors': data['errors']})
+        return data
+    except Exception as e:
+        error_msg = f"Exception fetching cycle snapshot for {symbols}: {e}\n{traceback.format_exc()}"
+        logger.error(error_msg)
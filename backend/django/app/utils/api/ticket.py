@@ -1,18 +1,14 @@
-import os
-import requests
 from typing import Dict
 import pandas as pd
 from datetime import datetime, timedelta
-from dotenv import load_dotenv
 import logging
 import traceback
 from app.utils.constants import MT5Timeframe
 from app.utils.constants import TIMEZONE
+from app.utils.api.client import gateway
 
-load_dotenv()
 logger = logging.getLogger(__name__)
 
-BASE_URL = os.getenv('MT5_API_URL')
 
 def history_deals_get(from_date: datetime, to_date: datetime, position: int = None) -> Dict:
     try:
@@ -24,8 +20,8 @@ def history_deals_get(from_date: datetime, to_date: datetime, position: int = No
         if position is not None:
             params['position'] = position
             
-        url = f"{BASE_URL}/history_deals_get"
-        response = requests.get(url, params=params)
+        path = "/history_deals_get"
+        response = gateway.get(path, params=params)
         response.raise_for_status()
         
         return response.json()
@@ -37,8 +33,8 @@ def history_orders_get(ticket: int) -> Dict:
     try:
         params = {'ticket': ticket}
             
-        url = f"{BASE_URL}/history_orders_get"
-        response = requests.get(url, params=params)
+        path = "/history_orders_get"
+        response = gateway.get(path, params=params)
         response.raise_for_status()
         
         return response.json()
@@ -46,13 +42,15 @@ def history_orders_get(ticket: int) -> Dict:
         error_msg = f"Exception fetching history orders for ticket {ticket}: {e}\n{traceback.format_exc()}"
         logger.error(error_msg)
 
-def get_deal_from_ticket(ticket: int, from_date: datetime, to_date: datetime) -> Dict:
-    # Convert datetime to MT5 time (integer)
-    from_timestamp = int(from_date.timestamp())
-    to_timestamp = int(to_date.timestamp())
+def get_deal_from_ticket(ticket: int, from_date: datetime = None, to_date: datetime = None) -> Dict:
+    # Default to a window wide enough for any position the algorithms hold, padded
+    # a day ahead because deal times are broker server time
+    if from_date is None or to_date is None:
+        to_date = datetime.now(TIMEZONE) + timedelta(days=1)
+        from_date = to_date - timedelta(days=31)
 
     # Retrieve deals using the specified date range and position
-    deals = history_deals_get(from_timestamp, to_timestamp, position=ticket)
+    deals = history_deals_get(from_date, to_date, position=ticket)
     if not deals:
         error_msg = f"No deal history found for position ticket {ticket} between {from_date} and {to_date}."
         logger.error(error_msg)
@@ -1,9 +1,9 @@
 import traceback
 import logging
-import pandas as pd
 
-from app.utils.constants import MT5Timeframe, METALS, OILS, CURRENCY_PAIRS, CRYPTOCURRENCIES
-from app.utils.api.data import symbol_info
+from app.utils.constants import MT5Timeframe
+from app.utils.api.data import symbol_info_tick
+from app.utils.instruments import instruments, commission_rate
 
 logger = logging.getLogger(__name__)
 
@@ -95,63 +95,50 @@ def convert_lots_to_usd(symbol, lots, price_open):
     :param lots: The volume size in lots
     :return: The equivalent USD amount
     """
-    # Get the contract size for the symbol
-    symbol_info_data = symbol_info(symbol)
-    if symbol_info_data is None:
-        raise ValueError(f"Symbol {symbol} not found in MetaTrader 5")
-    
-    contract_size = symbol_info_data.get('trade_contract_size', 100000)
+    # The contract size comes from the instrument registry, loaded once per session
+    contract_size = instruments.get(symbol).contract_size
     
     # Calculate the USD amount using the opening price
     usd_amount = lots * contract_size * price_open
     
     return usd_amount
 
-def convert_usd_to_lots(symbol: str, usd_amount: float, type: str) -> float:
+def convert_usd_to_lots(symbol: str, usd_amount: float, type: str, snapshot=None, price: float = None) -> float:
     """
     Convert USD amount to lots for a given symbol.
 
     :param symbol: The trading symbol (e.g., 'BITCOIN', 'ETHEREUM')
     :param usd_amount: The amount in USD to convert
     :param type: The type of order ('BUY' or 'SELL')
+    :param snapshot: Optional CycleSnapshot to read the spec and tick from
+    :param price: Price to convert at. Defaults to the ask for a BUY and the bid for a
+        SELL, from the snapshot or a symbol_info_tick call.
     :return: The equivalent amount in lots
     """
     try:
-        # Get the symbol information
-        symbol_info_data = symbol_info(symbol)
-        if symbol_info_data is None:
-            raise ValueError(f"Symbol {symbol} not found in MetaTrader 5")
-        
-        # Ensure that 'ask' and 'bid' are scalar values
-        ask_price = symbol_info_data.ask.iloc[0] if isinstance(symbol_info_data.ask, pd.Series) else symbol_info_data.ask
-        bid_price = symbol_info_data.bid.iloc[0] if isinstance(symbol_info_data.bid, pd.Series) else symbol_info_data.bid
-        
-        price_dict = {
-            'BUY': ask_price,
-            'SELL': bid_price
-        }
-        
-        # Get the contract size and calculate lots
-        contract_size = symbol_info_data.get('trade_contract_size', 100000)
-        lots = usd_amount / (contract_size * price_dict[type])
-        
-        # Round to the nearest lot step
-        lot_step = symbol_info_data.get('volume_step', 0.01)
-        lots = round(lots / lot_step) * lot_step
-        
-        symbol_info_dict = {
-            'ask': float(symbol_info_data.ask),
-            'bid': float(symbol_info_data.bid),
-            'spread': float(symbol_info_data.spread),
-            'volume': float(symbol_info_data.volume),
-            'trade_contract_size': contract_size,
-            'volume_step': lot_step
-        }
+        if type not in ('BUY', 'SELL'):
+            raise ValueError(f"Unknown trade type: {type}")
+
+        instrument = instruments.get(symbol, snapshot)
+
+        if price is None:
+            tick = snapshot.symbol_info_tick(symbol) if snapshot is not None else None
+            if tick is None or tick.empty:
+                tick = symbol_info_tick(symbol)
+            if tick is None or tick.empty:
+                raise ValueError(f"No price for {symbol}")
+            price = tick['ask'].iloc[0] if type == 'BUY' else tick['bid'].iloc[0]
+
+        # Calculate lots and round to the nearest lot step
+        lots = usd_amount / (instrument.contract_size * price)
+        lots = round(lots / instrument.volume_step) * instrument.volume_step
 
         logger.info({
             'message': 'Lots converted from USD to lots',
             'symbol': symbol,
-            'symbol_info': symbol_info_dict,
+            'price': float(price),
+            'trade_contract_size': instrument.contract_size,
+            'volume_step': instrument.volume_step,
             'usd_amount': usd_amount,
             'type': type,
             'lots': float(lots)  # Convert to float for proper JSON serialization
@@ -170,19 +157,7 @@ def calculate_commission(order_size_usd: float, pair: str) -> float:
     :return: The total commission for opening and closing the trade.
     """
     try:
-        if pair in CRYPTOCURRENCIES:
-            commission_rate = 0.0005 # 0.05%
-        elif pair in OILS:
-            commission_rate = 0.00025
-        elif pair in METALS:
-            commission_rate = 0.00025
-        elif pair in CURRENCY_PAIRS:
-            commission_rate = 0.00025
-        else:
-            # Throw exception
-            raise ValueError(f"Could not calculate commission for unknown pair: {pair}")
-
-        commission = order_size_usd * commission_rate # Total commission for both open and close
+        commission = order_size_usd * commission_rate(pair) # Total commission for both open and close
         return commission
     except Exception as e:
         error_msg = f"Exception in calculate_commission: {e}\n{traceback.format_exc()}"
@@ -16,6 +16,21 @@ class MT5Timeframe(Enum):
     W1 = 'W1'       # weekly
     MN1 = 'MN1'     # monthly
 
+def timeframe_value(timeframe) -> str:
+    """
+    Query value for a timeframe: an MT5Timeframe, or a string such as 'M10' or 'H2'
+    for minute or hour multiples the gateway aggregates from a standard timeframe.
+    """
+    return timeframe.value if isinstance(timeframe, MT5Timeframe) else timeframe
+
+def timeframe_seconds(timeframe) -> Optional[int]:
+    """Length of one bar in seconds, or None for months, which vary."""
+    value = timeframe_value(timeframe).upper()
+    if value == 'MN1':
+        return None
+    units = {'M': 60, 'H': 60 * 60, 'D': 24 * 60 * 60, 'W': 7 * 24 * 60 * 60}
+    return int(value[1:]) * units[value[0]]
+
 class RETCODES(Enum):
     TRADE_RETCODE_REQUOTE= 'TRADE_RETCODE_REQUOTE',
     TRADE_RETCODE_REJECT= "TRADE_RETCODE_REJECT",
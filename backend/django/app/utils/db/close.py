@@ -37,4 +37,6 @@ def close_trade(ticket, close_time, close_price, pnl, pnl_excluding_commission,
             "pnl": str(trade.pnl),
             "pnl_excluding_commission": str(trade.pnl_excluding_commission),
             "closing_reason": trade.closing_reason,
-        })
\ No newline at end of file
+        })
+
+        return trade
@@ -0,0 +1,86 @@
+import json
+import logging
+import socket
+import traceback
+from typing import Callable, Dict, Iterator, List
+
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+POSITION_OPENED = 'position_opened'
+POSITION_MODIFIED = 'position_modified'
+POSITION_CLOSED = 'position_closed'
+DEAL = 'deal'
+
+# event type -> handlers taking the decoded event
+_handlers: Dict[str, List[Callable]] = {}
+
+def register_handler(event_type: str, handler: Callable):
+    _handlers.setdefault(event_type, []).append(handler)
+
+def decode_event(fields: Dict[bytes, bytes]) -> Dict:
+    """Turn a raw stream entry from the gateway into {type, ticket, symbol, version, time, data}."""
+    event = {key.decode(): value.decode() for key, value in fields.items()}
+    event['ticket'] = int(event['ticket'])
+    event['version'] = int(event['version']) if event.get('version') not in (None, '', 'None') else None
+    event['time'] = float(event['time'])
+    event['data'] = json.loads(event['data'])
+    return event
+
+def get_client():
+    return redis.Redis.from_url(settings.MT5_EVENTS_REDIS_URL)
+
+def iter_events(client=None, stream: str = None, group: str = None, consumer: str = None,
+                block_ms: int = 5000, count: int = 100) -> Iterator[tuple]:
+    """
+    Yield (entry_id, event) from the gateway's event stream through a consumer group,
+    so several consumers share the work and a restarted consumer resumes where it
+    stopped. Entries this consumer read but never acknowledged are re-delivered first.
+    Acknowledge each entry with client.xack(stream, group, entry_id) once handled.
+    """
+    client = client or get_client()
+    stream = stream or settings.MT5_EVENTS_STREAM
+    group = group or settings.MT5_EVENTS_GROUP
+    consumer = consumer or socket.gethostname()
+
+    try:
+        # New groups start at the end of the stream; older events were already polled for
+        client.xgroup_create(stream, group, id='$', mkstream=True)
+    except redis.exceptions.ResponseError as e:
+        if 'BUSYGROUP' not in str(e):
+            raise
+
+    # '0' reads this consumer's pending entries, '>' reads new ones
+    last_id = '0'
+    while True:
+        response = client.xreadgroup(group, consumer, {stream: last_id}, count=count, block=block_ms)
+        entries = response[0][1] if response else []
+
+        if last_id != '>':
+            if not entries:
+                last_id = '>'
+                continue
+            # Page through the pending entries once; failures stay pending for the next start
+            last_id = entries[-1][0]
+
+        for entry_id, fields in entries:
+            try:
+                event = decode_event(fields)
+            except Exception as e:
+                logger.error(f"Dropping malformed event {entry_id}: {e}")
+                client.xack(stream, group, entry_id)
+                continue
+            yield entry_id, event
+
+def dispatch(event: Dict) -> bool:
+    """Run the handlers registered for the event's type. False if any of them failed."""
+    ok = True
+    for handler in _handlers.get(event['type'], []):
+        try:
+            handler(event)
+        except Exception as e:
+            ok = False
+            logger.error(f"Error in {handler.__name__} for {event['type']} {event['ticket']}: {e}\n{traceback.format_exc()}")
+    return ok
@@ -0,0 +1,113 @@
+import os
+import threading
+import time
+import logging
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from app.utils.constants import CRYPTOCURRENCIES, OILS, METALS, CURRENCY_PAIRS
+from app.utils.api.data import symbol_info
+
+logger = logging.getLogger(__name__)
+
+CRYPTO = 'crypto'
+OIL = 'oil'
+METAL = 'metal'
+CURRENCY = 'currency'
+
+# symbol -> asset class, built once from the symbol lists
+ASSET_CLASSES: Dict[str, str] = {
+    **{symbol: CURRENCY for symbol in CURRENCY_PAIRS},
+    **{symbol: METAL for symbol in METALS},
+    **{symbol: OIL for symbol in OILS},
+    **{symbol: CRYPTO for symbol in CRYPTOCURRENCIES},
+}
+
+# Commission for opening and closing a trade, as a fraction of its notional value
+COMMISSION_RATES: Dict[str, float] = {
+    CRYPTO: 0.0005,
+    OIL: 0.00025,
+    METAL: 0.00025,
+    CURRENCY: 0.00025,
+}
+
+COMMISSION_RATE_BY_SYMBOL: Dict[str, float] = {
+    symbol: COMMISSION_RATES[asset_class] for symbol, asset_class in ASSET_CLASSES.items()
+}
+
+
+def commission_rate(symbol: str) -> float:
+    rate = COMMISSION_RATE_BY_SYMBOL.get(symbol)
+    if rate is None:
+        raise ValueError(f"Could not calculate commission for unknown pair: {symbol}")
+    return rate
+
+
+@dataclass(frozen=True)
+class Instrument:
+    symbol: str
+    asset_class: Optional[str]
+    contract_size: float
+    volume_step: float
+    volume_min: float
+    digits: int
+    point: float
+
+    @classmethod
+    def from_symbol_info(cls, symbol: str, info) -> 'Instrument':
+        """Build from a symbol_info row: a dict, or the one-row DataFrame the API helpers return."""
+        if hasattr(info, 'iloc'):
+            info = info.iloc[0].to_dict()
+        return cls(
+            symbol=symbol,
+            asset_class=ASSET_CLASSES.get(symbol),
+            contract_size=float(info.get('trade_contract_size', 100000)),
+            volume_step=float(info.get('volume_step', 0.01)),
+            volume_min=float(info.get('volume_min', 0.01)),
+            digits=int(info.get('digits', 5)),
+            point=float(info.get('point', 0.00001)),
+        )
+
+
+class InstrumentRegistry:
+    """
+    Contract specs per symbol, loaded from the gateway once and kept for ttl seconds
+    per process. Specs rarely change, so arithmetics and algorithms read them from
+    here instead of calling symbol_info every time. A CycleSnapshot passed to get()
+    fills a missing spec from the symbol_info it already holds, without a call.
+    """
+
+    def __init__(self, ttl: float = 3600):
+        self.ttl = ttl
+        self._instruments: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(ttl=float(os.getenv('INSTRUMENTS_TTL_SECONDS', 3600)))
+
+    def get(self, symbol: str, snapshot=None) -> Instrument:
+        entry = self._instruments.get(symbol)
+        if entry is not None and entry[1] > time.monotonic():
+            return entry[0]
+
+        info = snapshot.symbol_info(symbol) if snapshot is not None else None
+        if info is None or getattr(info, 'empty', False):
+            info = symbol_info(symbol)
+        if info is None or getattr(info, 'empty', False):
+            if entry is not None:
+                logger.warning(f"Using expired spec of {symbol}, symbol_info failed")
+                return entry[0]
+            raise ValueError(f"Symbol {symbol} not found in MetaTrader 5")
+
+        instrument = Instrument.from_symbol_info(symbol, info)
+        with self._lock:
+            self._instruments[symbol] = (instrument, time.monotonic() + self.ttl)
+        return instrument
+
+    def clear(self):
+        with self._lock:
+            self._instruments.clear()
+
+
+instruments = InstrumentRegistry.from_env()
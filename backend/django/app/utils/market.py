@@ -1,14 +1,15 @@
 from datetime import datetime, timedelta
 
-from app.utils.constants import CRYPTOCURRENCIES, TIMEZONE
+from app.utils.constants import TIMEZONE
+from app.utils.instruments import ASSET_CLASSES, CRYPTO
 from app.utils.api.data import fetch_data_pos, symbol_info_tick
 
-def is_market_open(symbol):
-    if symbol in CRYPTOCURRENCIES:
+def is_market_open(symbol, snapshot=None):
+    if ASSET_CLASSES.get(symbol) == CRYPTO:
         return True
     else:
         # Check whether the market is open, if it's a crypto then market doesn't close
-        tick = symbol_info_tick(symbol)
+        tick = snapshot.symbol_info_tick(symbol) if snapshot is not None else symbol_info_tick(symbol)
         if tick is not None and not tick.empty:
             # Extract the first timestamp from the Series
             tick_time = datetime.fromtimestamp(tick.time.iloc[0], tz=TIMEZONE)
@@ -0,0 +1,105 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, List
+
+import pandas as pd
+
+from app.utils.constants import MT5Timeframe, TIMEZONE
+from app.utils.api.data import panel_frame, panel_symbol_frame
+from app.utils.api.positions import positions_frame
+from app.utils.api.snapshot import get_cycle_snapshot
+from app.utils.api import aio
+
+logger = logging.getLogger(__name__)
+
+class CycleSnapshot:
+    """
+    Positions, ticks, symbol specs and recent bars for one trading cycle, taken by the
+    gateway in a single pass over MT5. The accessors return the same shapes as the
+    matching app.utils.api helpers, so algorithms can read from a snapshot instead of
+    making their own calls.
+    """
+
+    def __init__(self, data: dict):
+        self.time = datetime.fromtimestamp(data['time'], tz=TIMEZONE)
+        self.positions = positions_frame(data.get('positions') or [])
+        self._ticks = data.get('ticks') or {}
+        self._symbol_info = data.get('symbol_info') or {}
+        self._bars = panel_frame(data['bars']) if data.get('bars') else None
+
+    @classmethod
+    def fetch(cls, symbols: List[str], timeframe: MT5Timeframe = None, bars: int = 0, magic: int = None):
+        data = get_cycle_snapshot(symbols, timeframe, bars, magic)
+        if data is None:
+            return None
+        # An empty book from a failed read would look like no open positions
+        errors = data.get('errors') or {}
+        if 'positions' in errors:
+            logger.error(f"Cycle snapshot without positions: {errors['positions']}")
+            return None
+        return cls(data)
+
+    def have_open_positions_in_symbol(self, symbol: str) -> bool:
+        if self.positions.empty:
+            return False
+        return symbol in self.positions['symbol'].values
+
+    def symbol_info_tick(self, symbol: str) -> pd.DataFrame:
+        tick = self._ticks.get(symbol)
+        return pd.DataFrame([tick]) if tick is not None else None
+
+    def symbol_info(self, symbol: str) -> pd.DataFrame:
+        info = self._symbol_info.get(symbol)
+        return pd.DataFrame([info]) if info is not None else None
+
+    def bars(self, symbol: str) -> pd.DataFrame:
+        if self._bars is None:
+            return None
+        return panel_symbol_frame(self._bars, symbol)
+
+    def drop_bars(self):
+        """Free the bars once they are not needed for the rest of the cycle."""
+        self._bars = None
+
+class GatheredSnapshot(CycleSnapshot):
+    """
+    The same accessors as CycleSnapshot, built from the per-symbol helpers when the
+    gateway's /cycle_snapshot is unavailable. The calls run concurrently through
+    app.utils.api.aio, so building it takes about as long as the slowest call.
+    """
+
+    def __init__(self, positions: pd.DataFrame, ticks: Dict[str, pd.DataFrame],
+                 symbol_info: Dict[str, pd.DataFrame], bars: Dict[str, pd.DataFrame] = None):
+        self.time = datetime.now(TIMEZONE)
+        self.positions = positions
+        self._ticks = ticks
+        self._symbol_info = symbol_info
+        self._bars = bars
+
+    @classmethod
+    async def gather(cls, symbols: List[str], timeframe: MT5Timeframe = None, bars: int = 0):
+        calls = [
+            aio.get_positions_versioned(),
+            aio.map_symbols(aio.symbol_info_tick, symbols),
+            aio.map_symbols(aio.symbol_info, symbols),
+        ]
+        if timeframe is not None and bars:
+            calls.append(aio.map_symbols(aio.fetch_data_pos, symbols, timeframe, bars))
+        positions, ticks, symbol_info, *frames = await asyncio.gather(*calls)
+        # Same rule as CycleSnapshot.fetch: no snapshot rather than one without positions
+        if positions is None:
+            logger.error("Gathered snapshot without positions, the positions read failed")
+            return None
+        return cls(positions, ticks, symbol_info, frames[0] if frames else None)
+
+    def symbol_info_tick(self, symbol: str) -> pd.DataFrame:
+        return self._ticks.get(symbol)
+
+    def symbol_info(self, symbol: str) -> pd.DataFrame:
+        return self._symbol_info.get(symbol)
+
+    def bars(self, symbol: str) -> pd.DataFrame:
+        if self._bars is None:
+            return None
+        return self._bars.get(symbol)
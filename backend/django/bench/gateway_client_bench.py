@@ -0,0 +1,113 @@
+"""
+Compare bare requests calls with the pooled GatewayClient over a full trading cycle.
+
+One cycle is the sequence of gateway calls an entry and trailing pass make: cycle
+snapshot, Bollinger signals, positions, a tick, a batch of orders and a batch of SL/TP
+changes. The gateway is a local stub that answers each call with a canned JSON body
+after --server-ms and counts the TCP connections it accepts, so the numbers show
+connection reuse and its latency cost, not MT5's.
+
+    cd backend/django && python bench/gateway_client_bench.py --cycles 200
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.utils.api.client import GatewayClient  # noqa: E402
+
+CYCLE = [
+    ('GET', '/cycle_snapshot', {'params': {'symbols': 'EURUSD,GBPUSD', 'num_bars': 0}}),
+    ('GET', '/indicators/bollinger', {'params': {'symbols': 'EURUSD,GBPUSD', 'timeframe': 'M5'}}),
+    ('GET', '/get_positions', {}),
+    ('GET', '/symbol_info_tick/EURUSD', {}),
+    ('POST', '/orders/batch', {'json': {'orders': [{'symbol': 'EURUSD', 'volume': 0.1, 'type': 'BUY'}]}}),
+    ('POST', '/modify_sl_tp/batch', {'json': {'changes': [{'position': 1, 'sl': 1.07}]}}),
+]
+
+
+class StubGateway(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, server_ms):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.server_ms = server_ms
+        self.connections = 0
+        self.lock = threading.Lock()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Like waitress, so headers and body written separately are not held back by Nagle
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def _reply(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        time.sleep(self.server.server_ms / 1000)
+        body = json.dumps({"results": [], "errors": {}, "path": self.path}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _reply
+    do_POST = _reply
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run(server, send, cycles):
+    start_connections = server.connections
+    samples = []
+    for _ in range(cycles):
+        started = time.perf_counter()
+        for method, path, kwargs in CYCLE:
+            send(method, path, **kwargs).raise_for_status()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000, server.connections - start_connections
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cycles', type=int, default=100)
+    parser.add_argument('--server-ms', type=float, default=0.0, help='Stub handling time per call')
+    args = parser.parse_args()
+
+    server = StubGateway(args.server_ms)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    def bare(method, path, **kwargs):
+        return requests.request(method, f"{base_url}{path}", timeout=10, **kwargs)
+
+    client = GatewayClient(base_url)
+
+    calls = args.cycles * len(CYCLE)
+    print(f"{args.cycles} cycles of {len(CYCLE)} calls ({calls} requests)")
+    print(f"{'client':16} {'cycle ms':>10} {'connections':>12}")
+    for name, send in (('bare requests', bare), ('GatewayClient', client.request)):
+        cycle_ms, connections = run(server, send, args.cycles)
+        print(f"{name:16} {cycle_ms:10.3f} {connections:12}")
+    print(f"GatewayClient stats: {json.dumps(client.stats()['latency'], indent=2)}")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,14 @@
 import logging
 import os
-from flask import Flask
+from flask import Flask, jsonify, request
 from dotenv import load_dotenv
-import MetaTrader5 as mt5
 from flasgger import Swagger
 from werkzeug.middleware.proxy_fix import ProxyFix
 from swagger import swagger_config
+from codec import OrjsonProvider
+from executor import executor, ExecutorBusy, Priority
+from connection import connection
+from events import watcher
 
 # Import routes
 from routes.health import health_bp
@@ -15,12 +18,17 @@ from routes.position import position_bp
 from routes.order import order_bp
 from routes.history import history_bp
 from routes.error import error_bp
+from routes.snapshot import snapshot_bp
+from routes.stream import stream_bp
+from routes.indicators import indicators_bp
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 app.config['PREFERRED_URL_SCHEME'] = 'https'
+# Every jsonify in the blueprints goes through orjson
+app.json = OrjsonProvider(app)
 
 swagger = Swagger(app, config=swagger_config)
 
@@ -32,10 +40,31 @@ app.register_blueprint(position_bp)
 app.register_blueprint(order_bp)
 app.register_blueprint(history_bp)
 app.register_blueprint(error_bp)
+app.register_blueprint(snapshot_bp)
+app.register_blueprint(stream_bp)
+app.register_blueprint(indicators_bp)
 
 app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
 
+@app.before_request
+def reject_reads_when_saturated():
+    # Shed data reads up front while the MT5 read lane is full; trade routes always get in
+    view = app.view_functions.get(request.endpoint)
+    if view is None or getattr(view, 'mt5_lane', Priority.READ) != Priority.READ:
+        return None
+    # Cached routes may still answer from memory or serve a stale value
+    if getattr(view, 'response_cache', False):
+        return None
+    if executor.is_saturated(Priority.READ):
+        return jsonify({"error": "MT5 gateway is busy, retry shortly"}), 503
+
+@app.errorhandler(ExecutorBusy)
+def handle_executor_busy(e):
+    return jsonify({"error": str(e)}), 503
+
+# Initialize MT5 once and keep watching the terminal, however the app is served
+connection.start()
+watcher.start()
+
 if __name__ == '__main__':
-    if not mt5.initialize():
-        logger.error("Failed to initialize MT5.")
     app.run(host='0.0.0.0', port=int(os.environ.get('MT5_API_PORT')))
\ No newline at end of file
@@ -0,0 +1,324 @@
+import io
+import logging
+import struct
+from datetime import date
+from typing import List, Optional
+
+import numpy as np
+import orjson
+import pandas as pd
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+try:
+    import pyarrow as pa
+except ImportError:  # Arrow output is optional, .npy is always available
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+JSON_MIMETYPE = 'application/json'
+NPY_MIMETYPE = 'application/x-npy'
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.stream'
+NDJSON_MIMETYPE = 'application/x-ndjson'
+FRAMES_MIMETYPE = 'application/x-mt5-frames'
+
+# Streams of binary frames: each frame is a 4-byte big-endian length followed by
+# that many bytes of payload. A zero-length frame marks the end of the stream.
+FRAME_HEADER = struct.Struct('>I')
+END_FRAME = FRAME_HEADER.pack(0)
+
+NPZ_MIMETYPE = 'application/x-npz'
+SSE_MIMETYPE = 'text/event-stream'
+
+# Frames stream whose payloads are delta-encoded tick chunks (see encode_ticks_delta)
+TICKS_MIMETYPE = 'application/x-mt5-ticks'
+
+TICKS_DELTA_VERSION = 1
+TICK_CHUNK_HEADER = struct.Struct('<BIB')  # version, count, price digits
+TICK_COLUMN_HEADER = struct.Struct('<cB')   # kind, delta width in bytes
+TICK_FIRST_VALUE = struct.Struct('<q')
+
+# Same layout as the arrays returned by copy_ticks_range / copy_ticks_from
+TICK_DTYPE = np.dtype([
+    ('time', '<i8'), ('bid', '<f8'), ('ask', '<f8'), ('last', '<f8'), ('volume', '<u8'),
+    ('time_msc', '<i8'), ('flags', '<u4'), ('volume_real', '<f8')
+])
+
+# Same layout as the arrays returned by copy_rates_range / copy_rates_from_pos
+RATES_DTYPE = np.dtype([
+    ('time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'),
+    ('tick_volume', '<u8'), ('spread', '<i4'), ('real_volume', '<u8')
+])
+
+# Encoded columns and the decimal digits they are scaled by before delta coding:
+# None for integer columns, 'price' for the symbol's digits. time is time_msc // 1000.
+TICK_COLUMNS = (
+    ('time_msc', None),
+    ('bid', 'price'),
+    ('ask', 'price'),
+    ('last', 'price'),
+    ('volume', None),
+    ('flags', None),
+    ('volume_real', 8),
+)
+
+DELTA_WIDTHS = ((1, np.int8), (2, np.int16), (4, np.int32), (8, np.int64))
+
+FORMAT_MIMETYPES = {
+    'json': JSON_MIMETYPE,
+    'npy': NPY_MIMETYPE,
+    'arrow': ARROW_MIMETYPE,
+}
+
+PANEL_FORMAT_MIMETYPES = {
+    'json': JSON_MIMETYPE,
+    'npz': NPZ_MIMETYPE,
+}
+
+
+def to_jsonable(obj):
+    """
+    Fallback for types neither JSON encoder handles natively: MT5 namedtuples become
+    dicts, structured NumPy arrays and records become lists of dicts / dicts, other
+    NumPy scalars and arrays become Python values, and dates use Flask's HTTP date
+    format so responses look the same with either encoder.
+    """
+    if hasattr(obj, '_asdict'):
+        return obj._asdict()
+    if isinstance(obj, date):
+        return http_date(obj)
+    if isinstance(obj, np.ndarray):
+        if obj.dtype.names:
+            return array_records(obj)
+        return obj.tolist()
+    if isinstance(obj, np.void) and obj.dtype.names:
+        return dict(zip(obj.dtype.names, obj.tolist()))
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def array_records(array: np.ndarray, converters: Optional[dict] = None) -> list:
+    """
+    A structured array as a list of dicts, built column-wise without a DataFrame.
+    converters maps field names to a function applied to each value of that field.
+    """
+    names = array.dtype.names
+    columns = [array[name].tolist() for name in names]
+    for name, convert in (converters or {}).items():
+        if name in names:
+            index = names.index(name)
+            columns[index] = [convert(value) for value in columns[index]]
+    return [dict(zip(names, values)) for values in zip(*columns)]
+
+
+JSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+def encode_json(obj) -> bytes:
+    """orjson with the same type handling as the Flask provider, for bodies built outside jsonify."""
+    return orjson.dumps(obj, default=to_jsonable, option=JSON_OPTIONS)
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by orjson, so every jsonify call in the blueprints
+    encodes in C. NumPy values and MT5 namedtuples can be passed as they are.
+    Sorted keys, HTTP dates and the trailing newline match Flask's default provider.
+    NaN and infinity are written as null instead of invalid JSON.
+    """
+
+    def _options(self):
+        options = JSON_OPTIONS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        return options
+
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, default=to_jsonable, option=self._options()).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=to_jsonable, option=self._options() | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def negotiate_format(req, formats: dict = FORMAT_MIMETYPES) -> str:
+    """
+    Pick the response format from the `format` query parameter, falling back to
+    the Accept header. JSON stays the default so existing clients are unaffected.
+    """
+    fmt = req.args.get('format')
+    if fmt:
+        fmt = fmt.lower()
+        if fmt not in formats:
+            valid_formats = ', '.join(formats)
+            raise ValueError(f"Invalid format: '{fmt}'. Valid options are: {valid_formats}.")
+    else:
+        best = req.accept_mimetypes.best_match(list(formats.values()), default=JSON_MIMETYPE)
+        fmt = next(name for name, mimetype in formats.items() if mimetype == best)
+
+    if fmt == 'arrow' and pa is None:
+        raise ValueError("Arrow format is not available on this server (pyarrow is not installed).")
+
+    return fmt
+
+
+def parse_fields(fields_str: Optional[str]) -> Optional[List[str]]:
+    if not fields_str:
+        return None
+    return [field.strip() for field in fields_str.split(',') if field.strip()]
+
+
+def check_fields(fields: Optional[List[str]], dtype: np.dtype):
+    """Raise ValueError if any of fields is not a field of dtype."""
+    unknown = [field for field in fields or () if field not in dtype.names]
+    if unknown:
+        valid_fields = ', '.join(dtype.names)
+        raise ValueError(f"Invalid fields: {', '.join(unknown)}. Valid options are: {valid_fields}.")
+
+
+def project_fields(array: np.ndarray, fields: Optional[List[str]]) -> np.ndarray:
+    """
+    Keep only the requested fields of a structured array, returned as a packed copy
+    so it can be written out without the padding of the original record layout.
+    """
+    if not fields:
+        return array
+
+    check_fields(fields, array.dtype)
+    projected = np.empty(len(array), dtype=[(field, array.dtype[field]) for field in fields])
+    for field in fields:
+        projected[field] = array[field]
+    return projected
+
+
+def encode_npy(array: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    np.save(buffer, array, allow_pickle=False)
+    return buffer.getvalue()
+
+
+def encode_arrow(array: np.ndarray) -> bytes:
+    table = pa.Table.from_arrays(
+        [pa.array(array[field]) for field in array.dtype.names],
+        names=list(array.dtype.names)
+    )
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_array(array: np.ndarray, fmt: str) -> bytes:
+    if fmt == 'npy':
+        return encode_npy(array)
+    if fmt == 'arrow':
+        return encode_arrow(array)
+    raise ValueError(f"Cannot binary-encode format: '{fmt}'.")
+
+
+def encode_npz(**arrays) -> bytes:
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    return buffer.getvalue()
+
+
+def encode_frame(payload: bytes) -> bytes:
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+
+def encode_ndjson(array: np.ndarray) -> bytes:
+    """
+    One JSON object per record, one record per line. Times stay as MT5 epoch values.
+    """
+    lines = pd.DataFrame(array).to_json(orient='records', lines=True)
+    return (lines.rstrip('\n') + '\n').encode('utf-8') if lines else b''
+
+
+def _delta_column(values: np.ndarray) -> bytes:
+    """First value as int64, then deltas in the narrowest signed width that holds them all."""
+    deltas = np.diff(values)
+    largest = int(np.abs(deltas).max()) if len(deltas) else 0
+    if largest == 0:
+        return TICK_COLUMN_HEADER.pack(b'D', 0) + TICK_FIRST_VALUE.pack(int(values[0]))
+    width, dtype = next((w, t) for w, t in DELTA_WIDTHS if largest <= np.iinfo(t).max)
+    return (TICK_COLUMN_HEADER.pack(b'D', width) + TICK_FIRST_VALUE.pack(int(values[0]))
+            + deltas.astype(np.dtype(dtype).newbyteorder('<')).tobytes())
+
+
+def _to_points(values: np.ndarray, digits: int) -> Optional[np.ndarray]:
+    """values as integer multiples of 10**-digits, or None if that would not round-trip exactly."""
+    scale = 10.0 ** digits
+    if not np.all(np.isfinite(values)) or np.any(np.abs(values) * scale >= 2.0 ** 53):
+        return None
+    points = np.rint(values * scale).astype(np.int64)
+    if not np.array_equal(points / scale, values):
+        return None
+    return points
+
+
+def encode_ticks_delta(ticks: np.ndarray, digits: int) -> bytes:
+    """
+    Encode an MT5 ticks array as one compact chunk. time_msc, integer columns and
+    prices in points are delta coded, each column in the narrowest integer width its
+    deltas fit, and an unchanged column costs nothing per tick. A price column that
+    is not on the 10**-digits grid is sent as raw float64 instead, so decoding is
+    always exact.
+    """
+    count = len(ticks)
+    parts = [TICK_CHUNK_HEADER.pack(TICKS_DELTA_VERSION, count, digits)]
+    if not count:
+        return parts[0]
+
+    for name, scale_digits in TICK_COLUMNS:
+        values = ticks[name]
+        if scale_digits is None:
+            parts.append(_delta_column(values.astype(np.int64)))
+            continue
+        points = _to_points(values, digits if scale_digits == 'price' else scale_digits)
+        if points is None:
+            parts.append(TICK_COLUMN_HEADER.pack(b'F', 8) + values.astype('<f8').tobytes())
+        else:
+            parts.append(_delta_column(points))
+    return b''.join(parts)
+
+
+def decode_ticks_delta(payload: bytes) -> np.ndarray:
+    """Inverse of encode_ticks_delta, returning an array with TICK_DTYPE."""
+    version, count, digits = TICK_CHUNK_HEADER.unpack_from(payload)
+    if version != TICKS_DELTA_VERSION:
+        raise ValueError(f"Unsupported tick chunk version: {version}")
+    ticks = np.zeros(count, dtype=TICK_DTYPE)
+    if not count:
+        return ticks
+
+    offset = TICK_CHUNK_HEADER.size
+    for name, scale_digits in TICK_COLUMNS:
+        kind, width = TICK_COLUMN_HEADER.unpack_from(payload, offset)
+        offset += TICK_COLUMN_HEADER.size
+        if kind == b'F':
+            ticks[name] = np.frombuffer(payload, '<f8', count, offset)
+            offset += 8 * count
+            continue
+
+        (first,) = TICK_FIRST_VALUE.unpack_from(payload, offset)
+        offset += TICK_FIRST_VALUE.size
+        values = np.full(count, first, dtype=np.int64)
+        if width:
+            dtype = dict(DELTA_WIDTHS)[width]
+            deltas = np.frombuffer(payload, np.dtype(dtype).newbyteorder('<'), count - 1, offset)
+            offset += width * (count - 1)
+            values[1:] += np.cumsum(deltas, dtype=np.int64)
+
+        if scale_digits is None:
+            ticks[name] = values
+        else:
+            ticks[name] = values / 10.0 ** (digits if scale_digits == 'price' else scale_digits)
+
+    ticks['time'] = ticks['time_msc'] // 1000
+    return ticks
@@ -0,0 +1,152 @@
+import logging
+import os
+import random
+import threading
+import time
+
+from executor import mt5, ExecutorBusy
+
+logger = logging.getLogger(__name__)
+
+CONNECTING = 'connecting'
+CONNECTED = 'connected'
+DEGRADED = 'degraded'
+
+
+class MT5Connection:
+    """
+    Owns the MT5 terminal connection for the whole gateway.
+
+    initialize() runs once on start. After that a background thread polls
+    terminal_info() and account_info(). If the terminal IPC link is lost, the gateway
+    is marked degraded and the thread re-initializes with exponential backoff.
+    Routes and /health read the cached state instead of calling initialize() themselves.
+    """
+
+    def __init__(self, check_interval=5.0, backoff_initial=1.0, backoff_max=60.0):
+        self.check_interval = check_interval
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.state = CONNECTING
+        self.initialized = False
+        self.terminal_connected = False
+        self.trade_allowed = False
+        self.account = None
+        self.last_check = None
+        self.last_error = None
+        self.state_since = time.time()
+        self.reconnect_attempts = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            check_interval=float(os.environ.get('MT5_HEALTH_CHECK_SECONDS', 5.0)),
+            backoff_initial=float(os.environ.get('MT5_RECONNECT_BACKOFF_SECONDS', 1.0)),
+            backoff_max=float(os.environ.get('MT5_RECONNECT_BACKOFF_MAX_SECONDS', 60.0)),
+        )
+
+    @property
+    def is_connected(self) -> bool:
+        return self.state == CONNECTED
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='mt5-connection', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.check_interval + 1)
+        if self.initialized:
+            mt5.shutdown()
+            self.initialized = False
+
+    def _set_state(self, state, error=None):
+        if state != self.state:
+            logger.info(f"MT5 connection state changed from {self.state} to {state}")
+            self.state = state
+            self.state_since = time.time()
+        self.last_error = error
+
+    def _initialize(self) -> bool:
+        if self.initialized:
+            mt5.shutdown()
+        self.initialized = bool(mt5.initialize())
+        if not self.initialized:
+            self._set_state(DEGRADED, f"initialize() failed: {mt5.last_error()}")
+        return self.initialized
+
+    def _check(self) -> bool:
+        """Refresh the cached terminal and account state. False means the IPC link is gone."""
+        terminal = mt5.terminal_info()
+        account = mt5.account_info()
+        self.last_check = time.time()
+
+        if terminal is None or account is None:
+            self.terminal_connected = False
+            self._set_state(DEGRADED, f"terminal_info()/account_info() failed: {mt5.last_error()}")
+            return False
+
+        self.terminal_connected = bool(terminal.connected)
+        self.trade_allowed = bool(terminal.trade_allowed)
+        self.account = {"login": account.login, "server": account.server}
+
+        # The terminal is up but has lost its broker; re-initializing will not help,
+        # so only report it and let the terminal reconnect on its own
+        if not self.terminal_connected:
+            self._set_state(DEGRADED, "Terminal is not connected to the trade server")
+        else:
+            self._set_state(CONNECTED)
+        return True
+
+    def _run(self):
+        backoff = self.backoff_initial
+        while not self._stop.is_set():
+            try:
+                if not self.initialized:
+                    healthy = self._initialize() and self._check()
+                else:
+                    healthy = self._check()
+                    if not healthy:
+                        healthy = self._initialize() and self._check()
+            except ExecutorBusy:
+                # Reads are being shed; skip this round rather than flag the terminal
+                self._stop.wait(self.check_interval)
+                continue
+            except Exception as e:
+                logger.error(f"Error checking MT5 connection: {str(e)}")
+                self._set_state(DEGRADED, str(e))
+                healthy = False
+
+            if healthy:
+                backoff = self.backoff_initial
+                self.reconnect_attempts = 0
+                self._stop.wait(self.check_interval)
+            else:
+                self.reconnect_attempts += 1
+                delay = min(backoff, self.backoff_max) * random.uniform(0.8, 1.2)
+                logger.error(f"MT5 connection degraded, retrying in {delay:.1f}s (attempt {self.reconnect_attempts})")
+                self._stop.wait(delay)
+                backoff = min(backoff * 2, self.backoff_max)
+
+    def status(self) -> dict:
+        return {
+            "state": self.state,
+            "state_since": self.state_since,
+            "initialized": self.initialized,
+            "terminal_connected": self.terminal_connected,
+            "trade_allowed": self.trade_allowed,
+            "account": self.account,
+            "last_check": self.last_check,
+            "last_error": self.last_error,
+            "reconnect_attempts": self.reconnect_attempts
+        }
+
+
+connection = MT5Connection.from_env()
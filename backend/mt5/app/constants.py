@@ -12,6 +12,11 @@ class MT5Timeframe(Enum):
     W1 = mt5.TIMEFRAME_W1       # weekly
     MN1 = mt5.TIMEFRAME_MN1     # monthly
 
+class MT5CopyTicks(Enum):
+    INFO = mt5.COPY_TICKS_INFO      # bid/ask changes
+    TRADE = mt5.COPY_TICKS_TRADE    # last/volume changes
+    ALL = mt5.COPY_TICKS_ALL        # every tick
+
 TRADE_RETCODE_DESCRIPTION = {
     mt5.TRADE_RETCODE_REQUOTE: "Requote",
     mt5.TRADE_RETCODE_REJECT: "Request rejected",
@@ -0,0 +1,241 @@
+import logging
+import os
+import threading
+import time
+
+try:
+    import redis
+except ImportError:  # Events are optional; without redis the watcher stays off
+    redis = None
+
+from executor import mt5, ExecutorBusy
+from positions_book import positions_book
+from codec import encode_json
+
+logger = logging.getLogger(__name__)
+
+POSITION_OPENED = 'position_opened'
+POSITION_MODIFIED = 'position_modified'
+POSITION_CLOSED = 'position_closed'
+DEAL = 'deal'
+
+# Deal times are broker server time, which can be hours off UTC; query windows are
+# padded by a day on the open end so no timezone offset can hide a fresh deal
+DEAL_WINDOW_PADDING = 24 * 60 * 60
+
+# Same fields the positions book versions on; price moves are not events
+POSITION_FIELDS = ('time_update_msc', 'sl', 'tp', 'volume')
+
+
+def _changed(row, previous) -> bool:
+    return any(row.get(field) != previous.get(field) for field in POSITION_FIELDS)
+
+
+class EventWatcher:
+    """
+    Publishes position and deal events to a Redis stream.
+
+    A background thread refreshes the versioned positions book. When its version
+    moves, the thread publishes one event per opened, modified or closed position.
+    New deals are looked up whenever positions change, and on a slower sweep to catch
+    deals that do not touch a position. Each stream entry has the fields type,
+    ticket, symbol, version, time and data (the row as JSON).
+
+    State only advances after a publish succeeds, so events are re-sent instead of
+    lost while Redis is down. Consumers must therefore tolerate duplicates.
+    """
+
+    def __init__(self, redis_url=None, stream='mt5:events', poll_interval=0.5,
+                 deal_sweep_interval=5.0, maxlen=10000):
+        self.redis_url = redis_url
+        self.stream = stream
+        self.poll_interval = poll_interval
+        self.deal_sweep_interval = deal_sweep_interval
+        self.maxlen = maxlen
+        self.version = None
+        self.published = 0
+        self.errors = 0
+        self.last_error = None
+        self.last_publish = None
+        self._rows = {}
+        self._deals = {}
+        self._deals_from = None
+        self._last_sweep = 0.0
+        self._client = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            redis_url=os.environ.get('MT5_EVENTS_REDIS_URL'),
+            stream=os.environ.get('MT5_EVENTS_STREAM', 'mt5:events'),
+            poll_interval=float(os.environ.get('MT5_EVENTS_POLL_SECONDS', 0.5)),
+            deal_sweep_interval=float(os.environ.get('MT5_EVENTS_DEAL_SWEEP_SECONDS', 5.0)),
+            maxlen=int(os.environ.get('MT5_EVENTS_STREAM_MAXLEN', 10000)),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            if not self.redis_url:
+                logger.info("MT5_EVENTS_REDIS_URL is not set, position and deal events are disabled")
+                return
+            if redis is None:
+                logger.error("MT5_EVENTS_REDIS_URL is set but the redis package is not installed, events are disabled")
+                return
+            self._client = redis.Redis.from_url(self.redis_url)
+            self._thread = threading.Thread(target=self._run, name='mt5-events', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval + 1)
+
+    def _event(self, event_type, row, version):
+        return {
+            "type": event_type,
+            "ticket": row['ticket'],
+            "symbol": row.get('symbol', ''),
+            "version": version,
+            "time": time.time(),
+            "data": encode_json(row)
+        }
+
+    def _publish(self, events):
+        if not events:
+            return
+        pipe = self._client.pipeline(transaction=False)
+        for event in events:
+            pipe.xadd(self.stream, event, maxlen=self.maxlen, approximate=True)
+        pipe.execute()
+        self.published += len(events)
+        self.last_publish = time.time()
+
+    def _seed(self):
+        """Take the current positions and deals as the baseline, without publishing them."""
+        if not positions_book.refresh():
+            return False
+        self.version, rows = positions_book.snapshot()
+        self._rows = {row['ticket']: row for row in rows}
+
+        now = int(time.time())
+        self._deals_from = now - DEAL_WINDOW_PADDING
+        deals = mt5.history_deals_get(self._deals_from, now + DEAL_WINDOW_PADDING)
+        self._deals = {deal.ticket: deal.time for deal in deals or ()}
+        return True
+
+    def _position_events(self):
+        if not positions_book.refresh():
+            return [], None, None
+
+        delta = positions_book.delta(self.version)
+        if delta is None:
+            # Fell behind the book's change log: diff the full book instead
+            version, rows = positions_book.snapshot()
+            current = {row['ticket']: row for row in rows}
+            delta = {
+                "version": version,
+                "opened": [row for ticket, row in current.items() if ticket not in self._rows],
+                "modified": [
+                    row for ticket, row in current.items()
+                    if ticket in self._rows and _changed(row, self._rows[ticket])
+                ],
+                "closed": [ticket for ticket in self._rows if ticket not in current]
+            }
+        if delta['version'] == self.version:
+            return [], None, None
+
+        version = delta['version']
+        rows = dict(self._rows)
+        events = []
+        for row in delta['opened']:
+            events.append(self._event(POSITION_OPENED, row, version))
+            rows[row['ticket']] = row
+        for row in delta['modified']:
+            events.append(self._event(POSITION_MODIFIED, row, version))
+            rows[row['ticket']] = row
+        for ticket in delta['closed']:
+            # The last row seen for the position, so consumers know what closed
+            row = rows.pop(ticket, None) or {"ticket": ticket}
+            events.append(self._event(POSITION_CLOSED, row, version))
+        return events, version, rows
+
+    def _deal_events(self):
+        now = int(time.time())
+        deals = mt5.history_deals_get(self._deals_from, now + DEAL_WINDOW_PADDING)
+        if deals is None:
+            return [], None
+
+        known = dict(self._deals)
+        events = []
+        for deal in deals:
+            if deal.ticket in known:
+                continue
+            known[deal.ticket] = deal.time
+            events.append(self._event(DEAL, deal._asdict(), self.version))
+
+        # Keep the window and the seen set bounded by the newest deal time
+        if known:
+            newest = max(known.values())
+            self._deals_from = max(self._deals_from, newest - DEAL_WINDOW_PADDING)
+            known = {ticket: t for ticket, t in known.items() if t >= self._deals_from}
+        return events, known
+
+    def _poll(self):
+        events, version, rows = self._position_events()
+
+        sweep_due = time.monotonic() - self._last_sweep >= self.deal_sweep_interval
+        deals = None
+        if events or sweep_due:
+            deal_events, deals = self._deal_events()
+            events += deal_events
+
+        self._publish(events)
+
+        # Only advance once the events are in Redis, so a failed publish is retried
+        if version is not None:
+            self.version, self._rows = version, rows
+        if deals is not None:
+            self._deals = deals
+            self._last_sweep = time.monotonic()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self.version is None:
+                    if not self._seed():
+                        self._stop.wait(self.poll_interval)
+                        continue
+                self._poll()
+            except ExecutorBusy:
+                pass
+            except Exception as e:
+                self.errors += 1
+                self.last_error = str(e)
+                logger.error(f"Error publishing MT5 events: {str(e)}")
+                self._stop.wait(min(self.poll_interval * 10, 5.0))
+                continue
+            self._stop.wait(self.poll_interval)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "stream": self.stream,
+            "version": self.version,
+            "positions": len(self._rows),
+            "published": self.published,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "last_publish": self.last_publish
+        }
+
+
+watcher = EventWatcher.from_env()
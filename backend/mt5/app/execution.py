@@ -0,0 +1,229 @@
+import os
+import threading
+import time
+import logging
+from typing import Callable, Optional
+
+from executor import mt5, executor, Priority
+
+logger = logging.getLogger(__name__)
+
+# Retcodes where the price moved under the order; resending at a fresh price can succeed
+REQUOTE_RETCODES = {
+    mt5.TRADE_RETCODE_REQUOTE,
+    mt5.TRADE_RETCODE_PRICE_CHANGED,
+    mt5.TRADE_RETCODE_PRICE_OFF
+}
+
+
+class TokenBucket:
+    """`rate` order slots per second, of which up to `burst` can be used at once."""
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self, now: float) -> float:
+        """
+        Reserve the next slot and return how many seconds until it is due, 0 when it is
+        free now. Tokens go negative while slots are reserved ahead, so callers that
+        wait at the same time are given successive slots instead of the same one.
+        """
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return max(0.0, -self.tokens / self.rate)
+
+    def give_back(self):
+        """Return a reserved slot that will not be used."""
+        self.tokens = min(self.burst, self.tokens + 1)
+
+    def drain(self, now: float):
+        # Slots already reserved ahead stay reserved
+        self.tokens = min(self.tokens, 0.0)
+        self.updated = now
+
+
+class ExecutionEngine:
+    """
+    Sends market deals with per-symbol throttling and immediate retries.
+
+    Every attempt takes a slot from its symbol's token bucket, then reads a fresh tick,
+    prices the request and sends it as one trade-lane job. Requotes and price changes
+    are resent straight away at the new price, as long as the price has not drifted
+    more than max_drift_points from the first attempt (the order's own deviation when
+    unset). TOO_MANY_REQUESTS empties the symbol's bucket, so the retry waits for the
+    next slot. No attempt starts after time_budget seconds. Waits happen in the
+    calling thread, never on the executor, so execute() must not be called from
+    inside an executor job.
+    """
+
+    def __init__(self, rate=5.0, burst=5, max_attempts=5, time_budget=2.0, max_drift_points=None):
+        self.rate = rate
+        self.burst = burst
+        self.max_attempts = max_attempts
+        self.time_budget = time_budget
+        self.max_drift_points = max_drift_points
+        self._buckets = {}
+        self._points = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.filled = 0
+        self.retries = 0
+        self.throttled = 0
+        self.throttle_wait = 0.0
+        self.fill_time_avg = 0.0
+        self.fill_time_max = 0.0
+
+    @classmethod
+    def from_env(cls):
+        max_drift_points = os.environ.get('MT5_EXEC_MAX_DRIFT_POINTS')
+        return cls(
+            rate=float(os.environ.get('MT5_EXEC_RATE_PER_SECOND', 5.0)),
+            burst=int(os.environ.get('MT5_EXEC_BURST', 5)),
+            max_attempts=int(os.environ.get('MT5_EXEC_MAX_ATTEMPTS', 5)),
+            time_budget=float(os.environ.get('MT5_EXEC_TIME_BUDGET_SECONDS', 2.0)),
+            max_drift_points=int(max_drift_points) if max_drift_points else None,
+        )
+
+    def _take(self, symbol: str) -> float:
+        with self._lock:
+            bucket = self._buckets.get(symbol)
+            if bucket is None:
+                bucket = self._buckets[symbol] = TokenBucket(self.rate, self.burst)
+            return bucket.take(time.monotonic())
+
+    def _give_back(self, symbol: str):
+        with self._lock:
+            self._buckets[symbol].give_back()
+
+    def _drain(self, symbol: str):
+        with self._lock:
+            self._buckets[symbol].drain(time.monotonic())
+
+    def _point(self, symbol: str) -> Optional[float]:
+        point = self._points.get(symbol)
+        if point is None:
+            info = mt5.symbol_info(symbol)
+            if info is None:
+                return None
+            point = self._points[symbol] = info.point
+        return point
+
+    def _attempt(self, symbol: str, build_request: Callable, first_price: Optional[float]):
+        """One trade-lane job: fresh tick, drift check, order_send. Returns (request, result, latency, error)."""
+        tick = mt5.symbol_info_tick(symbol)
+        if tick is None:
+            return None, None, 0.0, f"Failed to get tick for symbol: {symbol}"
+
+        request = build_request(tick)
+        if not request.get('price'):
+            return request, None, 0.0, f"Invalid price retrieved for symbol: {symbol}"
+
+        if first_price is not None:
+            point = self._point(symbol)
+            max_drift = self.max_drift_points if self.max_drift_points is not None else request.get('deviation', 0)
+            if point and abs(request['price'] - first_price) > max_drift * point + point / 2:
+                drift = round(abs(request['price'] - first_price) / point)
+                return request, None, 0.0, f"Price moved {drift} points since the first attempt, more than {max_drift}"
+
+        started = time.perf_counter()
+        result = mt5.order_send(request)
+        latency = time.perf_counter() - started
+        error = None
+        if result is None:
+            error_code, error = mt5.last_error()
+        return request, result, latency, error
+
+    def execute(self, symbol: str, build_request: Callable) -> dict:
+        """
+        Send the deal built by build_request(tick) until it fills, fails for good or
+        runs out of attempts or time. Returns success, result (the last order_send
+        result), error, throttled, attempts, attempt_log (retcode, comment, price and
+        latency_ms of each order_send) and elapsed_ms.
+        """
+        started = time.monotonic()
+        deadline = started + self.time_budget
+        attempt_log = []
+        execution = {"success": False, "result": None, "error": None, "throttled": False}
+        first_price = None
+
+        while len(attempt_log) < self.max_attempts:
+            wait = self._take(symbol)
+            if wait:
+                if time.monotonic() + wait > deadline:
+                    self._give_back(symbol)
+                    execution["throttled"] = not attempt_log
+                    execution["error"] = execution["error"] or f"Too many orders for {symbol}, no slot within the time budget"
+                    break
+                # The slot is already reserved, so the attempt goes ahead once it is due
+                time.sleep(wait)
+                with self._lock:
+                    self.throttle_wait += wait
+
+            request, result, latency, error = executor.call(self._attempt, symbol, build_request, first_price,
+                                                            priority=Priority.TRADE)
+            if result is None:
+                execution["error"] = error
+                break
+
+            attempt_log.append({
+                "retcode": result.retcode,
+                "comment": result.comment,
+                "price": request['price'],
+                "latency_ms": round(latency * 1000, 3)
+            })
+            if first_price is None:
+                first_price = request['price']
+            execution["result"] = result
+
+            if result.retcode == mt5.TRADE_RETCODE_DONE:
+                execution["success"] = True
+                execution["error"] = None
+                break
+            execution["error"] = result.comment
+            if result.retcode == mt5.TRADE_RETCODE_TOO_MANY_REQUESTS:
+                self._drain(symbol)
+            elif result.retcode not in REQUOTE_RETCODES:
+                break
+            if time.monotonic() >= deadline:
+                break
+
+        elapsed = time.monotonic() - started
+        with self._lock:
+            self.executions += 1
+            self.retries += max(len(attempt_log) - 1, 0)
+            if execution["throttled"]:
+                self.throttled += 1
+            if execution["success"]:
+                self.filled += 1
+                self.fill_time_avg = elapsed if self.filled == 1 else 0.9 * self.fill_time_avg + 0.1 * elapsed
+                self.fill_time_max = max(self.fill_time_max, elapsed)
+
+        execution["attempts"] = len(attempt_log)
+        execution["attempt_log"] = attempt_log
+        execution["elapsed_ms"] = round(elapsed * 1000, 3)
+        return execution
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "symbols": len(self._buckets),
+                "rate_per_second": self.rate,
+                "burst": self.burst,
+                "max_attempts": self.max_attempts,
+                "time_budget_ms": round(self.time_budget * 1000, 3),
+                "executions": self.executions,
+                "filled": self.filled,
+                "retries": self.retries,
+                "throttled": self.throttled,
+                "throttle_wait_ms": round(self.throttle_wait * 1000, 3),
+                "fill_time_avg_ms": round(self.fill_time_avg * 1000, 3),
+                "fill_time_max_ms": round(self.fill_time_max * 1000, 3)
+            }
+
+
+execution_engine = ExecutionEngine.from_env()
@@ -0,0 +1,215 @@
+import itertools
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from enum import IntEnum
+from functools import wraps
+
+import MetaTrader5 as _mt5
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    TRADE = 0   # order_send, closes, SL/TP changes
+    READ = 1    # everything else
+
+
+# MT5 functions that always run in the trade lane, whoever calls them
+TRADE_FUNCTIONS = {'order_send', 'order_send_async', 'order_check'}
+
+
+class ExecutorBusy(Exception):
+    """Raised when a call is rejected because its lane is full, or timed out before it started."""
+
+
+_local = threading.local()
+
+
+def current_lane() -> Priority:
+    return getattr(_local, 'priority', Priority.READ)
+
+
+@contextmanager
+def lane(priority: Priority):
+    """Run every MT5 call made by this thread inside the block in the given lane."""
+    previous = current_lane()
+    _local.priority = priority
+    try:
+        yield
+    finally:
+        _local.priority = previous
+
+
+def trade_lane(view):
+    """
+    Mark a route as a trade action: its MT5 calls (including the tick reads it makes
+    before sending) jump ahead of queued data reads.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        with lane(Priority.TRADE):
+            return view(*args, **kwargs)
+    wrapper.mt5_lane = Priority.TRADE
+    return wrapper
+
+
+class MT5Executor:
+    """
+    Single thread that owns every MT5 call. Calls queue in two priority lanes,
+    and trade actions always run ahead of reads. Each lane has its own bound. A full
+    read lane rejects new reads immediately instead of letting them pile up behind a
+    slow copy_rates_range.
+    """
+
+    def __init__(self, max_reads=64, max_trades=256, timeout=30.0):
+        self.max_pending = {Priority.TRADE: max_trades, Priority.READ: max_reads}
+        self.timeout = timeout
+        self._queue = queue.PriorityQueue()
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._pending = {Priority.TRADE: 0, Priority.READ: 0}
+        self._executed = {Priority.TRADE: 0, Priority.READ: 0}
+        self._rejected = {Priority.TRADE: 0, Priority.READ: 0}
+        self._wait_last = {Priority.TRADE: 0.0, Priority.READ: 0.0}
+        self._wait_avg = {Priority.TRADE: 0.0, Priority.READ: 0.0}
+        self._wait_max = {Priority.TRADE: 0.0, Priority.READ: 0.0}
+        self._busy_since = None
+        self._thread = threading.Thread(target=self._run, name='mt5-executor', daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_reads=int(os.environ.get('MT5_EXECUTOR_MAX_READS', 64)),
+            max_trades=int(os.environ.get('MT5_EXECUTOR_MAX_TRADES', 256)),
+            timeout=float(os.environ.get('MT5_EXECUTOR_TIMEOUT', 30.0)),
+        )
+
+    def in_executor(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    def is_saturated(self, priority: Priority) -> bool:
+        with self._lock:
+            return self._pending[priority] >= self.max_pending[priority]
+
+    def submit(self, fn, *args, priority: Priority = Priority.READ, **kwargs) -> Future:
+        future = Future()
+
+        # Calls made from the executor thread itself run inline, otherwise they would
+        # wait on a queue only this thread drains
+        if self.in_executor():
+            future.set_running_or_notify_cancel()
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+            return future
+
+        with self._lock:
+            if self._pending[priority] >= self.max_pending[priority]:
+                self._rejected[priority] += 1
+                raise ExecutorBusy(f"MT5 executor {priority.name.lower()} lane is full")
+            self._pending[priority] += 1
+
+        self._queue.put((priority, next(self._counter), time.monotonic(), future, fn, args, kwargs))
+        return future
+
+    def call(self, fn, *args, priority: Priority = None, **kwargs):
+        if priority is None:
+            priority = current_lane()
+        future = self.submit(fn, *args, priority=priority, **kwargs)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            # Still queued: it never ran, so the caller can safely retry
+            if future.cancel():
+                raise ExecutorBusy(f"MT5 call waited over {self.timeout}s in the {priority.name.lower()} lane")
+            if priority == Priority.TRADE:
+                # Already running: the trade may still fill, so its outcome is waited for
+                # rather than reported as a failure
+                logger.warning(f"MT5 trade call {getattr(fn, '__name__', fn)} still running after {self.timeout}s")
+                return future.result()
+            raise
+
+    def _run(self):
+        while True:
+            priority, _, enqueued_at, future, fn, args, kwargs = self._queue.get()
+            wait = time.monotonic() - enqueued_at
+
+            with self._lock:
+                self._pending[priority] -= 1
+                self._wait_last[priority] = wait
+                self._wait_avg[priority] = 0.9 * self._wait_avg[priority] + 0.1 * wait
+                self._wait_max[priority] = max(self._wait_max[priority], wait)
+
+            # The caller may have timed out and cancelled while the call was queued
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            self._busy_since = time.monotonic()
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                logger.error(f"MT5 call {getattr(fn, '__name__', fn)} failed: {str(e)}")
+                future.set_exception(e)
+            finally:
+                self._busy_since = None
+                with self._lock:
+                    self._executed[priority] += 1
+
+    def stats(self) -> dict:
+        busy_since = self._busy_since
+        with self._lock:
+            return {
+                "busy_for_ms": round((time.monotonic() - busy_since) * 1000, 3) if busy_since else 0.0,
+                "lanes": {
+                    priority.name.lower(): {
+                        "depth": self._pending[priority],
+                        "max_depth": self.max_pending[priority],
+                        "executed": self._executed[priority],
+                        "rejected": self._rejected[priority],
+                        "wait_last_ms": round(self._wait_last[priority] * 1000, 3),
+                        "wait_avg_ms": round(self._wait_avg[priority] * 1000, 3),
+                        "wait_max_ms": round(self._wait_max[priority] * 1000, 3),
+                    }
+                    for priority in Priority
+                }
+            }
+
+
+class MT5Proxy:
+    """
+    Stand-in for the MetaTrader5 module that runs every function call on the executor
+    thread. Constants and types are passed through untouched, so `from executor import mt5`
+    can replace `import MetaTrader5 as mt5`.
+    """
+
+    def __init__(self, module, executor: MT5Executor):
+        self._module = module
+        self._executor = executor
+        self._wrappers = {}
+
+    def __getattr__(self, name):
+        attr = getattr(self._module, name)
+        if not callable(attr) or isinstance(attr, type):
+            return attr
+
+        wrapper = self._wrappers.get(name)
+        if wrapper is None:
+            priority = Priority.TRADE if name in TRADE_FUNCTIONS else None
+
+            def wrapper(*args, **kwargs):
+                return self._executor.call(attr, *args, priority=priority, **kwargs)
+
+            wrapper.__name__ = name
+            self._wrappers[name] = wrapper
+        return wrapper
+
+
+executor = MT5Executor.from_env()
+mt5 = MT5Proxy(_mt5, executor)
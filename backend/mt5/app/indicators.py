@@ -0,0 +1,50 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+TOP = 'top'
+BOTTOM = 'bottom'
+
+# Signal codes returned by band_crossovers
+NO_SIGNAL = 0
+TOP_SIGNAL = 1
+BOTTOM_SIGNAL = -1
+
+SIGNAL_NAMES = {NO_SIGNAL: None, TOP_SIGNAL: TOP, BOTTOM_SIGNAL: BOTTOM}
+
+
+def bollinger_bands(close: np.ndarray, window: int, num_std_dev: float):
+    """
+    Rolling mean of close and the bands num_std_dev sample standard deviations above
+    and below it, as pandas' rolling(window).mean() / .std() compute them. The first
+    window - 1 values are NaN.
+    """
+    middle = np.full(len(close), np.nan)
+    upper = np.full(len(close), np.nan)
+    lower = np.full(len(close), np.nan)
+    if len(close) < window:
+        return middle, upper, lower
+
+    windows = sliding_window_view(close, window)
+    mean = windows.mean(axis=1)
+    deviation = windows.std(axis=1, ddof=1) * num_std_dev
+    middle[window - 1:] = mean
+    upper[window - 1:] = mean + deviation
+    lower[window - 1:] = mean - deviation
+    return middle, upper, lower
+
+
+def band_crossovers(close: np.ndarray, upper: np.ndarray, lower: np.ndarray) -> np.ndarray:
+    """
+    Signal code per bar: TOP_SIGNAL where close crossed above the upper band since the
+    previous bar, BOTTOM_SIGNAL where it crossed below the lower band. Comparisons with
+    NaN bands are false, so bars without full bands never signal.
+    """
+    signals = np.zeros(len(close), dtype=np.int8)
+    if len(close) < 2:
+        return signals
+
+    crossed_up = (close[:-1] <= upper[:-1]) & (close[1:] > upper[1:])
+    crossed_down = (close[:-1] >= lower[:-1]) & (close[1:] < lower[1:])
+    signals[1:][crossed_down] = BOTTOM_SIGNAL
+    signals[1:][crossed_up] = TOP_SIGNAL
+    return signals
@@ -1,59 +1,256 @@
-import MetaTrader5 as mt5
+from executor import mt5, executor, Priority
 from datetime import datetime, timedelta
-from typing import List, Dict
+from typing import List, Dict, Callable, Iterator
+import numpy as np
 import pandas as pd
-from constants import MT5Timeframe
+import pytz
+from constants import MT5Timeframe, MT5CopyTicks
+from resample import parse_resampled
+from execution import execution_engine, REQUOTE_RETCODES
 import logging
 
 logger = logging.getLogger(__name__)
 
-def get_timeframe(timeframe_str: str) -> MT5Timeframe:
+def get_timeframe(timeframe_str: str):
+    """
+    The MT5 constant for a standard timeframe, or a ResampledTimeframe for other
+    minute or hour multiples (e.g. M2, M10, H2), which are aggregated in the gateway.
+    """
     try:
         return MT5Timeframe[timeframe_str.upper()].value
     except KeyError:
-        valid_timeframes = ', '.join([t.name for t in MT5Timeframe])
-        raise ValueError(
-            f"Invalid timeframe: '{timeframe_str}'. Valid options are: {valid_timeframes}."
-        )
+        pass
 
+    resampled = parse_resampled(timeframe_str)
+    if resampled is not None:
+        return resampled.source if resampled.factor == 1 else resampled
 
-def close_position(position, deviation=20, magic=0, comment='', type_filling=mt5.ORDER_FILLING_IOC):
-    if 'type' not in position or 'ticket' not in position:
-        logger.error("Position dictionary missing 'type' or 'ticket' keys.")
-        return None
+    valid_timeframes = ', '.join([t.name for t in MT5Timeframe])
+    raise ValueError(
+        f"Invalid timeframe: '{timeframe_str}'. Valid options are: {valid_timeframes}, "
+        f"or M<minutes> / H<hours> up to one day."
+    )
 
-    order_type_dict = {
-        0: mt5.ORDER_TYPE_BUY,
-        1: mt5.ORDER_TYPE_SELL
-    }
 
-    position_type = position['type']
-    if position_type not in order_type_dict:
-        logger.error(f"Unknown position type: {position_type}")
-        return None
+def get_tick_flags(flags_str: str) -> int:
+    try:
+        return MT5CopyTicks[flags_str.upper()].value
+    except KeyError:
+        valid_flags = ', '.join([f.name for f in MT5CopyTicks])
+        raise ValueError(
+            f"Invalid tick flags: '{flags_str}'. Valid options are: {valid_flags}."
+        )
 
-    tick = mt5.symbol_info_tick(position['symbol'])
-    if tick is None:
-        logger.error(f"Failed to get tick for symbol: {position['symbol']}")
-        return None
 
-    price_dict = {
-        0: tick.ask,  # Buy order uses Ask price
-        1: tick.bid   # Sell order uses Bid price
+def parse_datetime(value: str) -> datetime:
+    # Naive ISO strings are taken as UTC, which is what the MT5 copy_* functions expect
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        return pytz.UTC.localize(parsed)
+    return parsed.astimezone(pytz.UTC)
+
+
+def iter_range_chunks(fetch: Callable, start: datetime, end: datetime, chunk: timedelta,
+                      time_field: str = 'time') -> Iterator[np.ndarray]:
+    """
+    Walk [start, end] in fixed time chunks and yield the array returned by
+    fetch(chunk_start, chunk_end) for each one. MT5 range queries include both
+    bounds, so records already yielded for the previous chunk are dropped.
+    """
+    last_time = None
+    chunk_start = start
+    while chunk_start <= end:
+        chunk_end = min(chunk_start + chunk, end)
+        records = fetch(chunk_start, chunk_end)
+        if records is None:
+            raise RuntimeError(f"Failed to fetch range {chunk_start} - {chunk_end}: {mt5.last_error()}")
+
+        if last_time is not None and len(records):
+            records = records[records[time_field] > last_time]
+        if len(records):
+            last_time = records[time_field][-1]
+            yield records
+
+        if chunk_end >= end:
+            break
+        chunk_start = chunk_end
+
+
+
+def iter_ticks_from(fetch: Callable, start: datetime, count: int, page_size: int) -> Iterator[np.ndarray]:
+    """
+    Page through fetch(date_from, count), a copy_ticks_from call, until count ticks
+    were yielded or the history runs out. MT5 takes the start in whole seconds, so
+    every page after the first restarts at the second of the last tick, and ticks
+    already yielded are dropped.
+    """
+    date_from = start
+    last_msc = None
+    sent_at_last = 0
+    remaining = count
+    while remaining > 0:
+        requested = min(page_size, remaining) if last_msc is None else page_size
+        ticks = fetch(date_from, requested)
+        if ticks is None:
+            raise RuntimeError(f"Failed to fetch ticks from {date_from}: {mt5.last_error()}")
+        exhausted = len(ticks) < requested
+
+        if last_msc is not None:
+            ticks = ticks[ticks['time_msc'] >= last_msc]
+            # Ticks sharing the last millisecond keep their order, skip the ones already sent
+            ticks = ticks[min(sent_at_last, int(np.count_nonzero(ticks['time_msc'] == last_msc))):]
+        ticks = ticks[:remaining]
+
+        if len(ticks):
+            remaining -= len(ticks)
+            newest = int(ticks['time_msc'][-1])
+            at_newest = int(np.count_nonzero(ticks['time_msc'] == newest))
+            sent_at_last = sent_at_last + at_newest if newest == last_msc else at_newest
+            last_msc = newest
+            date_from = last_msc // 1000
+            yield ticks
+        elif not exhausted:
+            raise RuntimeError(f"More than {page_size} ticks in the second at {date_from}, use a larger page size")
+
+        if exhausted:
+            break
+
+
+PANEL_FIELDS = ('open', 'high', 'low', 'close', 'tick_volume', 'spread', 'real_volume')
+
+def build_panel(rates_by_symbol: Dict[str, np.ndarray], fields=PANEL_FIELDS):
+    """
+    Align per-symbol rates on the union of their bar times.
+
+    Returns (times, values, missing): times is the sorted shared index, values is a
+    float array shaped (fields, symbols, bars) with NaN where a symbol has no bar, and
+    missing is the matching (symbols, bars) boolean mask.
+    """
+    symbols = list(rates_by_symbol)
+    present = [rates['time'] for rates in rates_by_symbol.values() if rates is not None and len(rates)]
+    times = np.unique(np.concatenate(present)) if present else np.empty(0, dtype=np.int64)
+
+    values = np.full((len(fields), len(symbols), len(times)), np.nan)
+    missing = np.ones((len(symbols), len(times)), dtype=bool)
+
+    for i, symbol in enumerate(symbols):
+        rates = rates_by_symbol[symbol]
+        if rates is None or not len(rates):
+            continue
+        positions = np.searchsorted(times, rates['time'])
+        missing[i, positions] = False
+        for j, field in enumerate(fields):
+            values[j, i, positions] = rates[field]
+
+    return times, values, missing
+
+
+ORDER_TYPES = {
+    'BUY': mt5.ORDER_TYPE_BUY,
+    'SELL': mt5.ORDER_TYPE_SELL
+}
+
+
+def _order_constant(value, prefix: str, valid: Dict[str, int]):
+    """Accept an MT5 constant either as its int value or by name ('BUY', 'ORDER_TYPE_BUY')."""
+    if isinstance(value, str):
+        name = value.upper()
+        if name in valid:
+            return valid[name]
+        if name.startswith(prefix) and name[len(prefix):] in valid:
+            return valid[name[len(prefix):]]
+        raise ValueError(f"Invalid value '{value}'. Valid options are: {', '.join(valid)}.")
+    if value in valid.values():
+        return value
+    raise ValueError(f"Invalid value '{value}'. Valid options are: {', '.join(valid)}.")
+
+
+def parse_market_order(data: dict) -> dict:
+    """Validate one market order from a request body and build the order_send request without a price."""
+    required_fields = ['symbol', 'volume', 'type']
+    missing = [field for field in required_fields if field not in data]
+    if missing:
+        raise ValueError(f"Missing required fields: {', '.join(missing)}")
+
+    filling_types = {
+        'IOC': mt5.ORDER_FILLING_IOC,
+        'FOK': mt5.ORDER_FILLING_FOK,
+        'RETURN': mt5.ORDER_FILLING_RETURN
     }
 
-    price = price_dict[position_type]
-    if price == 0.0:
-        logger.error(f"Invalid price retrieved for symbol: {position['symbol']}")
-        return None
-
     request = {
         "action": mt5.TRADE_ACTION_DEAL,
-        "position": position['ticket'],  # select the position you want to close
-        "symbol": position['symbol'],
-        "volume": position['volume'],  # FLOAT
-        "type": order_type_dict[position_type],
-        "price": price,
+        "symbol": data['symbol'],
+        "volume": float(data['volume']),
+        "type": _order_constant(data['type'], 'ORDER_TYPE_', ORDER_TYPES),
+        "deviation": int(data.get('deviation', 20)),
+        "magic": int(data.get('magic', 0)),
+        "comment": data.get('comment', ''),
+        "type_time": mt5.ORDER_TIME_GTC,
+        "type_filling": _order_constant(data.get('type_filling', mt5.ORDER_FILLING_IOC), 'ORDER_FILLING_', filling_types),
+    }
+    if data.get('sl') is not None:
+        request["sl"] = float(data['sl'])
+    if data.get('tp') is not None:
+        request["tp"] = float(data['tp'])
+    return request
+
+
+def _send_market_orders(requests: List[dict]) -> List[dict]:
+    ticks = {}
+    for symbol in dict.fromkeys(r['symbol'] for r in requests):
+        ticks[symbol] = mt5.symbol_info_tick(symbol)
+
+    results = []
+    for request in requests:
+        tick = ticks[request['symbol']]
+        if tick is None:
+            results.append({"symbol": request['symbol'], "success": False, "error": "Failed to get symbol price"})
+            continue
+
+        request = dict(request, price=tick.ask if request['type'] == mt5.ORDER_TYPE_BUY else tick.bid)
+        result = mt5.order_send(request)
+        if result is None:
+            error_code, error_str = mt5.last_error()
+            results.append({"symbol": request['symbol'], "success": False, "error": f"Order failed: {error_str}"})
+        elif result.retcode != mt5.TRADE_RETCODE_DONE:
+            results.append({
+                "symbol": request['symbol'],
+                "success": False,
+                "error": f"Order failed: {result.comment}",
+                "result": result._asdict()
+            })
+        else:
+            results.append({"symbol": request['symbol'], "success": True, "result": result._asdict()})
+    return results
+
+
+def send_market_orders(requests: List[dict]) -> List[dict]:
+    """
+    Send several market orders as one trade-lane job. Ticks are read once per symbol,
+    then the orders go out back to back, so no queued read or other request runs in
+    between. Results come back in request order.
+    """
+    return executor.call(_send_market_orders, requests, priority=Priority.TRADE)
+
+
+# A position is closed with a deal in the opposite direction
+CLOSE_ORDER_TYPES = {
+    mt5.POSITION_TYPE_BUY: mt5.ORDER_TYPE_SELL,
+    mt5.POSITION_TYPE_SELL: mt5.ORDER_TYPE_BUY
+}
+
+
+def _close_request(ticket, symbol, volume, position_type, tick, deviation, magic, comment, type_filling):
+    close_type = CLOSE_ORDER_TYPES[position_type]
+    return {
+        "action": mt5.TRADE_ACTION_DEAL,
+        "position": int(ticket),  # select the position you want to close
+        "symbol": symbol,
+        "volume": float(volume),  # FLOAT
+        "type": close_type,
+        # Closing a buy sells at the bid, closing a sell buys at the ask
+        "price": tick.bid if close_type == mt5.ORDER_TYPE_SELL else tick.ask,
         "deviation": deviation,  # INTEGER
         "magic": magic,          # INTEGER
         "comment": comment,
@@ -61,65 +258,169 @@ def close_position(position, deviation=20, magic=0, comment='', type_filling=mt5
         "type_filling": type_filling,
     }
 
-    order_result = mt5.order_send(request)
 
-    if order_result.retcode != mt5.TRADE_RETCODE_DONE:
-        logger.error(f"Failed to close position {position['ticket']}: {order_result.comment}")
-        return None
-
-    logger.info(f"Position {position['ticket']} closed successfully.")
-    return order_result
+def close_position(position, deviation=20, magic=0, comment='', type_filling=mt5.ORDER_FILLING_IOC):
+    """
+    Close one position through the execution engine, so requotes are resent at fresh
+    prices. Returns the engine's execution: success, result, error, throttled,
+    attempts, attempt_log and elapsed_ms.
+    """
+    if 'type' not in position or 'ticket' not in position:
+        logger.error("Position dictionary missing 'type' or 'ticket' keys.")
+        return {"success": False, "error": "Position is missing 'type' or 'ticket'", "attempts": 0}
 
+    position_type = position['type']
+    if position_type not in CLOSE_ORDER_TYPES:
+        logger.error(f"Unknown position type: {position_type}")
+        return {"success": False, "error": f"Unknown position type: {position_type}", "attempts": 0}
 
-def close_all_positions(order_type='all', magic=None, type_filling=mt5.ORDER_FILLING_IOC):
-    order_type_dict = {
-        'BUY': mt5.ORDER_TYPE_BUY,
-        'SELL': mt5.ORDER_TYPE_SELL
-    }
+    execution = execution_engine.execute(
+        position['symbol'],
+        lambda tick: _close_request(position['ticket'], position['symbol'], position['volume'], position_type,
+                                    tick, deviation, magic, comment, type_filling)
+    )
+    if not execution["success"]:
+        logger.error(f"Failed to close position {position['ticket']}: {execution['error']}")
+        return execution
 
-    if mt5.positions_total() > 0:
-        positions = mt5.positions_get()
-        if positions is None:
-            logger.error("Failed to retrieve positions.")
-            return []
+    logger.info(f"Position {position['ticket']} closed successfully after {execution['attempts']} attempt(s).")
+    return execution
 
-        positions_data = [pos._asdict() for pos in positions]
-        positions_df = pd.DataFrame(positions_data)
 
-        # Filtering by magic if specified
-        if magic is not None:
-            positions_df = positions_df[positions_df['magic'] == magic]
+def _close_positions(order_type, magic, type_filling, deviation, max_retries):
+    positions = mt5.positions_get()
+    if positions is None:
+        logger.error("Failed to retrieve positions.")
+        return []
+    if not positions:
+        return []
 
-        # Filtering by order_type if not 'all'
-        if order_type != 'all':
-            if order_type not in order_type_dict:
-                logger.error(f"Invalid order_type: {order_type}. Must be 'BUY', 'SELL', or 'all'.")
-                return []
-            positions_df = positions_df[positions_df['type'] == order_type_dict[order_type]]
-
-        if positions_df.empty:
-            logger.error('No open positions matching the criteria.')
-            return []
-
-        results = []
-        for _, position in positions_df.iterrows():
-            order_result = close_position(position, type_filling=type_filling)
-            if order_result:
-                results.append(order_result)
-            else:
-                logger.error(f"Failed to close position {position['ticket']}.")
-        
-        return results
+    # Filter as arrays instead of building a DataFrame
+    types = np.fromiter((p.type for p in positions), dtype=np.int64, count=len(positions))
+    mask = np.ones(len(positions), dtype=bool)
+    if magic is not None:
+        mask &= np.fromiter((p.magic for p in positions), dtype=np.int64, count=len(positions)) == magic
+    if order_type != 'all':
+        mask &= types == ORDER_TYPES[order_type]
+    selected = [positions[i] for i in np.flatnonzero(mask)]
+
+    # order_send_async is not in every build of the MetaTrader5 package. When it is,
+    # all closes are queued in the terminal without waiting for each fill.
+    send = getattr(mt5, 'order_send_async', None)
+    accepted = {mt5.TRADE_RETCODE_DONE}
+    if send is None:
+        send = mt5.order_send
     else:
-        logger.error("No open positions to close.")
+        accepted.add(mt5.TRADE_RETCODE_PLACED)
+
+    results = {p.ticket: {"ticket": p.ticket, "symbol": p.symbol, "success": False, "attempts": 0} for p in selected}
+    pending = selected
+    for attempt in range(max_retries + 1):
+        # One tick per symbol per pass; a retry pass re-reads only requoted symbols
+        ticks = {symbol: mt5.symbol_info_tick(symbol) for symbol in dict.fromkeys(p.symbol for p in pending)}
+        requoted = []
+        for p in pending:
+            entry = results[p.ticket]
+            entry["attempts"] = attempt + 1
+            tick = ticks[p.symbol]
+            if tick is None:
+                entry["error"] = f"Failed to get tick for symbol: {p.symbol}"
+                continue
+
+            request = _close_request(p.ticket, p.symbol, p.volume, p.type, tick,
+                                     deviation, p.magic, '', type_filling)
+            result = send(request)
+            if result is None:
+                entry["error"] = str(mt5.last_error())
+                continue
+
+            entry["result"] = result._asdict()
+            entry["retcode"] = result.retcode
+            if result.retcode in accepted:
+                entry["success"] = True
+                entry.pop("error", None)
+            else:
+                entry["error"] = result.comment
+                if result.retcode in REQUOTE_RETCODES:
+                    requoted.append(p)
+
+        if not requoted:
+            break
+        pending = requoted
+
+    for entry in results.values():
+        if not entry["success"]:
+            logger.error(f"Failed to close position {entry['ticket']}: {entry.get('error')}")
+    return list(results.values())
+
+
+def close_all_positions(order_type='all', magic=None, type_filling=mt5.ORDER_FILLING_IOC, deviation=20, max_retries=2):
+    """
+    Flatten every open position matching the filters. The whole flatten runs as one
+    trade-lane job on the MT5 executor. Each symbol's tick is read once and the closes
+    go out back to back. Requoted closes are resent at fresh prices up to max_retries
+    times. Returns one result per position: ticket, symbol, success, attempts, retcode,
+    result and error.
+    """
+    if order_type != 'all' and order_type not in ORDER_TYPES:
+        logger.error(f"Invalid order_type: {order_type}. Must be 'BUY', 'SELL', or 'all'.")
         return []
 
-def get_positions(magic=None):
-    # First check if MT5 is initialized
-    if not mt5.initialize():
-        logger.error("Failed to initialize MT5.")
-        return pd.DataFrame()
+    return executor.call(_close_positions, order_type, magic, type_filling, deviation, max_retries,
+                         priority=Priority.TRADE)
+
+def _modify_sl_tp(changes: List[dict]) -> List[dict]:
+    positions = mt5.positions_get()
+    if positions is None:
+        error_code, error_str = mt5.last_error()
+        return [{"position": c['position'], "success": False, "error": f"Failed to retrieve positions: {error_str}"}
+                for c in changes]
+    by_ticket = {p.ticket: p for p in positions}
+
+    results = []
+    for change in changes:
+        ticket = change['position']
+        position = by_ticket.get(ticket)
+        if position is None:
+            results.append({"position": ticket, "success": False, "error": "Position not found"})
+            continue
+
+        # A level left out keeps its current value; sending 0 would remove it
+        request = {
+            "action": mt5.TRADE_ACTION_SLTP,
+            "position": ticket,
+            "symbol": position.symbol,
+            "sl": float(change['sl']) if change.get('sl') is not None else position.sl,
+            "tp": float(change['tp']) if change.get('tp') is not None else position.tp
+        }
+
+        result = mt5.order_send(request)
+        if result is None:
+            error_code, error_str = mt5.last_error()
+            results.append({"position": ticket, "success": False, "error": f"Failed to modify SL/TP: {error_str}"})
+        elif result.retcode != mt5.TRADE_RETCODE_DONE:
+            results.append({
+                "position": ticket,
+                "success": False,
+                "retcode": result.retcode,
+                "error": f"Failed to modify SL/TP: {result.comment}",
+                "result": result._asdict()
+            })
+        else:
+            results.append({"position": ticket, "success": True, "retcode": result.retcode, "result": result._asdict()})
+    return results
+
+
+def modify_sl_tp_batch(changes: List[dict]) -> List[dict]:
+    """
+    Apply several SL/TP changes ({position, sl, tp}) as one trade-lane job. Positions
+    are read once to fill in omitted levels, then the TRADE_ACTION_SLTP requests go
+    out back to back. Results come back in request order.
+    """
+    return executor.call(_modify_sl_tp, changes, priority=Priority.TRADE)
 
+
+def get_positions(magic=None):
     total_positions = mt5.positions_total()
     if total_positions is None:
         logger.error("Failed to get positions total.")
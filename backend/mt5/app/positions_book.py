@@ -0,0 +1,139 @@
+import os
+import threading
+import time
+import logging
+from collections import deque
+
+from executor import mt5
+
+logger = logging.getLogger(__name__)
+
+
+def _fingerprint(position):
+    # time_update_msc moves on every SL/TP change and partial close; the levels and
+    # volume are compared as well in case a broker leaves it untouched.
+    # price_current, profit and swap are left out on purpose, since they move on every tick.
+    return (position.time_update_msc, position.sl, position.tp, position.volume)
+
+
+class PositionsBook:
+    """
+    Versioned snapshot of the open positions.
+
+    Each refresh compares positions_get() with the previous snapshot by ticket. When
+    any position was opened, modified or closed, the version goes up by one and the
+    change is kept in a bounded log. Pollers can then ask for an ETag or for the
+    changes since a version, instead of downloading the whole book. Versions start
+    at the process start time in milliseconds, so a version from before a gateway
+    restart is always older than every version after it.
+    """
+
+    def __init__(self, refresh_interval=0.5, history=1024):
+        self.refresh_interval = refresh_interval
+        self.version = int(time.time() * 1000)
+        self._floor = self.version
+        self._positions = {}
+        self._fingerprints = {}
+        self._changes = deque(maxlen=history)
+        self._refreshed_at = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            refresh_interval=float(os.environ.get('POSITIONS_BOOK_REFRESH_SECONDS', 0.5)),
+            history=int(os.environ.get('POSITIONS_BOOK_HISTORY', 1024)),
+        )
+
+    def refresh(self) -> bool:
+        """Re-read positions unless the last refresh is recent. False when MT5 fails."""
+        with self._lock:
+            if time.monotonic() - self._refreshed_at < self.refresh_interval:
+                return True
+
+            positions = mt5.positions_get()
+            if positions is None:
+                logger.error("Failed to retrieve positions.")
+                return False
+
+            current = {p.ticket: p for p in positions}
+            fingerprints = {ticket: _fingerprint(p) for ticket, p in current.items()}
+
+            opened = [t for t in current if t not in self._fingerprints]
+            modified = [t for t in current if t in self._fingerprints and fingerprints[t] != self._fingerprints[t]]
+            closed = {t: self._positions[t]['magic'] for t in self._fingerprints if t not in current}
+
+            if opened or modified or closed:
+                if len(self._changes) == self._changes.maxlen:
+                    self._floor = self._changes[0][0]
+                self.version += 1
+                self._changes.append((self.version, opened, modified, closed))
+
+            self._positions = {ticket: p._asdict() for ticket, p in current.items()}
+            self._fingerprints = fingerprints
+            self._refreshed_at = time.monotonic()
+            return True
+
+    def snapshot(self, magic=None):
+        """Return (version, rows) for the current book."""
+        with self._lock:
+            rows = [row for row in self._positions.values() if magic is None or row['magic'] == magic]
+            return self.version, rows
+
+    def delta(self, since_version: int, magic=None):
+        """
+        Return the changes after since_version as {version, opened, modified, closed},
+        where opened and modified hold full position rows and closed holds tickets.
+        Returns None when since_version is no longer covered by the log (or comes
+        from the future), in which case the caller needs the full book.
+        """
+        with self._lock:
+            if since_version < self._floor or since_version > self.version:
+                return None
+
+            state = {}
+            closed_magic = {}
+            for version, opened, modified, closed in self._changes:
+                if version <= since_version:
+                    continue
+                for ticket in opened:
+                    state[ticket] = 'opened'
+                for ticket in modified:
+                    if state.get(ticket) != 'opened':
+                        state[ticket] = 'modified'
+                for ticket, position_magic in closed.items():
+                    # Opened and closed inside the window: the caller never saw it
+                    if state.get(ticket) == 'opened':
+                        del state[ticket]
+                    else:
+                        state[ticket] = 'closed'
+                        closed_magic[ticket] = position_magic
+
+            def rows(kind):
+                return [
+                    self._positions[ticket] for ticket, change in state.items()
+                    if change == kind and ticket in self._positions
+                    and (magic is None or self._positions[ticket]['magic'] == magic)
+                ]
+
+            return {
+                "version": self.version,
+                "opened": rows('opened'),
+                "modified": rows('modified'),
+                "closed": [
+                    ticket for ticket, change in state.items()
+                    if change == 'closed' and (magic is None or closed_magic[ticket] == magic)
+                ]
+            }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "version": self.version,
+                "positions": len(self._positions),
+                "history": len(self._changes),
+                "oldest_version": self._floor
+            }
+
+
+positions_book = PositionsBook.from_env()
@@ -0,0 +1,238 @@
+import os
+import threading
+import time
+import logging
+from collections import OrderedDict
+
+import numpy as np
+from executor import mt5, executor
+from resample import ResampledTimeframe, resample_rates
+
+logger = logging.getLogger(__name__)
+
+
+class _Buffer:
+    __slots__ = ('rates', 'capacity', 'exhausted', 'refreshed_at', 'source_mark', 'lock')
+
+    def __init__(self, capacity):
+        self.rates = None
+        self.capacity = capacity
+        # True when MT5 returned fewer bars than asked for, i.e. the whole history is held
+        self.exhausted = False
+        self.refreshed_at = 0.0
+        # Resampled buffers only: identifies the source window they were built from
+        self.source_mark = None
+        self.lock = threading.Lock()
+
+
+def _resample_window(source, source_bars, seconds):
+    """
+    Aggregate the last source_bars source bars. Unless the source is the whole history
+    (fewer bars than asked for), its first bucket is missing its opening bars and is
+    dropped.
+    """
+    rates = resample_rates(source, seconds)
+    exhausted = len(source) < source_bars
+    if not exhausted and len(rates) and rates['time'][0] != source['time'][0]:
+        rates = rates[1:]
+    return rates
+
+
+class RatesCache:
+    """
+    Bounded ring buffer of recent bars per (symbol, timeframe).
+
+    The first request for a key fetches the window from MT5. Later requests only fetch
+    the bars newer than the last cached one and overwrite the still-forming last bar,
+    so MT5 sees small deltas. Buffers are never mutated in place: every refresh builds
+    a new array, so slices handed out earlier stay consistent. When the total size
+    goes over max_bytes, the least recently used buffers are evicted.
+
+    Resampled timeframes are built from the cached buffer of their source timeframe,
+    and the aggregated bars are kept as a buffer of their own. They are only rebuilt
+    when the source window has changed.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, min_bars=500, max_bars=100_000, refresh_interval=1.0):
+        self.max_bytes = max_bytes
+        self.min_bars = min_bars
+        self.max_bars = max_bars
+        self.refresh_interval = refresh_interval
+        self._buffers = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.deltas = 0
+        self.full_fetches = 0
+        self.resamples = 0
+        self.evictions = 0
+        self.bypasses = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_bytes=int(os.environ.get('RATES_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+            min_bars=int(os.environ.get('RATES_CACHE_MIN_BARS', 500)),
+            max_bars=int(os.environ.get('RATES_CACHE_MAX_BARS', 100_000)),
+            refresh_interval=float(os.environ.get('RATES_CACHE_REFRESH_SECONDS', 1.0)),
+        )
+
+    def get_rates(self, symbol: str, timeframe: int, num_bars: int):
+        """
+        Same contract as mt5.copy_rates_from_pos(symbol, timeframe, 0, num_bars):
+        returns the last num_bars bars, or None when MT5 fails.
+        """
+        if isinstance(timeframe, ResampledTimeframe):
+            return self._get_resampled(symbol, timeframe, num_bars)
+        if num_bars <= 0:
+            return mt5.copy_rates_from_pos(symbol, timeframe, 0, num_bars)
+        if num_bars > self.max_bars:
+            return mt5.copy_rates_from_pos(symbol, timeframe, 0, num_bars)
+
+        buffer = self._buffer((symbol, timeframe), max(num_bars, self.min_bars))
+        if not self._acquire(buffer):
+            self.bypasses += 1
+            return mt5.copy_rates_from_pos(symbol, timeframe, 0, num_bars)
+        try:
+            if num_bars > buffer.capacity:
+                buffer.capacity = num_bars
+                if not buffer.exhausted:
+                    buffer.rates = None
+
+            if buffer.rates is None:
+                rates = self._fetch_full(symbol, timeframe, buffer)
+            elif time.monotonic() - buffer.refreshed_at < self.refresh_interval:
+                self.hits += 1
+                rates = buffer.rates
+            else:
+                rates = self._fetch_delta(symbol, timeframe, buffer)
+        finally:
+            buffer.lock.release()
+
+        if rates is None:
+            return None
+
+        self._evict()
+        return rates[-num_bars:]
+
+    def _acquire(self, buffer) -> bool:
+        """
+        Take the buffer's lock. A job on the executor thread (a cycle snapshot) only
+        takes it when it is free: a request thread holding it may be waiting on that
+        job's thread for its own MT5 call, and blocking would deadlock both.
+        """
+        if executor.in_executor():
+            return buffer.lock.acquire(blocking=False)
+        buffer.lock.acquire()
+        return True
+
+    def _buffer(self, key, capacity):
+        with self._lock:
+            buffer = self._buffers.get(key)
+            if buffer is None:
+                buffer = _Buffer(capacity)
+                self._buffers[key] = buffer
+            self._buffers.move_to_end(key)
+            return buffer
+
+    def _get_resampled(self, symbol, timeframe: ResampledTimeframe, num_bars):
+        if num_bars <= 0:
+            return None
+
+        buffer = self._buffer((symbol, timeframe), num_bars)
+        if not self._acquire(buffer):
+            self.bypasses += 1
+            source_bars = (num_bars + 1) * timeframe.factor
+            source = mt5.copy_rates_from_pos(symbol, timeframe.source, 0, source_bars)
+            if source is None:
+                return None
+            return _resample_window(source, source_bars, timeframe.seconds)[-num_bars:]
+        try:
+            if num_bars > buffer.capacity:
+                buffer.capacity = num_bars
+                buffer.rates = None
+
+            # One extra bar's worth of source, since the oldest bar is usually partial
+            source_bars = (buffer.capacity + 1) * timeframe.factor
+            source = self.get_rates(symbol, timeframe.source, source_bars)
+            if source is None:
+                return None
+
+            mark = (len(source), source[:1].tobytes(), source[-1:].tobytes())
+            if buffer.rates is None or buffer.source_mark != mark:
+                buffer.exhausted = len(source) < source_bars
+                buffer.rates = _resample_window(source, source_bars, timeframe.seconds)[-buffer.capacity:]
+                buffer.source_mark = mark
+                self.resamples += 1
+            rates = buffer.rates
+        finally:
+            buffer.lock.release()
+
+        self._evict()
+        return rates[-num_bars:]
+
+    def _fetch_full(self, symbol, timeframe, buffer):
+        rates = mt5.copy_rates_from_pos(symbol, timeframe, 0, buffer.capacity)
+        if rates is None:
+            return None
+        self.full_fetches += 1
+        buffer.exhausted = len(rates) < buffer.capacity
+        buffer.rates = rates
+        buffer.refreshed_at = time.monotonic()
+        return rates
+
+    def _fetch_delta(self, symbol, timeframe, buffer):
+        cached = buffer.rates
+        if not len(cached):
+            return self._fetch_full(symbol, timeframe, buffer)
+
+        last_time = cached['time'][-1]
+        count = 2
+        while True:
+            fresh = mt5.copy_rates_from_pos(symbol, timeframe, 0, count)
+            if fresh is None:
+                return None
+            # The fresh window overlaps the cache once its first bar is not newer than
+            # the last cached one; otherwise more bars closed than we asked for
+            if not len(fresh) or fresh['time'][0] <= last_time or len(fresh) < count:
+                break
+            if count >= buffer.capacity:
+                return self._fetch_full(symbol, timeframe, buffer)
+            count = min(count * 4, buffer.capacity)
+
+        self.deltas += 1
+        if len(fresh):
+            keep = cached[cached['time'] < fresh['time'][0]]
+            merged = np.concatenate([keep, fresh])
+            if len(merged) > buffer.capacity:
+                merged = merged[-buffer.capacity:]
+                buffer.exhausted = False
+            buffer.rates = merged
+        buffer.refreshed_at = time.monotonic()
+        return buffer.rates
+
+    def _evict(self):
+        with self._lock:
+            total = sum(b.rates.nbytes for b in self._buffers.values() if b.rates is not None)
+            while total > self.max_bytes and len(self._buffers) > 1:
+                key, buffer = self._buffers.popitem(last=False)
+                if buffer.rates is not None:
+                    total -= buffer.rates.nbytes
+                self.evictions += 1
+                logger.info(f"Evicted rates buffer for {key}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "buffers": len(self._buffers),
+                "bytes": sum(b.rates.nbytes for b in self._buffers.values() if b.rates is not None),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "deltas": self.deltas,
+                "full_fetches": self.full_fetches,
+                "resamples": self.resamples,
+                "evictions": self.evictions,
+                "bypasses": self.bypasses
+            }
+
+
+rates_cache = RatesCache.from_env()
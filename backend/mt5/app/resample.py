@@ -0,0 +1,100 @@
+import re
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+
+import numpy as np
+from executor import mt5
+from constants import MT5Timeframe
+
+DAY_SECONDS = 24 * 60 * 60
+
+# Standard intraday timeframes that can be aggregated into larger bars
+SOURCE_SECONDS = (
+    (MT5Timeframe.H4, 4 * 60 * 60),
+    (MT5Timeframe.H1, 60 * 60),
+    (MT5Timeframe.M30, 30 * 60),
+    (MT5Timeframe.M15, 15 * 60),
+    (MT5Timeframe.M5, 5 * 60),
+    (MT5Timeframe.M1, 60),
+)
+
+RESAMPLED_PATTERN = re.compile(r'^([MH])(\d+)$')
+
+
+class ResampledTimeframe(NamedTuple):
+    """A bar size MT5 has no enum for, built from `factor` bars of `source`."""
+    name: str
+    seconds: int
+    source: int
+    factor: int
+
+
+def parse_resampled(timeframe_str: str) -> Optional[ResampledTimeframe]:
+    """
+    Parse M<minutes> or H<hours> into a ResampledTimeframe, aggregated from the largest
+    standard timeframe that divides it. Bars are aligned to midnight, so sizes up to
+    one day are accepted. Returns None for anything else.
+    """
+    match = RESAMPLED_PATTERN.match(timeframe_str.upper())
+    if not match:
+        return None
+    unit, count = match.groups()
+    seconds = int(count) * (60 if unit == 'M' else 60 * 60)
+    if seconds <= 0 or seconds > DAY_SECONDS:
+        return None
+
+    for timeframe, source_seconds in SOURCE_SECONDS:
+        if seconds % source_seconds == 0:
+            return ResampledTimeframe(f"{unit}{int(count)}", seconds, timeframe.value, seconds // source_seconds)
+    return None
+
+
+def bucket_times(times: np.ndarray, seconds: int) -> np.ndarray:
+    """Open time of the resampled bar each time falls into, counted from its midnight."""
+    return times - (times % DAY_SECONDS) % seconds
+
+
+def resample_rates(rates: np.ndarray, seconds: int) -> np.ndarray:
+    """
+    Aggregate an MT5 rates array into bars of `seconds`, one vectorized pass per
+    field: first open, highest high, lowest low, last close, summed volumes and the
+    smallest spread. Buckets without source bars are skipped, like MT5 does.
+    """
+    if not len(rates):
+        return rates[:0]
+
+    buckets = bucket_times(rates['time'], seconds)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(rates)] - 1
+
+    resampled = np.empty(len(starts), dtype=rates.dtype)
+    resampled['time'] = buckets[starts]
+    resampled['open'] = rates['open'][starts]
+    resampled['high'] = np.maximum.reduceat(rates['high'], starts)
+    resampled['low'] = np.minimum.reduceat(rates['low'], starts)
+    resampled['close'] = rates['close'][ends]
+    resampled['tick_volume'] = np.add.reduceat(rates['tick_volume'], starts)
+    resampled['spread'] = np.minimum.reduceat(rates['spread'], starts)
+    resampled['real_volume'] = np.add.reduceat(rates['real_volume'], starts)
+    return resampled
+
+
+def copy_rates_range(symbol: str, timeframe, start: datetime, end: datetime):
+    """
+    mt5.copy_rates_range that also takes a ResampledTimeframe. As with MT5, the bars
+    returned are the ones opening within [start, end]; the source range is extended
+    to the end of the last bar so it is complete.
+    """
+    if not isinstance(timeframe, ResampledTimeframe):
+        return mt5.copy_rates_range(symbol, timeframe, start, end)
+
+    end_ts = int(end.timestamp())
+    last_bucket = int(bucket_times(np.array([end_ts]), timeframe.seconds)[0])
+    source_end = end + timedelta(seconds=last_bucket + timeframe.seconds - 1 - end_ts)
+
+    rates = mt5.copy_rates_range(symbol, timeframe.source, start, source_end)
+    if rates is None:
+        return None
+    resampled = resample_rates(rates, timeframe.seconds)
+    # A bar that opened before start only has part of its source bars
+    return resampled[(resampled['time'] >= int(start.timestamp())) & (resampled['time'] <= end_ts)]
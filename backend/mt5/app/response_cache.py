@@ -0,0 +1,159 @@
+import os
+import threading
+import time
+import logging
+from collections import OrderedDict
+from functools import wraps
+
+from flask import request, make_response
+
+from connection import connection
+from executor import ExecutorBusy
+
+logger = logging.getLogger(__name__)
+
+HIT = 'HIT'
+MISS = 'MISS'
+STALE = 'STALE'
+
+# ttl value for records that never change once they exist
+FOREVER = None
+
+
+class _Entry:
+    __slots__ = ('body', 'status', 'mimetype', 'stored_at', 'ttl')
+
+    def __init__(self, body, status, mimetype, ttl):
+        self.body = body
+        self.status = status
+        self.mimetype = mimetype
+        self.stored_at = time.time()
+        self.ttl = ttl
+
+    def is_fresh(self) -> bool:
+        return self.ttl is FOREVER or time.time() - self.stored_at < self.ttl
+
+
+class ResponseCache:
+    """
+    Read-through cache for GET responses, bounded by total body size with LRU eviction.
+
+    Each cached route sets its own TTL, and None keeps an entry until it is evicted.
+    While the terminal is not connected, or MT5 reads are being shed, the last
+    stored response is served even if expired and is marked stale. Every response
+    passing through carries Age and X-Cache (HIT, MISS or STALE).
+    """
+
+    def __init__(self, max_bytes=16 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(max_bytes=int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 16 * 1024 * 1024)))
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry: _Entry):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous.body)
+            self._entries[key] = entry
+            self._bytes += len(entry.body)
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted.body)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _respond(self, entry: _Entry, state: str):
+        response = make_response(entry.body, entry.status)
+        response.mimetype = entry.mimetype
+        response.headers['Age'] = str(int(time.time() - entry.stored_at))
+        response.headers['X-Cache'] = state
+        if state == STALE:
+            response.headers['Warning'] = '110 - "Response is Stale"'
+        return response
+
+    def cached(self, name: str, ttl=FOREVER, store_if=None):
+        """
+        Cache a GET route. name picks the TTL override RESPONSE_CACHE_TTL_<NAME> (in
+        seconds; 'forever' for no expiry). store_if(response) can veto storing a 200
+        response, e.g. an empty history that may still fill in.
+        """
+        override = os.environ.get(f'RESPONSE_CACHE_TTL_{name.upper()}')
+        if override is not None:
+            ttl = FOREVER if override.lower() == 'forever' else float(override)
+
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                key = (name, request.full_path)
+                entry = self.get(key)
+
+                if entry is not None and entry.is_fresh():
+                    self.hits += 1
+                    return self._respond(entry, HIT)
+
+                # Terminal is reconnecting: the last known value beats an error
+                if entry is not None and not connection.is_connected:
+                    self.stale += 1
+                    return self._respond(entry, STALE)
+
+                try:
+                    response = make_response(view(*args, **kwargs))
+                except ExecutorBusy:
+                    if entry is None:
+                        raise
+                    self.stale += 1
+                    return self._respond(entry, STALE)
+
+                self.misses += 1
+                if response.status_code == 200 and not response.is_streamed and (store_if is None or store_if(response)):
+                    stored = _Entry(response.get_data(), response.status_code, response.mimetype, ttl)
+                    self.put(key, stored)
+                response.headers['Age'] = '0'
+                response.headers['X-Cache'] = MISS
+                return response
+
+            wrapper.response_cache = True
+            return wrapper
+        return decorator
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "evictions": self.evictions
+            }
+
+
+def non_empty_json(response) -> bool:
+    """store_if for history lookups: an empty result may still fill in later."""
+    data = response.get_json(silent=True)
+    return bool(data)
+
+
+response_cache = ResponseCache.from_env()
+cached = response_cache.cached
@@ -1,15 +1,81 @@
-from flask import Blueprint, jsonify, request
-import MetaTrader5 as mt5
+from flask import Blueprint, jsonify, request, Response, stream_with_context
+from executor import mt5, ExecutorBusy
 import logging
-from datetime import datetime
-import pytz
-import pandas as pd
+from datetime import timedelta
+import numpy as np
 from flasgger import swag_from
-from lib import get_timeframe
+from werkzeug.http import http_date
+from lib import get_timeframe, get_tick_flags, parse_datetime, iter_range_chunks, iter_ticks_from, build_panel, PANEL_FIELDS
+from rates_cache import rates_cache
+from resample import copy_rates_range
+from codec import (
+    negotiate_format, parse_fields, check_fields, project_fields, encode_array, encode_npy, encode_npz, encode_frame, encode_ndjson,
+    encode_ticks_delta, array_records, FORMAT_MIMETYPES, PANEL_FORMAT_MIMETYPES, NDJSON_MIMETYPE, FRAMES_MIMETYPE, TICKS_MIMETYPE, END_FRAME,
+    RATES_DTYPE, TICK_DTYPE
+)
 
 data_bp = Blueprint('data', __name__)
 logger = logging.getLogger(__name__)
 
+def rates_response(rates, fmt, fields=None):
+    """
+    Build the response for an MT5 rates array. Binary formats ship the structured
+    array as-is, so no per-row Python objects are created on either side.
+    """
+    rates = project_fields(rates, fields)
+
+    if fmt != 'json':
+        return Response(encode_array(rates, fmt), mimetype=FORMAT_MIMETYPES[fmt])
+
+    # Times as HTTP dates, the format JSON clients have always received
+    return jsonify(array_records(rates, {'time': http_date}))
+
+TICK_FORMATS = ('delta', 'frames', 'ndjson')
+
+def parse_tick_stream_args():
+    """Shared query parameters of the tick routes. Raises ValueError on bad input."""
+    fmt = request.args.get('format', 'delta').lower()
+    fields = parse_fields(request.args.get('fields'))
+    if fmt not in TICK_FORMATS:
+        raise ValueError(f"Invalid format: '{fmt}'. Valid options are: {', '.join(TICK_FORMATS)}.")
+    if fields and fmt == 'delta':
+        raise ValueError("fields is only supported with the frames and ndjson formats")
+    # Checked before the 200 goes out; inside the stream it could only truncate it
+    check_fields(fields, TICK_DTYPE)
+    return get_tick_flags(request.args.get('flags', 'all')), fmt, fields
+
+def ticks_stream_response(symbol, chunks, fmt, fields=None):
+    """
+    Stream an iterator of tick arrays. delta and frames are length-prefixed frame
+    streams ending with a zero-length frame, ndjson is one tick per line.
+    """
+    info = mt5.symbol_info(symbol)
+    if info is None:
+        return jsonify({"error": f"Symbol {symbol} not found"}), 404
+    digits = info.digits
+
+    def generate():
+        try:
+            for ticks in chunks:
+                if fmt == 'delta':
+                    yield encode_frame(encode_ticks_delta(ticks, digits))
+                    continue
+                ticks = project_fields(ticks, fields)
+                if fmt == 'frames':
+                    yield encode_frame(encode_npy(ticks))
+                else:
+                    yield encode_ndjson(ticks)
+        except Exception as e:
+            # Headers are already sent, so the only signal left is a truncated stream
+            logger.error(f"Error streaming ticks for {symbol}: {str(e)}")
+            return
+
+        if fmt != 'ndjson':
+            yield END_FRAME
+
+    mimetype = {'delta': TICKS_MIMETYPE, 'frames': FRAMES_MIMETYPE, 'ndjson': NDJSON_MIMETYPE}[fmt]
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
 @data_bp.route('/fetch_data_pos', methods=['GET'])
 @swag_from({
     'tags': ['Data'],
@@ -27,7 +93,7 @@ logger = logging.getLogger(__name__)
             'type': 'string',
             'required': False,
             'default': 'M1',
-            'description': 'Timeframe for the data (e.g., M1, M5, H1).'
+            'description': 'Timeframe for the data (e.g., M1, M5, H1). Other minute or hour multiples up to a day (e.g., M2, M10, H2) are aggregated from a standard timeframe.'
         },
         {
             'name': 'num_bars',
@@ -36,11 +102,26 @@ logger = logging.getLogger(__name__)
             'required': False,
             'default': 100,
             'description': 'Number of bars to fetch.'
+        },
+        {
+            'name': 'format',
+            'in': 'query',
+            'type': 'string',
+            'required': False,
+            'enum': ['json', 'npy', 'arrow'],
+            'description': 'Response format. Overrides the Accept header; defaults to json.'
+        },
+        {
+            'name': 'fields',
+            'in': 'query',
+            'type': 'string',
+            'required': False,
+            'description': 'Comma-separated list of rate fields to return (e.g., time,close).'
         }
     ],
     'responses': {
         200: {
-            'description': 'Data fetched successfully.',
+            'description': 'Data fetched successfully. Binary formats return the raw MT5 rates array with epoch-second times.',
             'schema': {
                 'type': 'array',
                 'items': {
@@ -84,18 +165,20 @@ def fetch_data_pos_endpoint():
             return jsonify({"error": "Symbol parameter is required"}), 400
 
         mt5_timeframe = get_timeframe(timeframe)
+        fmt = negotiate_format(request)
+        fields = parse_fields(request.args.get('fields'))
         
-        rates = mt5.copy_rates_from_pos(symbol, mt5_timeframe, 0, num_bars)
+        rates = rates_cache.get_rates(symbol, mt5_timeframe, num_bars)
         if rates is None:
             return jsonify({"error": "Failed to get rates data"}), 404
         
-        df = pd.DataFrame(rates)
-        df['time'] = pd.to_datetime(df['time'], unit='s')
-        
-        return jsonify(df.to_dict(orient='records'))
+        return rates_response(rates, fmt, fields)
     
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
+    except ExecutorBusy:
+        # Left to the app's handler, which answers 503 so clients retry
+        raise
     except Exception as e:
         logger.error(f"Error in fetch_data_pos: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
@@ -117,7 +200,7 @@ def fetch_data_pos_endpoint():
             'type': 'string',
             'required': False,
             'default': 'M1',
-            'description': 'Timeframe for the data (e.g., M1, M5, H1).'
+            'description': 'Timeframe for the data (e.g., M1, M5, H1). Other minute or hour multiples up to a day (e.g., M2, M10, H2) are aggregated from a standard timeframe.'
         },
         {
             'name': 'start',
@@ -134,11 +217,26 @@ def fetch_data_pos_endpoint():
             'required': True,
             'format': 'date-time',
             'description': 'End datetime in ISO format.'
+        },
+        {
+            'name': 'format',
+            'in': 'query',
+            'type': 'string',
+            'required': False,
+            'enum': ['json', 'npy', 'arrow'],
+            'description': 'Response format. Overrides the Accept header; defaults to json.'
+        },
+        {
+            'name': 'fields',
+            'in': 'query',
+            'type': 'string',
+            'required': False,
+            'description': 'Comma-separated list of rate fields to return (e.g., time,close).'
         }
     ],
     'responses': {
         200: {
-            'description': 'Data fetched successfully.',
+            'description': 'Data fetched successfully. Binary formats return the raw MT5 rates array with epoch-second times.',
             'schema': {
                 'type': 'array',
                 'items': {
@@ -183,23 +281,492 @@ def fetch_data_range_endpoint():
             return jsonify({"error": "Symbol, start, and end parameters are required"}), 400
 
         mt5_timeframe = get_timeframe(timeframe)
+        fmt = negotiate_format(request)
+        fields = parse_fields(request.args.get('fields'))
         
         # Convert string dates to datetime objects
-        utc = pytz.UTC
-        start_date = utc.localize(datetime.fromisoformat(start_str.replace('Z', '+00:00')))
-        end_date = utc.localize(datetime.fromisoformat(end_str.replace('Z', '+00:00')))
+        start_date = parse_datetime(start_str)
+        end_date = parse_datetime(end_str)
         
-        rates = mt5.copy_rates_range(symbol, mt5_timeframe, start_date, end_date)
+        rates = copy_rates_range(symbol, mt5_timeframe, start_date, end_date)
         if rates is None:
             return jsonify({"error": "Failed to get rates data"}), 404
         
-        df = pd.DataFrame(rates)
-        df['time'] = pd.to_datetime(df['time'], unit='s')
-        
-        return jsonify(df.to_dict(orient='records'))
+        return rates_response(rates, fmt, fields)
     
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
+    except ExecutorBusy:
+        # Left to the app's handler, which answers 503 so clients retry
+        raise
     except Exception as e:
         logger.error(f"Error in fetch_data_range: {str(e)}")
-        return jsonify({"error": "Internal server error"}), 500
\ No newline at end of file
+        return jsonify({"error": "Internal server error"}), 500
+
+@data_bp.route('/fetch_data_range_stream', methods=['GET'])
+@swag_from({
+    'tags': ['Data'],
+    'parameters': [
+        {
+            'name': 'symbol',
+            'in': 'query',
+            'type': 'string',
+            'required': True,
+            'description': 'Symbol name to fetch data for.'
+        },
+        {
+            'name': 'timeframe',
+            'in': 'query',
+            'type': 'string',
+            'required': False,
+            'default': 'M1',
+            'description': 'Timeframe for the data (e.g., M1, M5, H1). Other minute or hour multiples up to a day (e.g., M2, M10, H2) are aggregated from a standard timeframe.'
+        },
+        {
+            'name': 'start',
+            'in': 'query',
+            'type': 'string',
+            'required': True,
+            'format': 'date-time',
+            'description': 'Start datetime in ISO format.'
+        },
+        {
+            'name': 'end',
+            'in': 'query',
+            'type': 'string',
+            'required': True,
+            'format': 'date-time',
+            'description': 'End datetime in ISO format.'
+        },
+        {
+            'name': 'chunk_hours',
+            'in': 'query',
+            'type': 'integer',
+            'required': False,
+            'default': 168,
+            'description': 'Length of the time chunk fetched from MT5 per step.'
+        },
+        {
+            'name': 'format',
+            'in': 'query',
+            'type': 'string',
+            'required': False,
+            'default': 'frames',
+            'enum': ['frames', 'ndjson'],
+            'description': 'frames: length-prefixed .npy chunks ending with a zero-length frame. ndjson: one rate per line.'
+        },
+        {
+            'name': 'fields',
+            'in': 'query',
+            'type': 'string',
+            'required': False,
+            'description': 'Comma-separated list of rate fields to return (e.g., time,close).'
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Rates streamed chunk by chunk.'
+        },
+        400: {
+            'description': 'Invalid request parameters.'
+        },
+        500: {
+            'description': 'Internal server error.'
+        }
+    }
+})
+def fetch_data_range_stream_endpoint():
+    """
+    Stream Data within a Date Range
+    ---
+    description: Stream historical price data for a given symbol in fixed time chunks, so memory stays flat regardless of range size.
+    """
+    try:
+        symbol = request.args.get('symbol')
+        timeframe = request.args.get('timeframe', 'M1')
+        start_str = request.args.get('start')
+        end_str = request.args.get('end')
+        chunk_hours = int(request.args.get('chunk_hours', 168))
+        fmt = request.args.get('format', 'frames').lower()
+        fields = parse_fields(request.args.get('fields'))
+
+        if not all([symbol, start_str, end_str]):
+            return jsonify({"error": "Symbol, start, and end parameters are required"}), 400
+        if fmt not in ('frames', 'ndjson'):
+            return jsonify({"error": f"Invalid format: '{fmt}'. Valid options are: frames, ndjson."}), 400
+        if chunk_hours <= 0:
+            return jsonify({"error": "chunk_hours must be positive"}), 400
+        # Checked before the 200 goes out; inside the stream it could only truncate it
+        check_fields(fields, RATES_DTYPE)
+
+        mt5_timeframe = get_timeframe(timeframe)
+        start_date = parse_datetime(start_str)
+        end_date = parse_datetime(end_str)
+
+        def fetch(chunk_start, chunk_end):
+            return copy_rates_range(symbol, mt5_timeframe, chunk_start, chunk_end)
+
+        def generate():
+            try:
+                for rates in iter_range_chunks(fetch, start_date, end_date, timedelta(hours=chunk_hours)):
+                    rates = project_fields(rates, fields)
+                    if fmt == 'frames':
+                        yield encode_frame(encode_npy(rates))
+                    else:
+                        yield encode_ndjson(rates)
+            except Exception as e:
+                # Headers are already sent, so the only signal left is a truncated stream
+                logger.error(f"Error in fetch_data_range_stream for {symbol}: {str(e)}")
+                return
+
+            if fmt == 'frames':
+                yield END_FRAME
+
+        mimetype = FRAMES_MIMETYPE if fmt == 'frames' else NDJSON_MIMETYPE
+        return Response(stream_with_context(generate()), mimetype=mimetype)
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except ExecutorBusy:
+        # Left to the app's handler, which answers 503 so clients retry
+        raise
+    except Exception as e:
+        logger.error(f"Error in fetch_data_range_stream: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@data_bp.route('/fetch_ticks_range', methods=['GET'])
+@swag_from({
+    'tags': ['Data'],
+    'parameters': [
+        {
+            'name': 'symbol',
+            'in': 'query',
+            'type': 'string',
+            'required': True,
+            'description': 'Symbol name to fetch ticks for.'
+        },
+        {
+            'name': 'start',
+            'in': 'query',
+            'type': 'string',
+            'required': True,
+            'format': 'date-time',
+            'description': 'Start datetime in ISO format.'
+        },
+        {
+            'name': 'end',
+            'in': 'query',
+            'type': 'string',
+            'required': True,
+            'format': 'date-time',
+            'description': 'End datetime in ISO format.'
+        },
+        {
+            'name': 'chunk_minutes',
+            'in': 'query',
+            'type': 'integer',
+            'required': False,
+            'default': 60,
+            'description': 'Length of the time chunk fetched from MT5 per step.'
+        },
+        {
+            'name': 'flags',
+            'in': 'query',
+            'type': 'string',
+            'required': False,
+            'default': 'all',
+            'enum': ['info', 'trade', 'all'],
+            'description': 'COPY_TICKS_INFO (bid/ask changes), COPY_TICKS_TRADE (last/volume changes) or COPY_TICKS_ALL.'
+        },
+        {
+            'name': 'format',
+            'in': 'query',
+            'type': 'string',
+            'required': False,
+            'default': 'delta',
+            'enum': ['delta', 'frames', 'ndjson'],
+            'description': 'delta: length-prefixed delta-encoded tick chunks ending with a zero-length frame. frames: the same framing with .npy chunks. ndjson: one tick per line.'
+        },
+        {
+            'name': 'fields',
+            'in': 'query',
+            'type': 'string',
+            'required': False,
+            'description': 'Comma-separated list of tick fields to return (frames and ndjson only).'
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Ticks streamed chunk by chunk.'
+        },
+        400: {
+            'description': 'Invalid request parameters.'
+        },
+        404: {
+            'description': 'Symbol not found.'
+        },
+        500: {
+            'description': 'Internal server error.'
+        }
+    }
+})
+def fetch_ticks_range_endpoint():
+    """
+    Stream Ticks within a Date Range
+    ---
+    description: Stream the tick history of a symbol between two dates in fixed time chunks. Each chunk is one MT5 call, so trades are not held up behind long downloads.
+    """
+    try:
+        symbol = request.args.get('symbol')
+        start_str = request.args.get('start')
+        end_str = request.args.get('end')
+        chunk_minutes = int(request.args.get('chunk_minutes', 60))
+
+        if not all([symbol, start_str, end_str]):
+            return jsonify({"error": "Symbol, start, and end parameters are required"}), 400
+        if chunk_minutes <= 0:
+            return jsonify({"error": "chunk_minutes must be positive"}), 400
+
+        flags, fmt, fields = parse_tick_stream_args()
+        start_date = parse_datetime(start_str)
+        end_date = parse_datetime(end_str)
+
+        def fetch(chunk_start, chunk_end):
+            return mt5.copy_ticks_range(symbol, chunk_start, chunk_end, flags)
+
+        chunks = iter_range_chunks(fetch, start_date, end_date, timedelta(minutes=chunk_minutes), time_field='time_msc')
+        return ticks_stream_response(symbol, chunks, fmt, fields)
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except ExecutorBusy:
+        # Left to the app's handler, which answers 503 so clients retry
+        raise
+    except Exception as e:
+        logger.error(f"Error in fetch_ticks_range: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@data_bp.route('/fetch_ticks_from', methods=['GET'])
+@swag_from({
+    'tags': ['Data'],
+    'parameters': [
+        {
+            'name': 'symbol',
+            'in': 'query',
+            'type': 'string',
+            'required': True,
+            'description': 'Symbol name to fetch ticks for.'
+        },
+        {
+            'name': 'start',
+            'in': 'query',
+            'type': 'string',
+            'required': True,
+            'format': 'date-time',
+            'description': 'Datetime in ISO format to read ticks from.'
+        },
+        {
+            'name': 'count',
+            'in': 'query',
+            'type': 'integer',
+            'required': True,
+            'description': 'Number of ticks to fetch.'
+        },
+        {
+            'name': 'chunk_size',
+            'in': 'query',
+            'type': 'integer',
+            'required': False,
+            'default': 100000,
+            'description': 'Ticks fetched from MT5 per step.'
+        },
+        {
+            'name': 'flags',
+            'in': 'query',
+            'type': 'string',
+            'required': False,
+            'default': 'all',
+            'enum': ['info', 'trade', 'all'],
+            'description': 'COPY_TICKS_INFO (bid/ask changes), COPY_TICKS_TRADE (last/volume changes) or COPY_TICKS_ALL.'
+        },
+        {
+            'name': 'format',
+            'in': 'query',
+            'type': 'string',
+            'required': False,
+            'default': 'delta',
+            'enum': ['delta', 'frames', 'ndjson'],
+            'description': 'delta: length-prefixed delta-encoded tick chunks ending with a zero-length frame. frames: the same framing with .npy chunks. ndjson: one tick per line.'
+        },
+        {
+            'name': 'fields',
+            'in': 'query',
+            'type': 'string',
+            'required': False,
+            'description': 'Comma-separated list of tick fields to return (frames and ndjson only).'
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Ticks streamed chunk by chunk.'
+        },
+        400: {
+            'description': 'Invalid request parameters.'
+        },
+        404: {
+            'description': 'Symbol not found.'
+        },
+        500: {
+            'description': 'Internal server error.'
+        }
+    }
+})
+def fetch_ticks_from_endpoint():
+    """
+    Stream Ticks from a Date
+    ---
+    description: Stream a number of ticks of a symbol starting at a date, fetched from MT5 in pages of chunk_size ticks.
+    """
+    try:
+        symbol = request.args.get('symbol')
+        start_str = request.args.get('start')
+        count = request.args.get('count')
+        chunk_size = int(request.args.get('chunk_size', 100000))
+
+        if not all([symbol, start_str, count]):
+            return jsonify({"error": "Symbol, start, and count parameters are required"}), 400
+        count = int(count)
+        if count <= 0 or chunk_size <= 0:
+            return jsonify({"error": "count and chunk_size must be positive"}), 400
+
+        flags, fmt, fields = parse_tick_stream_args()
+        start_date = parse_datetime(start_str)
+
+        def fetch(date_from, page_count):
+            return mt5.copy_ticks_from(symbol, date_from, page_count, flags)
+
+        chunks = iter_ticks_from(fetch, start_date, count, chunk_size)
+        return ticks_stream_response(symbol, chunks, fmt, fields)
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except ExecutorBusy:
+        # Left to the app's handler, which answers 503 so clients retry
+        raise
+    except Exception as e:
+        logger.error(f"Error in fetch_ticks_from: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@data_bp.route('/fetch_data_panel', methods=['GET'])
+@swag_from({
+    'tags': ['Data'],
+    'parameters': [
+        {
+            'name': 'symbols',
+            'in': 'query',
+            'type': 'string',
+            'required': True,
+            'description': 'Comma-separated list of symbols (e.g., EURUSD,GBPUSD).'
+        },
+        {
+            'name': 'timeframe',
+            'in': 'query',
+            'type': 'string',
+            'required': False,
+            'default': 'M1',
+            'description': 'Timeframe for the data (e.g., M1, M5, H1). Other minute or hour multiples up to a day (e.g., M2, M10, H2) are aggregated from a standard timeframe.'
+        },
+        {
+            'name': 'num_bars',
+            'in': 'query',
+            'type': 'integer',
+            'required': False,
+            'default': 100,
+            'description': 'Number of bars to fetch per symbol.'
+        },
+        {
+            'name': 'format',
+            'in': 'query',
+            'type': 'string',
+            'required': False,
+            'enum': ['json', 'npz'],
+            'description': 'Response format. Overrides the Accept header; defaults to json.'
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Panel fetched successfully. Values are indexed [field][symbol][bar]; missing bars are NaN and flagged in missing.',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'symbols': {'type': 'array', 'items': {'type': 'string'}},
+                    'fields': {'type': 'array', 'items': {'type': 'string'}},
+                    'time': {'type': 'array', 'items': {'type': 'integer'}},
+                    'values': {'type': 'array', 'items': {'type': 'array', 'items': {'type': 'array', 'items': {'type': 'number'}}}},
+                    'missing': {'type': 'array', 'items': {'type': 'array', 'items': {'type': 'boolean'}}},
+                    'errors': {'type': 'object'}
+                }
+            }
+        },
+        400: {
+            'description': 'Invalid request parameters.'
+        },
+        500: {
+            'description': 'Internal server error.'
+        }
+    }
+})
+def fetch_data_panel_endpoint():
+    """
+    Fetch Aligned Multi-Symbol Data
+    ---
+    description: Retrieve the last bars of several symbols aligned on one shared time index, in a single round trip.
+    """
+    try:
+        symbols = parse_fields(request.args.get('symbols'))
+        timeframe = request.args.get('timeframe', 'M1')
+        num_bars = int(request.args.get('num_bars', 100))
+
+        if not symbols:
+            return jsonify({"error": "Symbols parameter is required"}), 400
+
+        mt5_timeframe = get_timeframe(timeframe)
+        fmt = negotiate_format(request, PANEL_FORMAT_MIMETYPES)
+
+        rates_by_symbol = {}
+        errors = {}
+        for symbol in symbols:
+            rates = rates_cache.get_rates(symbol, mt5_timeframe, num_bars)
+            if rates is None:
+                errors[symbol] = "Failed to get rates data"
+            rates_by_symbol[symbol] = rates
+
+        times, values, missing = build_panel(rates_by_symbol)
+
+        if fmt == 'npz':
+            body = encode_npz(
+                symbols=np.array(symbols),
+                fields=np.array(PANEL_FIELDS),
+                time=times,
+                values=values,
+                missing=missing
+            )
+            return Response(body, mimetype=PANEL_FORMAT_MIMETYPES[fmt])
+
+        return jsonify({
+            "symbols": symbols,
+            "fields": list(PANEL_FIELDS),
+            "time": times,
+            "values": values,
+            "missing": missing,
+            "errors": errors
+        })
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except ExecutorBusy:
+        # Left to the app's handler, which answers 503 so clients retry
+        raise
+    except Exception as e:
+        logger.error(f"Error in fetch_data_panel: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
@@ -1,6 +1,6 @@
 from flask import Blueprint, jsonify
 import logging
-import MetaTrader5 as mt5
+from executor import mt5, ExecutorBusy
 from flasgger import swag_from
 
 error_bp = Blueprint('error', __name__)
@@ -34,6 +34,9 @@ def last_error_endpoint():
     try:
         error = mt5.last_error()
         return jsonify({"error_code": error[0], "error_message": error[1]})
+    except ExecutorBusy:
+        # Left to the app's handler, which answers 503 so clients retry
+        raise
     except Exception as e:
         logger.error(f"Error in last_error: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
@@ -65,6 +68,9 @@ def last_error_str_endpoint():
     try:
         error_code, error_str = mt5.last_error()
         return jsonify({"error_message": error_str})
+    except ExecutorBusy:
+        # Left to the app's handler, which answers 503 so clients retry
+        raise
     except Exception as e:
         logger.error(f"Error in last_error_str: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
\ No newline at end of file
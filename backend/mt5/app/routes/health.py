@@ -1,6 +1,13 @@
 from flask import Blueprint, jsonify
-import MetaTrader5 as mt5
 from flasgger import swag_from
+from connection import connection
+from rates_cache import rates_cache
+from positions_book import positions_book
+from events import watcher
+from response_cache import response_cache
+from tick_stream import tick_streamer
+from executor import executor
+from execution import execution_engine
 
 health_bp = Blueprint('health', __name__)
 
@@ -15,9 +22,13 @@ health_bp = Blueprint('health', __name__)
                 'properties': {
                     'status': {'type': 'string'},
                     'mt5_connected': {'type': 'boolean'},
-                    'mt5_initialized': {'type': 'boolean'}
+                    'mt5_initialized': {'type': 'boolean'},
+                    'connection': {'type': 'object'}
                 }
             }
+        },
+        503: {
+            'description': 'MT5 connection is degraded or still connecting'
         }
     }
 })
@@ -25,14 +36,235 @@ def health_check():
     """
     Health Check Endpoint
     ---
-    description: Check the health status of the application and MT5 connection.
+    description: Check the health status of the application and MT5 connection. Reports the state cached by the connection manager, so it never touches the terminal.
     responses:
       200:
         description: Health check successful
     """
-    initialized = mt5.initialize() if mt5 is not None else False
+    status = connection.status()
     return jsonify({
-        "status": "healthy",
-        "mt5_connected": mt5 is not None,
-        "mt5_initialized": initialized
-    }), 200
\ No newline at end of file
+        "status": "healthy" if connection.is_connected else status['state'],
+        "mt5_connected": status['terminal_connected'],
+        "mt5_initialized": status['initialized'],
+        "connection": status
+    }), 200 if connection.is_connected else 503
+
+@health_bp.route('/health/rates_cache')
+@swag_from({
+    'tags': ['Health'],
+    'responses': {
+        200: {
+            'description': 'Rates cache statistics retrieved successfully',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'buffers': {'type': 'integer'},
+                    'bytes': {'type': 'integer'},
+                    'max_bytes': {'type': 'integer'},
+                    'hits': {'type': 'integer'},
+                    'deltas': {'type': 'integer'},
+                    'full_fetches': {'type': 'integer'},
+                    'resamples': {'type': 'integer'},
+                    'evictions': {'type': 'integer'}
+                }
+            }
+        }
+    }
+})
+def rates_cache_stats():
+    """
+    Rates Cache Statistics
+    ---
+    description: Report the size and hit counters of the in-memory bar buffers.
+    responses:
+      200:
+        description: Rates cache statistics retrieved successfully
+    """
+    return jsonify(rates_cache.stats()), 200
+
+@health_bp.route('/health/executor')
+@swag_from({
+    'tags': ['Health'],
+    'responses': {
+        200: {
+            'description': 'Executor statistics retrieved successfully',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'busy_for_ms': {'type': 'number'},
+                    'lanes': {'type': 'object'}
+                }
+            }
+        }
+    }
+})
+def executor_stats():
+    """
+    MT5 Executor Statistics
+    ---
+    description: Report queue depth, wait times and rejections per priority lane of the MT5 executor thread.
+    responses:
+      200:
+        description: Executor statistics retrieved successfully
+    """
+    return jsonify(executor.stats()), 200
+
+@health_bp.route('/health/positions_book')
+@swag_from({
+    'tags': ['Health'],
+    'responses': {
+        200: {
+            'description': 'Positions book statistics retrieved successfully',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'version': {'type': 'integer'},
+                    'positions': {'type': 'integer'},
+                    'history': {'type': 'integer'},
+                    'oldest_version': {'type': 'integer'}
+                }
+            }
+        }
+    }
+})
+def positions_book_stats():
+    """
+    Positions Book Statistics
+    ---
+    description: Report the current version, size and retained change history of the versioned positions book.
+    responses:
+      200:
+        description: Positions book statistics retrieved successfully
+    """
+    return jsonify(positions_book.stats()), 200
+
+@health_bp.route('/health/events')
+@swag_from({
+    'tags': ['Health'],
+    'responses': {
+        200: {
+            'description': 'Event watcher statistics retrieved successfully',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'enabled': {'type': 'boolean'},
+                    'stream': {'type': 'string'},
+                    'version': {'type': 'integer'},
+                    'positions': {'type': 'integer'},
+                    'published': {'type': 'integer'},
+                    'errors': {'type': 'integer'},
+                    'last_error': {'type': 'string'},
+                    'last_publish': {'type': 'number'}
+                }
+            }
+        }
+    }
+})
+def events_stats():
+    """
+    Event Watcher Statistics
+    ---
+    description: Report whether position and deal events are being published to Redis, and how many have been sent.
+    responses:
+      200:
+        description: Event watcher statistics retrieved successfully
+    """
+    return jsonify(watcher.stats()), 200
+
+@health_bp.route('/health/response_cache')
+@swag_from({
+    'tags': ['Health'],
+    'responses': {
+        200: {
+            'description': 'Response cache statistics retrieved successfully',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'entries': {'type': 'integer'},
+                    'bytes': {'type': 'integer'},
+                    'max_bytes': {'type': 'integer'},
+                    'hits': {'type': 'integer'},
+                    'misses': {'type': 'integer'},
+                    'stale': {'type': 'integer'},
+                    'evictions': {'type': 'integer'}
+                }
+            }
+        }
+    }
+})
+def response_cache_stats():
+    """
+    Response Cache Statistics
+    ---
+    description: Report size, hit, miss and stale counts of the read-through response cache.
+    responses:
+      200:
+        description: Response cache statistics retrieved successfully
+    """
+    return jsonify(response_cache.stats()), 200
+
+@health_bp.route('/health/stream')
+@swag_from({
+    'tags': ['Health'],
+    'responses': {
+        200: {
+            'description': 'Tick stream statistics retrieved successfully',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'clients': {'type': 'integer'},
+                    'max_clients': {'type': 'integer'},
+                    'symbols': {'type': 'array', 'items': {'type': 'string'}},
+                    'published': {'type': 'integer'}
+                }
+            }
+        }
+    }
+})
+def stream_stats():
+    """
+    Tick Stream Statistics
+    ---
+    description: Report connected stream clients, the symbols being polled and how many ticks were published.
+    responses:
+      200:
+        description: Tick stream statistics retrieved successfully
+    """
+    return jsonify(tick_streamer.stats()), 200
+
+@health_bp.route('/health/execution')
+@swag_from({
+    'tags': ['Health'],
+    'responses': {
+        200: {
+            'description': 'Execution engine statistics retrieved successfully',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'symbols': {'type': 'integer'},
+                    'rate_per_second': {'type': 'number'},
+                    'burst': {'type': 'integer'},
+                    'max_attempts': {'type': 'integer'},
+                    'time_budget_ms': {'type': 'number'},
+                    'executions': {'type': 'integer'},
+                    'filled': {'type': 'integer'},
+                    'retries': {'type': 'integer'},
+                    'throttled': {'type': 'integer'},
+                    'throttle_wait_ms': {'type': 'number'},
+                    'fill_time_avg_ms': {'type': 'number'},
+                    'fill_time_max_ms': {'type': 'number'}
+                }
+            }
+        }
+    }
+})
+def execution_stats():
+    """
+    Execution Engine Statistics
+    ---
+    description: Report fill rate, retries, throttling and time-to-fill of orders sent through the execution engine.
+    responses:
+      200:
+        description: Execution engine statistics retrieved successfully
+    """
+    return jsonify(execution_engine.stats()), 200
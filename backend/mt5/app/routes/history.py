@@ -1,9 +1,10 @@
 from flask import Blueprint, jsonify, request
-import MetaTrader5 as mt5
+from executor import mt5, ExecutorBusy
 import logging
 from datetime import datetime
 from flasgger import swag_from
 from lib import get_deal_from_ticket, get_order_from_ticket
+from response_cache import cached, non_empty_json, FOREVER
 
 history_bp = Blueprint('history', __name__)
 logger = logging.getLogger(__name__)
@@ -72,6 +73,9 @@ def get_deal_from_ticket_endpoint():
     
     except ValueError:
         return jsonify({"error": "Invalid ticket format"}), 400
+    except ExecutorBusy:
+        # Left to the app's handler, which answers 503 so clients retry
+        raise
     except Exception as e:
         logger.error(f"Error in get_deal_from_ticket: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
@@ -110,6 +114,8 @@ def get_deal_from_ticket_endpoint():
         }
     }
 })
+# Orders in history are final, so they are kept until evicted
+@cached('get_order_from_ticket', ttl=FOREVER, store_if=non_empty_json)
 def get_order_from_ticket_endpoint():
     """
     Get Order Information from Ticket
@@ -130,6 +136,9 @@ def get_order_from_ticket_endpoint():
     
     except ValueError:
         return jsonify({"error": "Invalid ticket format"}), 400
+    except ExecutorBusy:
+        # Left to the app's handler, which answers 503 so clients retry
+        raise
     except Exception as e:
         logger.error(f"Error in get_order_from_ticket: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
@@ -209,11 +218,13 @@ def history_deals_get_endpoint():
         if deals is None:
             return jsonify({"error": "Failed to get deals history"}), 404
         
-        deals_list = [deal._asdict() for deal in deals]
-        return jsonify(deals_list)
+        return jsonify(deals)
     
     except ValueError:
         return jsonify({"error": "Invalid parameter format"}), 400
+    except ExecutorBusy:
+        # Left to the app's handler, which answers 503 so clients retry
+        raise
     except Exception as e:
         logger.error(f"Error in history_deals_get: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
@@ -252,6 +263,7 @@ def history_deals_get_endpoint():
         }
     }
 })
+@cached('history_orders_get', ttl=FOREVER, store_if=non_empty_json)
 def history_orders_get_endpoint():
     """
     Get Orders History
@@ -268,11 +280,13 @@ def history_orders_get_endpoint():
         if orders is None:
             return jsonify({"error": "Failed to get orders history"}), 404
         
-        orders_list = [order._asdict() for order in orders]
-        return jsonify(orders_list)
+        return jsonify(orders)
     
     except ValueError:
         return jsonify({"error": "Invalid ticket format"}), 400
+    except ExecutorBusy:
+        # Left to the app's handler, which answers 503 so clients retry
+        raise
     except Exception as e:
         logger.error(f"Error in history_orders_get: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
\ No newline at end of file
@@ -0,0 +1,148 @@
+from flask import Blueprint, jsonify, request
+import logging
+import numpy as np
+from flasgger import swag_from
+from lib import get_timeframe
+from codec import parse_fields
+from executor import ExecutorBusy
+from rates_cache import rates_cache
+from indicators import bollinger_bands, band_crossovers, SIGNAL_NAMES
+
+indicators_bp = Blueprint('indicators', __name__)
+logger = logging.getLogger(__name__)
+
+@indicators_bp.route('/indicators/bollinger', methods=['GET'])
+@swag_from({
+    'tags': ['Indicators'],
+    'parameters': [
+        {
+            'name': 'symbols',
+            'in': 'query',
+            'type': 'string',
+            'required': True,
+            'description': 'Comma-separated list of symbols (e.g., EURUSD,GBPUSD).'
+        },
+        {
+            'name': 'timeframe',
+            'in': 'query',
+            'type': 'string',
+            'required': False,
+            'default': 'M1',
+            'description': 'Timeframe for the bars (e.g., M1, M5, H1, or an aggregated size such as M10).'
+        },
+        {
+            'name': 'window',
+            'in': 'query',
+            'type': 'integer',
+            'required': False,
+            'default': 20,
+            'description': 'Rolling window of the moving average and standard deviation.'
+        },
+        {
+            'name': 'num_std_dev',
+            'in': 'query',
+            'type': 'number',
+            'required': False,
+            'default': 2,
+            'description': 'Number of standard deviations between the moving average and each band.'
+        },
+        {
+            'name': 'shift',
+            'in': 'query',
+            'type': 'integer',
+            'required': False,
+            'default': 1,
+            'description': 'Bar to evaluate, counted back from the still-forming bar. 1 is the last closed bar.'
+        }
+    ],
+    'responses': {
+        200: {
+            'description': "Band values and crossover signal of the evaluated bar per symbol. signal is 'top' when close crossed above the upper band, 'bottom' when it crossed below the lower band, otherwise null.",
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'results': {
+                        'type': 'object',
+                        'additionalProperties': {
+                            'type': 'object',
+                            'properties': {
+                                'time': {'type': 'integer'},
+                                'close': {'type': 'number'},
+                                'middle': {'type': 'number'},
+                                'upper': {'type': 'number'},
+                                'lower': {'type': 'number'},
+                                'signal': {'type': 'string'}
+                            }
+                        }
+                    },
+                    'errors': {'type': 'object'}
+                }
+            }
+        },
+        400: {
+            'description': 'Invalid request parameters.'
+        },
+        500: {
+            'description': 'Internal server error.'
+        }
+    }
+})
+def bollinger_endpoint():
+    """
+    Bollinger Band Signals
+    ---
+    description: Evaluate Bollinger bands and band crossovers on the cached bars of several symbols, returning only the values of one bar per symbol.
+    """
+    try:
+        symbols = parse_fields(request.args.get('symbols'))
+        timeframe = request.args.get('timeframe', 'M1')
+        window = int(request.args.get('window', 20))
+        num_std_dev = float(request.args.get('num_std_dev', 2))
+        shift = int(request.args.get('shift', 1))
+
+        if not symbols:
+            return jsonify({"error": "Symbols parameter is required"}), 400
+        if window < 2:
+            return jsonify({"error": "window must be at least 2"}), 400
+        if shift < 0:
+            return jsonify({"error": "shift must not be negative"}), 400
+
+        mt5_timeframe = get_timeframe(timeframe)
+        # One extra bar before the evaluated one, to detect the crossover
+        num_bars = window + shift + 1
+
+        results = {}
+        errors = {}
+        for symbol in symbols:
+            rates = rates_cache.get_rates(symbol, mt5_timeframe, num_bars)
+            if rates is None:
+                errors[symbol] = "Failed to get rates data"
+                continue
+            if len(rates) < num_bars:
+                errors[symbol] = f"Not enough bars: {len(rates)} of {num_bars}"
+                continue
+
+            close = rates['close'].astype(np.float64)
+            middle, upper, lower = bollinger_bands(close, window, num_std_dev)
+            signals = band_crossovers(close, upper, lower)
+
+            index = len(rates) - 1 - shift
+            results[symbol] = {
+                "time": int(rates['time'][index]),
+                "close": float(close[index]),
+                "middle": float(middle[index]),
+                "upper": float(upper[index]),
+                "lower": float(lower[index]),
+                "signal": SIGNAL_NAMES[int(signals[index])]
+            }
+
+        return jsonify({"results": results, "errors": errors})
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except ExecutorBusy:
+        # Left to the app's handler, which answers 503 so clients retry
+        raise
+    except Exception as e:
+        logger.error(f"Error in bollinger: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
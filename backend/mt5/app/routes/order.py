@@ -1,11 +1,17 @@
 from flask import Blueprint, jsonify, request
-import MetaTrader5 as mt5
+from executor import mt5, ExecutorBusy
 import logging
+import os
 from flasgger import swag_from
+from executor import trade_lane
+from lib import parse_market_order, send_market_orders
+from execution import execution_engine
 
 order_bp = Blueprint('order', __name__)
 logger = logging.getLogger(__name__)
 
+MAX_BATCH_ORDERS = int(os.environ.get('MT5_MAX_BATCH_ORDERS', 50))
+
 @order_bp.route('/order', methods=['POST'])
 @swag_from({
     'tags': ['Order'],
@@ -48,81 +54,184 @@ logger = logging.getLogger(__name__)
                             'symbol': {'type': 'string'},
                             # Add other relevant fields as needed
                         }
-                    }
+                    },
+                    'attempts': {'type': 'integer'},
+                    'attempt_log': {
+                        'type': 'array',
+                        'items': {
+                            'type': 'object',
+                            'properties': {
+                                'retcode': {'type': 'integer'},
+                                'comment': {'type': 'string'},
+                                'price': {'type': 'number'},
+                                'latency_ms': {'type': 'number'}
+                            }
+                        }
+                    },
+                    'elapsed_ms': {'type': 'number'}
                 }
             }
         },
         400: {
-            'description': 'Bad request or order failed.'
+            'description': 'Bad request or order failed. Includes attempts and attempt_log when the order was sent.'
+        },
+        429: {
+            'description': 'Too many orders for the symbol; no order slot was free within the time budget.'
         },
         500: {
             'description': 'Internal server error.'
         }
     }
 })
+@trade_lane
 def send_market_order_endpoint():
     """
     Send Market Order
     ---
-    description: Execute a market order for a specified symbol with optional parameters.
+    description: Execute a market order for a specified symbol with optional parameters. Orders are throttled per symbol, and requotes are resent straight away at a fresh price within the order's deviation and the gateway's time budget.
     """
     try:
         data = request.get_json()
         if not data:
             return jsonify({"error": "Order data is required"}), 400
 
-        required_fields = ['symbol', 'volume', 'type']
-        if not all(field in data for field in required_fields):
-            return jsonify({"error": "Missing required fields"}), 400
+        try:
+            order = parse_market_order(data)
+        except (ValueError, TypeError) as e:
+            return jsonify({"error": str(e)}), 400
 
-        # Prepare the order request
-        request_data = {
-            "action": mt5.TRADE_ACTION_DEAL,
-            "symbol": data['symbol'],
-            "volume": float(data['volume']),
-            "type": data['type'],
-            "deviation": data.get('deviation', 20),
-            "magic": data.get('magic', 0),
-            "comment": data.get('comment', ''),
-            "type_time": mt5.ORDER_TIME_GTC,
-            "type_filling": data.get('type_filling', mt5.ORDER_FILLING_IOC),
+        # Buys fill at the ask, sells at the bid; the engine reads a fresh tick per attempt
+        side = 'ask' if order['type'] == mt5.ORDER_TYPE_BUY else 'bid'
+        execution = execution_engine.execute(order['symbol'], lambda tick: dict(order, price=getattr(tick, side)))
+        attempts = {
+            "attempts": execution['attempts'],
+            "attempt_log": execution['attempt_log'],
+            "elapsed_ms": execution['elapsed_ms']
         }
 
-        # Get current price
-        tick = mt5.symbol_info_tick(data['symbol'])
-        if tick is None:
-            return jsonify({"error": "Failed to get symbol price"}), 400
-
-        # Set price based on order type
-        if data['type'] == mt5.ORDER_TYPE_BUY:
-            request_data["price"] = tick.ask
-        elif data['type'] == mt5.ORDER_TYPE_SELL:
-            request_data["price"] = tick.bid
-        else:
-            return jsonify({"error": "Invalid order type"}), 400
-
-        # Add optional SL/TP if provided
-        if 'sl' in data:
-            request_data["sl"] = data['sl']
-        if 'tp' in data:
-            request_data["tp"] = data['tp']
-
-        # Send order
-        result = mt5.order_send(request_data)
-        if result.retcode != mt5.TRADE_RETCODE_DONE:
-            error_code, error_str = mt5.last_error()
-            
+        if execution['throttled']:
+            return jsonify({"error": execution['error'], **attempts}), 429
+        if not execution['success']:
             return jsonify({
-                "error": f"Order failed: {result.comment}",
-                "mt5_error": error_str,
-                "result": result._asdict()
+                "error": f"Order failed: {execution['error']}",
+                "result": execution['result'],
+                **attempts
             }), 400
 
         return jsonify({
             "message": "Order executed successfully",
-            "result": result._asdict()
+            "result": execution['result'],
+            **attempts
         })
     
+    except ExecutorBusy:
+        # Left to the app's handler, which answers 503 so clients retry
+        raise
     except Exception as e:
         logger.error(f"Error in send_market_order: {str(e)}")
-        return jsonify({"error": "Internal server error"}), 500
\ No newline at end of file
+        return jsonify({"error": "Internal server error"}), 500
+
+@order_bp.route('/orders/batch', methods=['POST'])
+@swag_from({
+    'tags': ['Order'],
+    'parameters': [
+        {
+            'name': 'body',
+            'in': 'body',
+            'required': True,
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'orders': {
+                        'type': 'array',
+                        'items': {
+                            'type': 'object',
+                            'properties': {
+                                'symbol': {'type': 'string'},
+                                'volume': {'type': 'number'},
+                                'type': {'type': 'string', 'enum': ['BUY', 'SELL']},
+                                'deviation': {'type': 'integer', 'default': 20},
+                                'magic': {'type': 'integer', 'default': 0},
+                                'comment': {'type': 'string', 'default': ''},
+                                'type_filling': {'type': 'string', 'enum': ['ORDER_FILLING_IOC', 'ORDER_FILLING_FOK', 'ORDER_FILLING_RETURN']},
+                                'sl': {'type': 'number'},
+                                'tp': {'type': 'number'}
+                            },
+                            'required': ['symbol', 'volume', 'type']
+                        }
+                    }
+                },
+                'required': ['orders']
+            }
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Per-order results, in the same order as the request.',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'results': {
+                        'type': 'array',
+                        'items': {
+                            'type': 'object',
+                            'properties': {
+                                'symbol': {'type': 'string'},
+                                'success': {'type': 'boolean'},
+                                'error': {'type': 'string'},
+                                'result': {'type': 'object'}
+                            }
+                        }
+                    },
+                    'sent': {'type': 'integer'},
+                    'failed': {'type': 'integer'}
+                }
+            }
+        },
+        400: {
+            'description': 'Bad request.'
+        },
+        500: {
+            'description': 'Internal server error.'
+        }
+    }
+})
+@trade_lane
+def send_market_orders_endpoint():
+    """
+    Send a Batch of Market Orders
+    ---
+    description: Execute several market orders back to back. Ticks are fetched once per symbol. An order that fails validation or execution does not stop the others.
+    """
+    try:
+        data = request.get_json()
+        orders = data.get('orders') if isinstance(data, dict) else None
+        if not orders or not isinstance(orders, list):
+            return jsonify({"error": "A non-empty 'orders' list is required"}), 400
+        if len(orders) > MAX_BATCH_ORDERS:
+            return jsonify({"error": f"At most {MAX_BATCH_ORDERS} orders per batch"}), 400
+
+        results = [None] * len(orders)
+        valid = []
+        for i, order in enumerate(orders):
+            try:
+                if not isinstance(order, dict):
+                    raise ValueError("Order must be an object")
+                valid.append((i, parse_market_order(order)))
+            except (ValueError, TypeError) as e:
+                symbol = order.get('symbol') if isinstance(order, dict) else None
+                results[i] = {"symbol": symbol, "success": False, "error": str(e)}
+
+        if valid:
+            for (i, _), result in zip(valid, send_market_orders([r for _, r in valid])):
+                results[i] = result
+
+        sent = sum(1 for r in results if r['success'])
+        return jsonify({"results": results, "sent": sent, "failed": len(results) - sent})
+
+    except ExecutorBusy:
+        # Left to the app's handler, which answers 503 so clients retry
+        raise
+    except Exception as e:
+        logger.error(f"Error in send_market_orders: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
@@ -1,12 +1,18 @@
-from flask import Blueprint, jsonify, request
-import MetaTrader5 as mt5
+from flask import Blueprint, jsonify, request, make_response
+from executor import mt5, ExecutorBusy
 import logging
-from lib import close_position, close_all_positions, get_positions
+import os
+import time
+from lib import close_position, close_all_positions, modify_sl_tp_batch
+from positions_book import positions_book
 from flasgger import swag_from
+from executor import trade_lane
 
 position_bp = Blueprint('position', __name__)
 logger = logging.getLogger(__name__)
 
+MAX_BATCH_CHANGES = int(os.environ.get('MT5_MAX_BATCH_CHANGES', 200))
+
 @position_bp.route('/close_position', methods=['POST'])
 @swag_from({
     'tags': ['Position'],
@@ -50,35 +56,67 @@ logger = logging.getLogger(__name__)
                             'symbol': {'type': 'string'},
                             # Add other relevant fields as needed
                         }
-                    }
+                    },
+                    'attempts': {'type': 'integer'},
+                    'attempt_log': {
+                        'type': 'array',
+                        'items': {
+                            'type': 'object',
+                            'properties': {
+                                'retcode': {'type': 'integer'},
+                                'comment': {'type': 'string'},
+                                'price': {'type': 'number'},
+                                'latency_ms': {'type': 'number'}
+                            }
+                        }
+                    },
+                    'elapsed_ms': {'type': 'number'}
                 }
             }
         },
         400: {
-            'description': 'Bad request or failed to close position.'
+            'description': 'Bad request or failed to close position. Includes attempts and attempt_log when the close was sent.'
+        },
+        429: {
+            'description': 'Too many orders for the symbol; no order slot was free within the time budget.'
         },
         500: {
             'description': 'Internal server error.'
         }
     }
 })
+@trade_lane
 def close_position_endpoint():
     """
     Close a Specific Position
     ---
-    description: Close a specific trading position based on the provided position data.
+    description: Close a specific trading position based on the provided position data. Closes are throttled per symbol, and requotes are resent straight away at a fresh price.
     """
     try:
         data = request.get_json()
         if not data or 'position' not in data:
             return jsonify({"error": "Position data is required"}), 400
         
-        result = close_position(data['position'])
-        if result is None:
-            return jsonify({"error": "Failed to close position"}), 400
+        execution = close_position(data['position'])
+        attempts = {
+            "attempts": execution['attempts'],
+            "attempt_log": execution.get('attempt_log', []),
+            "elapsed_ms": execution.get('elapsed_ms', 0.0)
+        }
+        if execution.get('throttled'):
+            return jsonify({"error": execution['error'], **attempts}), 429
+        if not execution['success']:
+            return jsonify({
+                "error": f"Failed to close position: {execution['error']}",
+                "result": execution.get('result'),
+                **attempts
+            }), 400
         
-        return jsonify({"message": "Position closed successfully", "result": result._asdict()})
+        return jsonify({"message": "Position closed successfully", "result": execution['result'], **attempts})
     
+    except ExecutorBusy:
+        # Left to the app's handler, which answers 503 so clients retry
+        raise
     except Exception as e:
         logger.error(f"Error in close_position: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
@@ -95,7 +133,9 @@ def close_position_endpoint():
                 'type': 'object',
                 'properties': {
                     'order_type': {'type': 'string', 'enum': ['BUY', 'SELL', 'all'], 'default': 'all'},
-                    'magic': {'type': 'integer'}
+                    'magic': {'type': 'integer'},
+                    'deviation': {'type': 'integer', 'default': 20},
+                    'max_retries': {'type': 'integer', 'default': 2, 'description': 'Resends of a requoted close at a fresh price'}
                 }
             }
         }
@@ -112,15 +152,19 @@ def close_position_endpoint():
                         'items': {
                             'type': 'object',
                             'properties': {
-                                'retcode': {'type': 'integer'},
-                                'order': {'type': 'integer'},
-                                'magic': {'type': 'integer'},
-                                'price': {'type': 'number'},
+                                'ticket': {'type': 'integer'},
                                 'symbol': {'type': 'string'},
-                                # Add other relevant fields as needed
+                                'success': {'type': 'boolean'},
+                                'attempts': {'type': 'integer'},
+                                'retcode': {'type': 'integer'},
+                                'error': {'type': 'string'},
+                                'result': {'type': 'object'}
                             }
                         }
-                    }
+                    },
+                    'closed': {'type': 'integer'},
+                    'failed': {'type': 'integer'},
+                    'elapsed_ms': {'type': 'number'}
                 }
             }
         },
@@ -132,26 +176,38 @@ def close_position_endpoint():
         }
     }
 })
+@trade_lane
 def close_all_positions_endpoint():
     """
     Close All Positions
     ---
-    description: Close all open trading positions based on optional filters like order type and magic number.
+    description: Close all open trading positions based on optional filters like order type and magic number. Closes are sent back to back with one tick read per symbol, and requotes are retried at fresh prices.
     """
     try:
-        data = request.get_json() or {}
+        data = request.get_json(silent=True) or {}
         order_type = data.get('order_type', 'all')
         magic = data.get('magic')
-        
-        results = close_all_positions(order_type, magic)
+        deviation = int(data.get('deviation', 20))
+        max_retries = int(data.get('max_retries', 2))
+
+        started = time.perf_counter()
+        results = close_all_positions(order_type, magic, deviation=deviation, max_retries=max_retries)
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 3)
         if not results:
-            return jsonify({"message": "No positions were closed"}), 200
-        
+            return jsonify({"message": "No positions were closed", "results": [], "elapsed_ms": elapsed_ms}), 200
+
+        closed = sum(1 for r in results if r['success'])
         return jsonify({
-            "message": f"Closed {len(results)} positions",
-            "results": [result._asdict() for result in results]
+            "message": f"Closed {closed} positions",
+            "results": results,
+            "closed": closed,
+            "failed": len(results) - closed,
+            "elapsed_ms": elapsed_ms
         })
     
+    except ExecutorBusy:
+        # Left to the app's handler, which answers 503 so clients retry
+        raise
     except Exception as e:
         logger.error(f"Error in close_all_positions: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
@@ -204,6 +260,7 @@ def close_all_positions_endpoint():
         }
     }
 })
+@trade_lane
 def modify_sl_tp_endpoint():
     """
     Modify Stop Loss and Take Profit
@@ -230,12 +287,116 @@ def modify_sl_tp_endpoint():
         if result.retcode != mt5.TRADE_RETCODE_DONE:
             return jsonify({"error": f"Failed to modify SL/TP: {result.comment}"}), 400
         
-        return jsonify({"message": "SL/TP modified successfully", "result": result._asdict()})
+        return jsonify({"message": "SL/TP modified successfully", "result": result})
     
+    except ExecutorBusy:
+        # Left to the app's handler, which answers 503 so clients retry
+        raise
     except Exception as e:
         logger.error(f"Error in modify_sl_tp: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
 
+@position_bp.route('/modify_sl_tp/batch', methods=['POST'])
+@swag_from({
+    'tags': ['Position'],
+    'parameters': [
+        {
+            'name': 'body',
+            'in': 'body',
+            'required': True,
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'changes': {
+                        'type': 'array',
+                        'items': {
+                            'type': 'object',
+                            'properties': {
+                                'position': {'type': 'integer'},
+                                'sl': {'type': 'number'},
+                                'tp': {'type': 'number'}
+                            },
+                            'required': ['position']
+                        }
+                    }
+                },
+                'required': ['changes']
+            }
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Per-ticket results, in the same order as the request.',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'results': {
+                        'type': 'array',
+                        'items': {
+                            'type': 'object',
+                            'properties': {
+                                'position': {'type': 'integer'},
+                                'success': {'type': 'boolean'},
+                                'retcode': {'type': 'integer'},
+                                'error': {'type': 'string'},
+                                'result': {'type': 'object'}
+                            }
+                        }
+                    },
+                    'modified': {'type': 'integer'},
+                    'failed': {'type': 'integer'}
+                }
+            }
+        },
+        400: {
+            'description': 'Bad request.'
+        },
+        500: {
+            'description': 'Internal server error.'
+        }
+    }
+})
+@trade_lane
+def modify_sl_tp_batch_endpoint():
+    """
+    Modify Stop Loss and Take Profit for Several Positions
+    ---
+    description: Apply a list of SL/TP changes back to back. A level that is left out keeps its current value.
+    """
+    try:
+        data = request.get_json()
+        changes = data.get('changes') if isinstance(data, dict) else None
+        if not changes or not isinstance(changes, list):
+            return jsonify({"error": "A non-empty 'changes' list is required"}), 400
+        if len(changes) > MAX_BATCH_CHANGES:
+            return jsonify({"error": f"At most {MAX_BATCH_CHANGES} changes per batch"}), 400
+        if not all(isinstance(c, dict) and isinstance(c.get('position'), int) for c in changes):
+            return jsonify({"error": "Every change needs an integer 'position' ticket"}), 400
+
+        # Levels are converted here, so a bad one rejects the batch before any change is sent
+        try:
+            changes = [
+                {
+                    'position': c['position'],
+                    'sl': float(c['sl']) if c.get('sl') is not None else None,
+                    'tp': float(c['tp']) if c.get('tp') is not None else None
+                }
+                for c in changes
+            ]
+        except (TypeError, ValueError):
+            return jsonify({"error": "'sl' and 'tp' must be numbers when given"}), 400
+
+        results = modify_sl_tp_batch(changes)
+        modified = sum(1 for r in results if r['success'])
+        return jsonify({"results": results, "modified": modified, "failed": len(results) - modified})
+
+    except ExecutorBusy:
+        # Left to the app's handler, which answers 503 so clients retry
+        raise
+    except Exception as e:
+        logger.error(f"Error in modify_sl_tp_batch: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
 @position_bp.route('/get_positions', methods=['GET'])
 @swag_from({
     'tags': ['Position'],
@@ -246,11 +407,25 @@ def modify_sl_tp_endpoint():
             'type': 'integer',
             'required': False,
             'description': 'Magic number to filter positions.'
+        },
+        {
+            'name': 'since_version',
+            'in': 'query',
+            'type': 'integer',
+            'required': False,
+            'description': 'Return only the positions opened, modified or closed after this version. Falls back to the full book (full: true) when the version is too old.'
+        },
+        {
+            'name': 'If-None-Match',
+            'in': 'header',
+            'type': 'string',
+            'required': False,
+            'description': 'ETag from an earlier response; 304 is returned when no position was opened, modified or closed since.'
         }
     ],
     'responses': {
         200: {
-            'description': 'Positions retrieved successfully.',
+            'description': 'Positions retrieved successfully. The X-Positions-Version header carries the book version. Opens, closes, SL/TP and volume changes bump the version; price_current, profit and swap moves do not.',
             'schema': {
                 'type': 'object',
                 'properties': {
@@ -279,6 +454,9 @@ def modify_sl_tp_endpoint():
                 }
             }
         },
+        304: {
+            'description': 'No position was opened, modified or closed since the given ETag.'
+        },
         400: {
             'description': 'Bad request or failed to retrieve positions.'
         },
@@ -291,21 +469,38 @@ def get_positions_endpoint():
     """
     Get Open Positions
     ---
-    description: Retrieve all open trading positions, optionally filtered by magic number.
+    description: Retrieve all open trading positions, optionally filtered by magic number. Supports ETag / If-None-Match and since_version deltas.
     """
     try:
         magic = request.args.get('magic', type=int)
+        since_version = request.args.get('since_version', type=int)
 
-        positions_df = get_positions(magic)
-
-        if positions_df is None:
+        if not positions_book.refresh():
             return jsonify({"error": "Failed to retrieve positions"}), 500
-            
-        if positions_df.empty:
-            return jsonify({"positions": []}), 200
-            
-        return jsonify(positions_df.to_dict(orient='records')), 200
+
+        version, positions = positions_book.snapshot(magic)
+        etag = f"{version}" if magic is None else f"{version}-{magic}"
+
+        if etag in request.if_none_match:
+            response = make_response('', 304)
+        elif since_version is not None:
+            delta = positions_book.delta(since_version, magic)
+            if delta is None:
+                response = jsonify({"version": version, "full": True, "positions": positions})
+            else:
+                response = jsonify(dict(delta, full=False))
+        elif not positions:
+            response = jsonify({"positions": []})
+        else:
+            response = jsonify(positions)
+
+        response.set_etag(etag)
+        response.headers['X-Positions-Version'] = str(version)
+        return response
     
+    except ExecutorBusy:
+        # Left to the app's handler, which answers 503 so clients retry
+        raise
     except Exception as e:
         logger.error(f"Error in get_positions: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
@@ -344,6 +539,9 @@ def positions_total_endpoint():
         
         return jsonify({"total": total})
     
+    except ExecutorBusy:
+        # Left to the app's handler, which answers 503 so clients retry
+        raise
     except Exception as e:
         logger.error(f"Error in positions_total: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
\ No newline at end of file
@@ -0,0 +1,151 @@
+from flask import Blueprint, jsonify, request
+from executor import mt5, executor, Priority, ExecutorBusy
+import logging
+import time
+from flasgger import swag_from
+from lib import get_timeframe, build_panel, PANEL_FIELDS
+from codec import parse_fields
+from rates_cache import rates_cache
+
+snapshot_bp = Blueprint('snapshot', __name__)
+logger = logging.getLogger(__name__)
+
+def _cycle_snapshot(symbols, mt5_timeframe, num_bars, magic):
+    """
+    Runs as one executor job, so no trade can land between reading the positions and
+    the ticks, specs and bars that go with them. The MT5 calls inside run inline.
+    """
+    errors = {}
+
+    positions = mt5.positions_get()
+    if positions is None:
+        errors['positions'] = "Failed to retrieve positions"
+        positions = ()
+    positions_list = [
+        position._asdict() for position in positions
+        if magic is None or position.magic == magic
+    ]
+
+    # Ticks and specs also cover symbols with open positions, so trailing and
+    # close logic can read them without extra calls
+    covered_symbols = list(dict.fromkeys(symbols + [position['symbol'] for position in positions_list]))
+
+    ticks = {}
+    symbol_info = {}
+    for symbol in covered_symbols:
+        tick = mt5.symbol_info_tick(symbol)
+        ticks[symbol] = tick
+        info = mt5.symbol_info(symbol)
+        symbol_info[symbol] = info
+        if tick is None or info is None:
+            errors[symbol] = "Failed to get symbol tick or info"
+
+    bars = None
+    if mt5_timeframe is not None and symbols:
+        rates_by_symbol = {}
+        for symbol in symbols:
+            rates = rates_cache.get_rates(symbol, mt5_timeframe, num_bars)
+            if rates is None:
+                errors[symbol] = "Failed to get rates data"
+            rates_by_symbol[symbol] = rates
+
+        times, values, missing = build_panel(rates_by_symbol)
+        bars = {
+            "symbols": symbols,
+            "fields": list(PANEL_FIELDS),
+            "time": times,
+            "values": values,
+            "missing": missing
+        }
+
+    return {
+        "time": time.time(),
+        "positions": positions_list,
+        "ticks": ticks,
+        "symbol_info": symbol_info,
+        "bars": bars,
+        "errors": errors
+    }
+
+@snapshot_bp.route('/cycle_snapshot', methods=['GET'])
+@swag_from({
+    'tags': ['Snapshot'],
+    'parameters': [
+        {
+            'name': 'symbols',
+            'in': 'query',
+            'type': 'string',
+            'required': False,
+            'description': 'Comma-separated list of symbols. Symbols with open positions are always included.'
+        },
+        {
+            'name': 'timeframe',
+            'in': 'query',
+            'type': 'string',
+            'required': False,
+            'default': 'M1',
+            'description': 'Timeframe for the bars (e.g., M1, M5, H1, or an aggregated size such as M10).'
+        },
+        {
+            'name': 'num_bars',
+            'in': 'query',
+            'type': 'integer',
+            'required': False,
+            'default': 0,
+            'description': 'Number of bars to include per requested symbol. 0 skips bars.'
+        },
+        {
+            'name': 'magic',
+            'in': 'query',
+            'type': 'integer',
+            'required': False,
+            'description': 'Magic number to filter positions.'
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Snapshot taken successfully.',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'time': {'type': 'number'},
+                    'positions': {'type': 'array', 'items': {'type': 'object'}},
+                    'ticks': {'type': 'object'},
+                    'symbol_info': {'type': 'object'},
+                    'bars': {'type': 'object'},
+                    'errors': {'type': 'object'}
+                }
+            }
+        },
+        400: {
+            'description': 'Invalid request parameters.'
+        },
+        500: {
+            'description': 'Internal server error.'
+        }
+    }
+})
+def cycle_snapshot_endpoint():
+    """
+    Get Trading Cycle Snapshot
+    ---
+    description: Return open positions, latest ticks, symbol specifications and the last bars for a list of symbols, taken in one pass over MT5.
+    """
+    try:
+        symbols = parse_fields(request.args.get('symbols')) or []
+        timeframe = request.args.get('timeframe', 'M1')
+        num_bars = int(request.args.get('num_bars', 0))
+        magic = request.args.get('magic', type=int)
+
+        mt5_timeframe = get_timeframe(timeframe) if num_bars > 0 else None
+
+        return jsonify(executor.call(_cycle_snapshot, symbols, mt5_timeframe, num_bars, magic, priority=Priority.READ))
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except ExecutorBusy:
+        # Left to the app's handler, which answers 503 so clients retry
+        raise
+    except Exception as e:
+        logger.error(f"Error in cycle_snapshot: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
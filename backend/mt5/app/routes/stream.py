@@ -0,0 +1,88 @@
+from flask import Blueprint, jsonify, request, Response
+import logging
+import os
+from flasgger import swag_from
+from codec import parse_fields, encode_json, SSE_MIMETYPE
+from tick_stream import tick_streamer, StreamFull, STREAM_MODES, LATEST
+
+stream_bp = Blueprint('stream', __name__)
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_SECONDS = float(os.environ.get('MT5_STREAM_HEARTBEAT_SECONDS', 15))
+
+def sse_event(event: str, data) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + encode_json(data) + b"\n\n"
+
+@stream_bp.route('/stream/ticks', methods=['GET'])
+@swag_from({
+    'tags': ['Stream'],
+    'produces': [SSE_MIMETYPE],
+    'parameters': [
+        {
+            'name': 'symbols',
+            'in': 'query',
+            'type': 'string',
+            'required': True,
+            'description': 'Comma-separated list of symbols to stream.'
+        },
+        {
+            'name': 'mode',
+            'in': 'query',
+            'type': 'string',
+            'enum': list(STREAM_MODES),
+            'required': False,
+            'default': LATEST,
+            'description': "'latest' sends the newest tick per symbol at each poll. 'all' sends every tick until the client falls behind, then drops to latest-only until it catches up."
+        }
+    ],
+    'responses': {
+        200: {
+            'description': "Server-sent events: 'tick' events carry one tick with its symbol, 'lagged' events report how many ticks were coalesced away for this client. Comment lines are sent as heartbeats."
+        },
+        400: {
+            'description': 'Invalid request parameters.'
+        },
+        503: {
+            'description': 'Too many stream clients.'
+        }
+    }
+})
+def stream_ticks_endpoint():
+    """
+    Stream Ticks
+    ---
+    description: Push tick updates for a set of symbols as server-sent events. All clients share one polling loop, and a slow client is coalesced to the latest tick per symbol instead of queueing.
+    """
+    symbols = parse_fields(request.args.get('symbols'))
+    mode = request.args.get('mode', LATEST)
+    if not symbols:
+        return jsonify({"error": "symbols parameter is required"}), 400
+    if mode not in STREAM_MODES:
+        return jsonify({"error": f"Invalid mode '{mode}'. Valid options are: {', '.join(STREAM_MODES)}."}), 400
+
+    try:
+        subscriber = tick_streamer.subscribe(symbols, mode)
+    except StreamFull as e:
+        return jsonify({"error": str(e)}), 503
+
+    def generate():
+        try:
+            # Sent straight away so clients and proxies see the stream is open
+            yield b": connected\n\n"
+            while True:
+                ticks, dropped = subscriber.drain(HEARTBEAT_SECONDS)
+                if not ticks and not dropped:
+                    yield b": keep-alive\n\n"
+                    continue
+                # One write per wake-up, however many ticks were coalesced into it
+                chunks = [sse_event('lagged', {"dropped": dropped})] if dropped else []
+                chunks.extend(sse_event('tick', tick) for tick in ticks)
+                yield b''.join(chunks)
+        finally:
+            # Runs when the client disconnects and the server closes the generator
+            tick_streamer.unsubscribe(subscriber)
+
+    response = Response(generate(), mimetype=SSE_MIMETYPE)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -1,6 +1,7 @@
 from flask import Blueprint, jsonify
-import MetaTrader5 as mt5
+from executor import mt5
 from flasgger import swag_from
+from response_cache import cached
 import logging
 
 symbol_bp = Blueprint('symbol', __name__)
@@ -37,6 +38,8 @@ logger = logging.getLogger(__name__)
         }
     }
 })
+# Always read fresh; the stored tick is only served while the terminal reconnects
+@cached('symbol_info_tick', ttl=0)
 def get_symbol_info_tick_endpoint(symbol):
     """
     Get Symbol Tick Information
@@ -47,8 +50,7 @@ def get_symbol_info_tick_endpoint(symbol):
     if tick is None:
         return jsonify({"error": "Failed to get symbol tick info"}), 404
     
-    tick_dict = tick._asdict()
-    return jsonify(tick_dict)
+    return jsonify(tick)
 
 @symbol_bp.route('/symbol_info/<symbol>', methods=['GET'])
 @swag_from({
@@ -87,6 +89,8 @@ def get_symbol_info_tick_endpoint(symbol):
         }
     }
 })
+# Specs rarely change, but symbol_info also carries bid/ask, which lot sizing reads
+@cached('symbol_info', ttl=1.0)
 def get_symbol_info(symbol):
     """
     Get Symbol Information
@@ -97,5 +101,4 @@ def get_symbol_info(symbol):
     if symbol_info is None:
         return jsonify({"error": "Failed to get symbol info"}), 404
     
-    symbol_info_dict = symbol_info._asdict()
-    return jsonify(symbol_info_dict)
\ No newline at end of file
+    return jsonify(symbol_info)
\ No newline at end of file
@@ -0,0 +1,91 @@
+import logging
+import os
+import signal
+import time
+
+from dotenv import load_dotenv
+from waitress import wasyncore
+from waitress.server import create_server
+
+from app import app
+from connection import connection
+from events import watcher
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+
+def server_settings() -> dict:
+    """
+    Waitress settings for the gateway. A single process is used on purpose: there is one
+    MT5 terminal connection and one executor thread that owns it. The request threads
+    only parse, queue and encode, so a handful is enough.
+    """
+    return {
+        'host': os.environ.get('MT5_API_HOST', '0.0.0.0'),
+        'port': int(os.environ.get('MT5_API_PORT', 5001)),
+        'threads': int(os.environ.get('MT5_API_THREADS', 8)),
+        'connection_limit': int(os.environ.get('MT5_API_CONNECTION_LIMIT', 100)),
+        'backlog': int(os.environ.get('MT5_API_BACKLOG', 1024)),
+        # Idle keep-alive connections are closed after this many seconds
+        'channel_timeout': int(os.environ.get('MT5_API_CHANNEL_TIMEOUT', 120)),
+        'cleanup_interval': int(os.environ.get('MT5_API_CLEANUP_INTERVAL', 30)),
+        'max_request_body_size': int(os.environ.get('MT5_API_MAX_BODY_BYTES', 10 * 1024 * 1024)),
+        'ident': 'mt5-gateway',
+    }
+
+
+def _request_shutdown(signum, frame):
+    logger.info(f"Received signal {signum}, shutting down")
+    raise SystemExit(0)
+
+
+def _in_flight(server) -> bool:
+    # A channel has requests queued or running, or response bytes not yet sent
+    return any(channel.requests or channel.total_outbufs_len for channel in list(server.active_channels.values()))
+
+
+def drain(server, grace_seconds: float):
+    """
+    Stop accepting connections, then keep running the socket loop so requests already
+    received finish and their responses (orders MT5 has executed included) are sent.
+    Whatever is still running after grace_seconds is dropped.
+    """
+    # Closes only the listening socket; the trigger stays so task threads can wake the loop
+    wasyncore.dispatcher.close(server)
+    deadline = time.monotonic() + grace_seconds
+    while _in_flight(server) and time.monotonic() < deadline:
+        wasyncore.loop(timeout=0.05, map=server._map, use_poll=server.adj.asyncore_use_poll, count=1)
+    if _in_flight(server):
+        logger.warning(f"Dropping requests still in flight after {grace_seconds}s")
+    server.task_dispatcher.shutdown(cancel_pending=True, timeout=max(deadline - time.monotonic(), 0))
+    wasyncore.close_all(server._map)
+
+
+def main():
+    settings = server_settings()
+    grace_seconds = float(os.environ.get('MT5_API_SHUTDOWN_GRACE_SECONDS', 10))
+
+    for name in ('SIGINT', 'SIGTERM', 'SIGBREAK'):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), _request_shutdown)
+
+    server = create_server(app, **settings)
+    logger.info(f"Serving MT5 gateway on {settings['host']}:{settings['port']} with {settings['threads']} threads")
+
+    try:
+        # The loop of server.run(), without its shutdown: that one cancels queued
+        # requests and stops the loop that sends responses
+        wasyncore.loop(timeout=server.adj.asyncore_loop_timeout, map=server._map,
+                       use_poll=server.adj.asyncore_use_poll)
+    except (SystemExit, KeyboardInterrupt):
+        pass
+    finally:
+        drain(server, grace_seconds)
+        watcher.stop()
+        connection.stop()
+        logger.info("MT5 gateway stopped")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,411 @@
+import threading
+import time
+import unittest
+from collections import namedtuple
+from datetime import datetime, timezone
+from unittest import mock
+
+import numpy as np
+
+try:
+    import fakeredis
+except ImportError:  # Event tests need a Redis stand-in
+    fakeredis = None
+
+import events
+from app import app
+from codec import RATES_DTYPE
+from connection import MT5Connection
+from execution import TokenBucket
+from executor import executor, mt5, ExecutorBusy, MT5Executor, Priority
+from positions_book import PositionsBook
+from rates_cache import RatesCache, _resample_window
+from resample import copy_rates_range, parse_resampled, resample_rates
+from response_cache import response_cache, STALE
+
+Deal = namedtuple('Deal', 'ticket time symbol')
+Order = namedtuple('Order', 'ticket symbol volume_initial')
+Position = namedtuple('Position', 'ticket symbol magic sl tp volume time_update_msc')
+
+
+def _position(ticket, sl=0.0, tp=0.0, volume=0.1, time_update_msc=1):
+    return {'ticket': ticket, 'symbol': 'EURUSD', 'sl': sl, 'tp': tp, 'volume': volume,
+            'time_update_msc': time_update_msc}
+
+
+class FakeBook:
+    """positions_book with a settable book; delta() returns None unless a delta is queued."""
+
+    def __init__(self, version=1, rows=()):
+        self.version = version
+        self.rows = list(rows)
+        self.next_delta = None
+
+    def refresh(self):
+        return True
+
+    def snapshot(self):
+        return self.version, list(self.rows)
+
+    def delta(self, since_version):
+        return self.next_delta
+
+
+class FakeMT5:
+    def __init__(self):
+        self.deals = []
+
+    def history_deals_get(self, date_from, date_to):
+        return tuple(deal for deal in self.deals if date_from <= deal.time <= date_to)
+
+
+@unittest.skipUnless(fakeredis, "fakeredis is not installed")
+class EventWatcherTests(unittest.TestCase):
+
+    def setUp(self):
+        self.book = FakeBook(version=1, rows=[_position(1), _position(2)])
+        self.mt5 = FakeMT5()
+        patches = [mock.patch.object(events, 'positions_book', self.book), mock.patch.object(events, 'mt5', self.mt5)]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        self.redis = fakeredis.FakeRedis()
+        self.watcher = events.EventWatcher(stream='test:events', deal_sweep_interval=0)
+        self.watcher._client = self.redis
+        self.assertTrue(self.watcher._seed())
+
+    def published(self):
+        return [(fields[b'type'].decode(), int(fields[b'ticket'])) for _, fields in self.redis.xrange('test:events')]
+
+    def test_seed_publishes_nothing(self):
+        self.watcher._poll()
+        self.assertEqual(self.published(), [])
+
+    def test_full_book_diff(self):
+        # Position 1 closed, 2 had its SL moved, 3 opened; the book's change log is gone
+        self.book.version = 5
+        self.book.rows = [_position(2, sl=1.05, time_update_msc=2), _position(3)]
+        self.watcher._poll()
+
+        self.assertEqual(sorted(self.published()), [
+            (events.POSITION_CLOSED, 1), (events.POSITION_MODIFIED, 2), (events.POSITION_OPENED, 3)
+        ])
+        self.assertEqual(self.watcher.version, 5)
+        self.assertEqual(set(self.watcher._rows), {2, 3})
+
+    def test_price_moves_are_not_events(self):
+        self.book.version = 2
+        self.book.rows = [dict(_position(1), price_current=1.2), _position(2)]
+        self.watcher._poll()
+        self.assertEqual(self.published(), [])
+
+    def test_delta_from_change_log(self):
+        self.book.next_delta = {"version": 2, "opened": [_position(3)], "modified": [], "closed": [1]}
+        self.watcher._poll()
+
+        self.assertEqual(self.published(), [(events.POSITION_OPENED, 3), (events.POSITION_CLOSED, 1)])
+        # The closed event carries the last row seen for the position
+        _, fields = self.redis.xrange('test:events')[-1]
+        self.assertIn(b'"symbol":"EURUSD"', fields[b'data'])
+
+    def test_failed_publish_is_resent(self):
+        self.book.version = 2
+        self.book.rows = [_position(1)]
+        self.mt5.deals = [Deal(10, int(time.time()), 'EURUSD')]
+
+        with mock.patch.object(self.redis, 'pipeline', side_effect=events.redis.ConnectionError("down")):
+            with self.assertRaises(events.redis.ConnectionError):
+                self.watcher._poll()
+        self.assertEqual(self.watcher.version, 1)
+        self.assertEqual(set(self.watcher._rows), {1, 2})
+        self.assertNotIn(10, self.watcher._deals)
+
+        self.watcher._poll()
+        self.assertEqual(self.published(), [(events.POSITION_CLOSED, 2), (events.DEAL, 10)])
+        self.assertEqual(self.watcher.version, 2)
+
+    def test_deals_are_published_once(self):
+        self.mt5.deals = [Deal(10, int(time.time()), 'EURUSD')]
+        self.watcher._poll()
+        self.watcher._poll()
+        self.assertEqual(self.published(), [(events.DEAL, 10)])
+
+
+class FakeTerminal:
+    """The MetaTrader5 functions a test needs, installed behind the executor's mt5 proxy."""
+
+    def __init__(self, **functions):
+        self.__dict__.update(functions)
+
+    def install(self, test):
+        # The proxy caches one wrapper per function name, so they are cleared as well
+        for patch in (mock.patch.object(mt5, '_module', self), mock.patch.dict(mt5._wrappers, clear=True)):
+            patch.start()
+            test.addCleanup(patch.stop)
+
+
+class StaleOnBusyTests(unittest.TestCase):
+    """Cached routes skip the before_request shedding and answer from the cache instead."""
+
+    def setUp(self):
+        FakeTerminal(history_orders_get=lambda ticket: (Order(ticket, 'EURUSD', 0.1),)).install(self)
+        patch = mock.patch.object(MT5Connection, 'is_connected', new=property(lambda self: True))
+        patch.start()
+        self.addCleanup(patch.stop)
+        response_cache.clear()
+        self.addCleanup(response_cache.clear)
+        self.client = app.test_client()
+
+    def saturate_reads(self):
+        patch = mock.patch.dict(executor.max_pending, {Priority.READ: 0})
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def expire_all(self):
+        for entry in response_cache._entries.values():
+            entry.ttl = 0
+
+    def test_history_served_stale_while_busy(self):
+        primed = self.client.get('/history_orders_get?ticket=5')
+        self.assertEqual(primed.status_code, 200)
+        self.expire_all()  # as with a RESPONSE_CACHE_TTL_HISTORY_ORDERS_GET override
+        self.saturate_reads()
+
+        response = self.client.get('/history_orders_get?ticket=5')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['X-Cache'], STALE)
+        self.assertEqual(response.get_data(), primed.get_data())
+
+    def test_busy_without_entry_is_503(self):
+        self.saturate_reads()
+        self.assertEqual(self.client.get('/history_orders_get?ticket=6').status_code, 503)
+
+
+# A midnight, so resampled buckets line up with multiples of their size from here
+MIDNIGHT = 1700006400
+
+
+def _rates(times):
+    """One bar per open time; every field but spread differs between bars."""
+    rates = np.zeros(len(times), dtype=RATES_DTYPE)
+    rates['time'] = times
+    rates['open'] = 1.1 + np.arange(len(times)) * 0.0001
+    rates['high'] = rates['open'] + 0.0005
+    rates['low'] = rates['open'] - 0.0005
+    rates['close'] = rates['open'] + 0.0002
+    rates['tick_volume'] = 1
+    rates['real_volume'] = np.arange(len(times))
+    return rates
+
+
+class FakeMarket:
+    """M1 bars up to a settable last one, with copy_rates_from_pos recording each count asked for."""
+
+    def __init__(self, bars):
+        self.rates = _rates(MIDNIGHT + 60 * np.arange(bars))
+        self.counts = []
+
+    def advance(self, bars):
+        # The last bar was still forming, so it gets a new close as well
+        self.rates['close'][-1] += 0.001
+        last = self.rates['time'][-1]
+        self.rates = np.concatenate([self.rates, _rates(last + 60 * np.arange(1, bars + 1))])
+
+    def copy_rates_from_pos(self, symbol, timeframe, start, count):
+        self.counts.append(count)
+        return self.rates[-count:].copy()
+
+
+class RatesCacheDeltaTests(unittest.TestCase):
+
+    def setUp(self):
+        self.market = FakeMarket(100)
+        FakeTerminal(copy_rates_from_pos=self.market.copy_rates_from_pos).install(self)
+        self.cache = RatesCache(min_bars=10, refresh_interval=0)
+        self.assertEqual(len(self.cache.get_rates('EURUSD', 1, 10)), 10)
+        self.market.counts.clear()
+
+    def assert_current(self, num_bars):
+        np.testing.assert_array_equal(self.cache.get_rates('EURUSD', 1, num_bars), self.market.rates[-num_bars:])
+
+    def test_new_bar_is_merged(self):
+        self.market.advance(1)
+        self.assert_current(10)
+        self.assertEqual(self.market.counts, [2])
+        self.assertEqual((self.cache.deltas, self.cache.full_fetches), (1, 1))
+
+    def test_window_grows_until_it_overlaps(self):
+        self.market.advance(5)
+        self.assert_current(10)
+        self.assertEqual(self.market.counts, [2, 8])
+        self.assertEqual((self.cache.deltas, self.cache.full_fetches), (1, 1))
+
+    def test_full_fetch_once_the_window_reaches_capacity(self):
+        self.market.advance(50)
+        self.assert_current(10)
+        self.assertEqual(self.market.counts, [2, 8, 10, 10])
+        self.assertEqual((self.cache.deltas, self.cache.full_fetches), (0, 2))
+
+    def test_larger_request_refetches(self):
+        self.assert_current(20)
+        self.assertEqual(self.market.counts, [20])
+        self.assertEqual(self.cache.full_fetches, 2)
+
+
+class ResampleTests(unittest.TestCase):
+    M3 = parse_resampled('M3')
+
+    def test_partial_first_bucket_is_dropped(self):
+        # Minutes 1 to 9: the first M3 bar is missing minute 0
+        source = _rates(MIDNIGHT + 60 * np.arange(1, 10))
+        rates = _resample_window(source, len(source), self.M3.seconds)
+        self.assertEqual(list(rates['time'] - MIDNIGHT), [180, 360, 540])
+
+    def test_first_bucket_kept_when_aligned_or_history_is_exhausted(self):
+        aligned = _rates(MIDNIGHT + 60 * np.arange(9))
+        self.assertEqual(len(_resample_window(aligned, len(aligned), self.M3.seconds)), 3)
+
+        source = _rates(MIDNIGHT + 60 * np.arange(1, 10))
+        rates = _resample_window(source, len(source) + 1, self.M3.seconds)
+        self.assertEqual(list(rates['time'] - MIDNIGHT), [0, 180, 360, 540])
+        self.assertEqual(rates['tick_volume'][0], 2)
+
+    def test_cached_resample_matches_source(self):
+        market = FakeMarket(100)
+        FakeTerminal(copy_rates_from_pos=market.copy_rates_from_pos).install(self)
+        cache = RatesCache(min_bars=10, refresh_interval=0)
+
+        rates = cache.get_rates('EURUSD', self.M3, 4)
+        np.testing.assert_array_equal(rates, resample_rates(market.rates, self.M3.seconds)[-4:])
+        cache.get_rates('EURUSD', self.M3, 4)
+        self.assertEqual(cache.resamples, 1)
+
+        market.advance(1)
+        rates = cache.get_rates('EURUSD', self.M3, 4)
+        np.testing.assert_array_equal(rates, resample_rates(market.rates, self.M3.seconds)[-4:])
+        self.assertEqual(cache.resamples, 2)
+
+    def test_range_covers_the_last_bar(self):
+        market = _rates(MIDNIGHT + 60 * np.arange(30))
+        asked = []
+
+        def fake_copy_rates_range(symbol, timeframe, start, end):
+            asked.append((timeframe, int(start.timestamp()) - MIDNIGHT, int(end.timestamp()) - MIDNIGHT))
+            return market[(market['time'] >= start.timestamp()) & (market['time'] <= end.timestamp())]
+        FakeTerminal(copy_rates_range=fake_copy_rates_range).install(self)
+
+        start = datetime.fromtimestamp(MIDNIGHT + 60, timezone.utc)
+        end = datetime.fromtimestamp(MIDNIGHT + 600, timezone.utc)
+        rates = copy_rates_range('EURUSD', self.M3, start, end)
+
+        # Asked up to the last second of the bar opening at 540, which end falls inside
+        self.assertEqual(asked, [(self.M3.source, 60, 719)])
+        # The bar opening at 0 began before start and is left out
+        self.assertEqual(list(rates['time'] - MIDNIGHT), [180, 360, 540])
+        self.assertEqual(rates['tick_volume'][-1], 3)
+        self.assertEqual(rates['close'][-1], market['close'][11])
+
+
+class PositionsBookDeltaTests(unittest.TestCase):
+
+    def setUp(self):
+        self.positions = {1: Position(1, 'EURUSD', 7, 0.0, 0.0, 0.1, 1)}
+        FakeTerminal(positions_get=lambda: tuple(self.positions.values())).install(self)
+        self.book = PositionsBook(refresh_interval=0, history=3)
+        self.assertTrue(self.book.refresh())
+        self.start = self.book.version
+
+    def change(self, opened=(), modified=(), closed=()):
+        for position in opened + modified:
+            self.positions[position.ticket] = position
+        for ticket in closed:
+            del self.positions[ticket]
+        self.assertTrue(self.book.refresh())
+
+    def test_opened_and_closed_inside_the_window_is_left_out(self):
+        self.change(opened=(Position(2, 'EURUSD', 7, 0.0, 0.0, 0.1, 1),))
+        self.change(closed=(2,))
+        delta = self.book.delta(self.start)
+        self.assertEqual(delta, {"version": self.start + 2, "opened": [], "modified": [], "closed": []})
+
+    def test_changes_since_a_version(self):
+        self.change(opened=(Position(2, 'EURUSD', 8, 0.0, 0.0, 0.1, 1),))
+        self.change(modified=(Position(2, 'EURUSD', 8, 1.05, 0.0, 0.1, 2),), closed=(1,))
+
+        delta = self.book.delta(self.start)
+        self.assertEqual([row['sl'] for row in delta['opened']], [1.05])
+        self.assertEqual((delta['modified'], delta['closed']), ([], [1]))
+        self.assertEqual(self.book.delta(self.start, magic=8)['closed'], [])
+
+        delta = self.book.delta(self.start + 1)
+        self.assertEqual((delta['opened'], delta['closed']), ([], [1]))
+        self.assertEqual([row['ticket'] for row in delta['modified']], [2])
+
+    def test_evicted_versions_need_the_full_book(self):
+        for ticket in (2, 3, 4):
+            self.change(opened=(Position(ticket, 'EURUSD', 7, 0.0, 0.0, 0.1, 1),))
+        self.assertEqual(self.book.delta(self.start)['version'], self.start + 3)
+
+        # The log is full, so closing 2 pushes its opening out
+        self.change(closed=(2,))
+        self.assertEqual(self.book._floor, self.start + 1)
+        self.assertIsNone(self.book.delta(self.start))
+        delta = self.book.delta(self.start + 1)
+        self.assertEqual(([row['ticket'] for row in delta['opened']], delta['closed']), ([3, 4], [2]))
+
+    def test_version_from_the_future_needs_the_full_book(self):
+        self.assertEqual(self.book.delta(self.start)['opened'], [])
+        self.assertIsNone(self.book.delta(self.start + 1))
+
+
+class TokenBucketTests(unittest.TestCase):
+
+    def test_waiting_callers_get_successive_slots(self):
+        bucket = TokenBucket(rate=5.0, burst=2)
+        now = bucket.updated
+        self.assertEqual([round(bucket.take(now), 3) for _ in range(4)], [0.0, 0.0, 0.2, 0.4])
+
+    def test_unused_slot_is_given_back(self):
+        bucket = TokenBucket(rate=5.0, burst=1)
+        now = bucket.updated
+        bucket.take(now)
+        self.assertEqual(round(bucket.take(now), 3), 0.2)
+        bucket.give_back()
+        self.assertEqual(round(bucket.take(now), 3), 0.2)
+
+
+class ExecutorTimeoutTests(unittest.TestCase):
+
+    def setUp(self):
+        self.executor = MT5Executor(timeout=0.1)
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def block(self):
+        started = threading.Event()
+
+        def job():
+            started.set()
+            self.release.wait(5)
+        self.executor.submit(job)
+        started.wait(1)
+
+    def test_queued_call_is_dropped_after_timeout(self):
+        ran = []
+        self.block()
+        with self.assertRaises(ExecutorBusy):
+            self.executor.call(ran.append, 1, priority=Priority.TRADE)
+        self.release.set()
+        time.sleep(0.05)
+        self.assertEqual(ran, [])
+
+    def test_running_trade_is_waited_for(self):
+        def order_send():
+            time.sleep(0.3)
+            return 'filled'
+        self.assertEqual(self.executor.call(order_send, priority=Priority.TRADE), 'filled')
+
+
+if __name__ == '__main__':
+    unittest.main()
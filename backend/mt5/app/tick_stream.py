@@ -0,0 +1,196 @@
+import os
+import threading
+import time
+import logging
+from collections import deque
+
+from executor import mt5, executor, ExecutorBusy
+
+logger = logging.getLogger(__name__)
+
+LATEST = 'latest'
+ALL = 'all'
+STREAM_MODES = (LATEST, ALL)
+
+
+class StreamFull(Exception):
+    """Raised when the maximum number of stream clients is already connected."""
+
+
+def _tick_dict(symbol, tick) -> dict:
+    if hasattr(tick, '_asdict'):
+        data = tick._asdict()
+    else:
+        data = {name: tick[name].item() for name in tick.dtype.names}
+    data['symbol'] = symbol
+    return data
+
+
+class Subscriber:
+    """
+    One stream client. In 'all' mode every tick is queued up to max_pending. A client
+    that falls behind that far drops to latest-only: its queue is folded into the
+    last tick per symbol until it catches up, and the skipped ticks are counted.
+    'latest' mode always keeps only the newest tick per symbol.
+    """
+
+    def __init__(self, symbols, mode=LATEST, max_pending=1000):
+        self.symbols = frozenset(symbols)
+        self.mode = mode
+        self.max_pending = max_pending
+        self.pending = deque()
+        self.latest = {}
+        self.lagging = False
+        self.dropped = 0
+        self._cond = threading.Condition()
+
+    def push(self, symbol, ticks):
+        with self._cond:
+            if self.mode == ALL and not self.lagging and len(self.pending) + len(ticks) <= self.max_pending:
+                self.pending.extend(ticks)
+            else:
+                if self.pending:
+                    self.lagging = True
+                    for tick in self.pending:
+                        self.latest[tick['symbol']] = tick
+                    self.dropped += len(self.pending) - len(self.latest)
+                    self.pending.clear()
+                elif self.mode == ALL:
+                    self.lagging = True
+                if symbol in self.latest:
+                    self.dropped += 1
+                self.dropped += len(ticks) - 1
+                self.latest[symbol] = ticks[-1]
+            self._cond.notify()
+
+    def drain(self, timeout):
+        """
+        Wait up to timeout for updates. Returns (ticks, dropped), where dropped is the
+        number of ticks coalesced away since the last drain.
+        """
+        with self._cond:
+            if not self.pending and not self.latest:
+                self._cond.wait(timeout)
+            ticks = list(self.pending) + sorted(self.latest.values(), key=lambda t: t['time_msc'])
+            dropped = self.dropped
+            self.pending.clear()
+            self.latest.clear()
+            self.dropped = 0
+            self.lagging = False
+            return ticks, dropped
+
+
+class TickStreamer:
+    """
+    Polls ticks for the union of all subscribed symbols in one background loop and
+    fans them out to subscribers. Each round is a single job on the MT5 executor.
+    Symbols with an 'all' subscriber are read with copy_ticks_from from the last
+    seen tick. The others only need symbol_info_tick. The loop sleeps while nobody
+    is subscribed.
+    """
+
+    def __init__(self, poll_interval=0.1, max_clients=4, max_pending=1000, max_ticks_per_poll=1000):
+        self.poll_interval = poll_interval
+        self.max_clients = max_clients
+        self.max_pending = max_pending
+        self.max_ticks_per_poll = max_ticks_per_poll
+        self.published = 0
+        self._subscribers = set()
+        self._last_msc = {}
+        self._thread = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            poll_interval=float(os.environ.get('MT5_STREAM_POLL_SECONDS', 0.1)),
+            max_clients=int(os.environ.get('MT5_STREAM_MAX_CLIENTS', 4)),
+            max_pending=int(os.environ.get('MT5_STREAM_MAX_PENDING', 1000)),
+            max_ticks_per_poll=int(os.environ.get('MT5_STREAM_MAX_TICKS_PER_POLL', 1000)),
+        )
+
+    def subscribe(self, symbols, mode=LATEST) -> Subscriber:
+        subscriber = Subscriber(symbols, mode, self.max_pending)
+        with self._lock:
+            if len(self._subscribers) >= self.max_clients:
+                raise StreamFull(f"At most {self.max_clients} stream clients")
+            self._subscribers.add(subscriber)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='mt5-tick-stream', daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+            symbols = set().union(*(s.symbols for s in self._subscribers)) if self._subscribers else set()
+            for symbol in list(self._last_msc):
+                if symbol not in symbols:
+                    del self._last_msc[symbol]
+
+    def _poll(self, latest_symbols, all_symbols):
+        """Runs on the executor thread. Returns {symbol: [tick dicts]} for new ticks only."""
+        updates = {}
+        for symbol in latest_symbols | all_symbols:
+            last_msc = self._last_msc.get(symbol)
+            if symbol in all_symbols and last_msc is not None:
+                ticks = mt5.copy_ticks_from(symbol, last_msc // 1000, self.max_ticks_per_poll, mt5.COPY_TICKS_ALL)
+                if ticks is None or not len(ticks):
+                    continue
+                ticks = ticks[ticks['time_msc'] > last_msc]
+                if not len(ticks):
+                    continue
+                updates[symbol] = [_tick_dict(symbol, tick) for tick in ticks]
+            else:
+                tick = mt5.symbol_info_tick(symbol)
+                if tick is None or (last_msc is not None and tick.time_msc <= last_msc):
+                    continue
+                updates[symbol] = [_tick_dict(symbol, tick)]
+            self._last_msc[symbol] = updates[symbol][-1]['time_msc']
+        return updates
+
+    def _run(self):
+        while True:
+            # Cleared before the snapshot, so a subscribe() landing after it still wakes the wait
+            self._wake.clear()
+            with self._lock:
+                subscribers = list(self._subscribers)
+            if not subscribers:
+                self._wake.wait()
+                continue
+
+            latest_symbols = set()
+            all_symbols = set()
+            for subscriber in subscribers:
+                (all_symbols if subscriber.mode == ALL else latest_symbols).update(subscriber.symbols)
+
+            started = time.monotonic()
+            try:
+                updates = executor.call(self._poll, latest_symbols, all_symbols)
+            except ExecutorBusy:
+                updates = {}
+            except Exception as e:
+                logger.error(f"Error polling ticks for stream: {str(e)}")
+                updates = {}
+
+            for symbol, ticks in updates.items():
+                self.published += len(ticks)
+                for subscriber in subscribers:
+                    if symbol in subscriber.symbols:
+                        subscriber.push(symbol, ticks)
+
+            time.sleep(max(0.0, self.poll_interval - (time.monotonic() - started)))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "clients": len(self._subscribers),
+                "max_clients": self.max_clients,
+                "symbols": sorted(set().union(*(s.symbols for s in self._subscribers))) if self._subscribers else [],
+                "published": self.published
+            }
+
+
+tick_streamer = TickStreamer.from_env()
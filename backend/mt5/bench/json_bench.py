@@ -0,0 +1,144 @@
+"""
+Compare JSON encoding of gateway responses before and after the orjson provider.
+
+For each endpoint a realistic payload is built from synthetic MT5 data, then encoded
+into a response body twice: the old way (namedtuple._asdict(), DataFrames and
+.tolist(), then Flask's standard library provider) and the new way (the objects as
+they come from MT5, encoded by codec.OrjsonProvider). Both bodies are parsed back
+and compared, with NaN taken as null, so the numbers are for identical output.
+
+    cd backend/mt5/app && python ../bench/json_bench.py --repeat 200
+"""
+import argparse
+import json
+import math
+import os
+import statistics
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from codec import OrjsonProvider, array_records  # noqa: E402
+from werkzeug.http import http_date  # noqa: E402
+
+TradePosition = namedtuple('TradePosition', [
+    'ticket', 'time', 'time_msc', 'time_update', 'time_update_msc', 'type', 'magic', 'identifier',
+    'reason', 'volume', 'price_open', 'sl', 'tp', 'price_current', 'swap', 'profit', 'symbol',
+    'comment', 'external_id'
+])
+TradeDeal = namedtuple('TradeDeal', [
+    'ticket', 'order', 'time', 'time_msc', 'type', 'entry', 'magic', 'position_id', 'reason',
+    'volume', 'price', 'commission', 'swap', 'profit', 'fee', 'symbol', 'comment', 'external_id'
+])
+SymbolInfo = namedtuple('SymbolInfo', [f'field_{i}' for i in range(96)] + ['name', 'description', 'path'])
+
+RATES_DTYPE = np.dtype([
+    ('time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'),
+    ('tick_volume', '<u8'), ('spread', '<i4'), ('real_volume', '<u8')
+])
+
+
+def make_rates(count, rng):
+    rates = np.zeros(count, dtype=RATES_DTYPE)
+    rates['time'] = 1_700_000_000 + np.arange(count) * 60
+    close = 1.08 + np.cumsum(rng.normal(0, 1e-4, count)).round(5)
+    rates['open'] = rates['close'] = close
+    rates['high'] = close + 2e-4
+    rates['low'] = close - 2e-4
+    rates['tick_volume'] = rng.integers(1, 500, count)
+    rates['spread'] = rng.integers(0, 20, count)
+    return rates
+
+
+def make_positions(count, rng):
+    return [
+        TradePosition(i, 1_700_000_000, 1_700_000_000_000, 1_700_000_000, 1_700_000_000_000, i % 2, 7, i,
+                      0, 0.1, 1.08, 1.07, 1.09, float(rng.normal(1.08, 0.001)), 0.0,
+                      float(rng.normal(0, 5)), 'EURUSD', '', '')
+        for i in range(count)
+    ]
+
+
+def make_deals(count, rng):
+    return tuple(
+        TradeDeal(i, i, 1_700_000_000 + i, (1_700_000_000 + i) * 1000, i % 2, i % 2, 7, i // 2, 3,
+                  0.1, float(rng.normal(1.08, 0.001)), -0.7, 0.0, float(rng.normal(0, 5)), 0.0,
+                  'EURUSD', '', '')
+        for i in range(count)
+    )
+
+
+def cases(rng):
+    rates = make_rates(1000, rng)
+    positions = make_positions(200, rng)
+    deals = make_deals(2000, rng)
+    info = SymbolInfo(*([1.5] * 48 + [7] * 48), 'EURUSD', 'Euro vs US Dollar', 'Forex\\EURUSD')
+    values = np.where(rng.random((7, 10, 500)) < 0.01, np.nan, rng.random((7, 10, 500)))
+    missing = np.isnan(values[0])
+    times = np.arange(500, dtype=np.int64) * 60 + 1_700_000_000
+
+    def rates_old():
+        df = pd.DataFrame(rates)
+        df['time'] = pd.to_datetime(df['time'], unit='s')
+        return df.to_dict(orient='records')
+
+    def panel_old():
+        return {"time": times.tolist(), "values": values.tolist(), "missing": missing.tolist()}
+
+    return {
+        'fetch_data_pos (1000 bars, json)': (rates_old, lambda: array_records(rates, {'time': http_date})),
+        'get_positions (200 positions)': (lambda: [p._asdict() for p in positions], lambda: positions),
+        'history_deals_get (2000 deals)': (lambda: [d._asdict() for d in deals], lambda: deals),
+        'symbol_info': (lambda: info._asdict(), lambda: info),
+        'fetch_data_panel (10 x 500, json)': (panel_old, lambda: {"time": times, "values": values, "missing": missing}),
+    }
+
+
+def normalize(value):
+    """The standard library writes NaN where orjson writes null."""
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, list):
+        return [normalize(item) for item in value]
+    if isinstance(value, dict):
+        return {key: normalize(item) for key, item in value.items()}
+    return value
+
+
+def timed(app, build, repeat):
+    samples = []
+    with app.app_context():
+        for _ in range(repeat):
+            started = time.perf_counter()
+            body = app.json.response(build()).get_data()
+            samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000, body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=100)
+    args = parser.parse_args()
+
+    old_app = Flask('old')
+    old_app.json = DefaultJSONProvider(old_app)
+    new_app = Flask('new')
+    new_app.json = OrjsonProvider(new_app)
+
+    print(f"{'endpoint':36} {'before ms':>10} {'after ms':>10} {'speedup':>8} {'same':>5}")
+    for name, (old, new) in cases(np.random.default_rng(0)).items():
+        old_ms, old_body = timed(old_app, old, args.repeat)
+        new_ms, new_body = timed(new_app, new, args.repeat)
+        same = normalize(json.loads(old_body)) == json.loads(new_body)
+        print(f"{name:36} {old_ms:10.3f} {new_ms:10.3f} {old_ms / new_ms:7.1f}x {str(same):>5}")
+
+
+if __name__ == '__main__':
+    main()
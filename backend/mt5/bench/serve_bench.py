@@ -0,0 +1,167 @@
+"""
+Compare the Werkzeug development server with the waitress production server.
+
+Two modes:
+
+    # Against a running gateway (measures the real MT5 path)
+    python serve_bench.py --url http://localhost:5001/symbol_info_tick/EURUSD
+
+    # Synthetic: start each server in a subprocess around a stub app whose "MT5 call"
+    # is a fixed sleep on one executor thread, the same shape as the real gateway
+    python serve_bench.py --synthetic
+
+Each client thread keeps one HTTP/1.1 connection open and reconnects only when the
+server closes it. That is how the pooled Django client talks to the gateway.
+"""
+import argparse
+import http.client
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+
+def stub_app(mt5_call_ms: float):
+    from flask import Flask, jsonify
+
+    app = Flask(__name__)
+    executor = ThreadPoolExecutor(max_workers=1)
+
+    def fake_mt5_call():
+        time.sleep(mt5_call_ms / 1000)
+        return {"bid": 1.1, "ask": 1.1001, "time": int(time.time())}
+
+    @app.route('/symbol_info_tick/<symbol>')
+    def tick(symbol):
+        return jsonify(executor.submit(fake_mt5_call).result())
+
+    return app
+
+
+def serve(kind: str, port: int, mt5_call_ms: float, threads: int):
+    app = stub_app(mt5_call_ms)
+    if kind == 'dev':
+        app.run(host='127.0.0.1', port=port, threaded=True)
+    else:
+        from waitress import serve as waitress_serve
+        waitress_serve(app, host='127.0.0.1', port=port, threads=threads, connection_limit=1000, _quiet=True)
+
+
+def load(url: str, clients: int, requests_per_client: int):
+    parts = urlsplit(url)
+    path = parts.path + (f"?{parts.query}" if parts.query else '')
+    latencies = []
+    errors = 0
+    connects = 0
+    lock = threading.Lock()
+
+    def worker():
+        nonlocal errors, connects
+        conn = None
+        local = []
+        for _ in range(requests_per_client):
+            if conn is None or conn.sock is None:
+                conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+                with lock:
+                    connects += 1
+            started = time.perf_counter()
+            try:
+                conn.request('GET', path)
+                response = conn.getresponse()
+                response.read()
+                if response.status != 200:
+                    with lock:
+                        errors += 1
+                if response.will_close:
+                    conn.close()
+            except (OSError, http.client.HTTPException):
+                with lock:
+                    errors += 1
+                conn.close()
+                conn = None
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker) for _ in range(clients)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'connections': connects,
+        'rps': len(latencies) / elapsed,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p99_ms': latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def wait_for(url: str, timeout: float = 10.0):
+    parts = urlsplit(url)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=1)
+            conn.request('GET', parts.path)
+            conn.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server at {url} did not come up")
+
+
+def print_result(label: str, result: dict):
+    print(f"{label:<10} {result['rps']:>9.1f} req/s  p50 {result['p50_ms']:>7.2f} ms  "
+          f"p99 {result['p99_ms']:>7.2f} ms  connections {result['connections']:>5}  errors {result['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url')
+    parser.add_argument('--synthetic', action='store_true')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=500, help='Requests per client')
+    parser.add_argument('--mt5-call-ms', type=float, default=1.0)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--serve', choices=['dev', 'waitress'], help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, default=5099, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.mt5_call_ms, args.threads)
+        return
+
+    if args.url:
+        print_result('gateway', load(args.url, args.clients, args.requests))
+        return
+
+    if not args.synthetic:
+        parser.error('pass --url or --synthetic')
+
+    print(f"{args.clients} clients x {args.requests} requests, stub MT5 call {args.mt5_call_ms} ms")
+    for kind in ('dev', 'waitress'):
+        url = f"http://127.0.0.1:{args.port}/symbol_info_tick/EURUSD"
+        server = subprocess.Popen(
+            [sys.executable, __file__, '--serve', kind, '--port', str(args.port),
+             '--mt5-call-ms', str(args.mt5_call_ms), '--threads', str(args.threads)],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            wait_for(url)
+            print_result(kind, load(url, args.clients, args.requests))
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
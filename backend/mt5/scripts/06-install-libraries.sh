@@ -4,8 +4,15 @@ source /scripts/02-common.sh
 
 log_message "RUNNING" "06-install-libraries.sh"
 
-# Install MetaTrader5 library in Windows if not installed
+# Install the gateway requirements in Windows on every start. The Wine prefix lives on
+# the persistent /config volume, so packages added to requirements.txt since it was
+# created are only picked up here; pip skips the ones already installed.
 log_message "INFO" "Installing MetaTrader5 library and dependencies in Windows"
-if ! is_wine_python_package_installed "MetaTrader5"; then
-    $wine_executable python -m pip install --no-cache-dir -r /app/requirements.txt
-fi
\ No newline at end of file
+$wine_executable python -m pip install --no-cache-dir -r /app/requirements.txt
+
+# The gateway imports these at startup and cannot serve without them
+for package in orjson waitress; do
+    if ! is_wine_python_package_installed "$package"; then
+        log_message "ERROR" "$package is not installed in Windows; the MT5 gateway will not start"
+    fi
+done
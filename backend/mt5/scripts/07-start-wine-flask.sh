@@ -4,10 +4,10 @@ source /scripts/02-common.sh
 
 log_message "RUNNING" "07-start-wine-flask.sh"
 
-log_message "INFO" "Starting Flask server in Wine environment..."
+log_message "INFO" "Starting MT5 gateway (waitress) in Wine environment..."
 
-# Run the Flask app using Wine's Python
-wine python /app/app.py &
+# Serve the Flask app with waitress using Wine's Python
+wine python /app/serve.py &
 
 FLASK_PID=$!
 
@@ -16,8 +16,8 @@ sleep 5
 
 # Check if the Flask server is running
 if ps -p $FLASK_PID > /dev/null; then
-    log_message "INFO" "Flask server in Wine started successfully with PID $FLASK_PID."
+    log_message "INFO" "MT5 gateway in Wine started successfully with PID $FLASK_PID."
 else
-    log_message "ERROR" "Failed to start Flask server in Wine."
+    log_message "ERROR" "Failed to start MT5 gateway in Wine."
     exit 1
 fi
\ No newline at end of file